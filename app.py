@@ -1,942 +1,963 @@
-# app.py
-import json
-import re
-from typing import Any, Dict, List, Optional
-
-import requests
-import streamlit as st
-from openai import OpenAI
-
-
-# -----------------------------
-# App Config
-# -----------------------------
-st.set_page_config(
-    page_title="Select Game",
-    page_icon="🎮",
-    layout="wide",
-    initial_sidebar_state="expanded",
-)
-
-RAWG_BASE = "https://api.rawg.io/api"
-TIMEOUT = 15
-
-# 후보를 넉넉히 만들되, 최종 추천은 "확신 있는 것만" (개수 강제 X)
-CANDIDATE_COUNT = 18
-RAWG_MATCH_LIMIT = 18
-
-# RAWG 키가 없을 때: 모델만으로 추천은 가능하되, 팩트는 보수적으로
-FALLBACK_MAX_RECS = 8
-
-
-# -----------------------------
-# Magazine UI (CSS)
-# -----------------------------
-MAGAZINE_CSS = """
-<style>
-:root{
-  --bg:#0b0f19;
-  --ink:#e8eefc;
-  --muted:#9fb0d0;
-  --card:#101a33;
-  --line:rgba(255,255,255,0.08);
-  --shadow: 0 14px 40px rgba(0,0,0,.35);
-  --radius: 18px;
-}
-
-/* App background */
-.stApp{
-  background: radial-gradient(1200px 600px at 10% 0%, rgba(124,92,255,.22), transparent 60%),
-              radial-gradient(900px 500px at 90% 15%, rgba(0,212,255,.16), transparent 55%),
-              linear-gradient(180deg, var(--bg), #070a12);
-  color: var(--ink);
-}
-
-/* Sidebar */
-section[data-testid="stSidebar"]{
-  background: linear-gradient(180deg, rgba(15,22,40,.96), rgba(10,15,25,.96));
-  border-right: 1px solid var(--line);
-}
-section[data-testid="stSidebar"] *{
-  color: var(--ink);
-}
-section[data-testid="stSidebar"] .stTextInput input,
-section[data-testid="stSidebar"] .stTextArea textarea,
-section[data-testid="stSidebar"] .stNumberInput input{
-  background: rgba(255,255,255,.06) !important;
-  border: 1px solid rgba(255,255,255,.10) !important;
-  color: var(--ink) !important;
-  border-radius: 12px !important;
-}
-section[data-testid="stSidebar"] .stMultiSelect div[data-baseweb="select"]{
-  background: rgba(255,255,255,.06) !important;
-  border: 1px solid rgba(255,255,255,.10) !important;
-  border-radius: 12px !important;
-}
-section[data-testid="stSidebar"] .stSelectbox div[data-baseweb="select"]{
-  background: rgba(255,255,255,.06) !important;
-  border: 1px solid rgba(255,255,255,.10) !important;
-  border-radius: 12px !important;
-}
-section[data-testid="stSidebar"] button{
-  border-radius: 14px !important;
-}
-
-/* Headline blocks */
-.sg-hero{
-  padding: 22px 22px;
-  border: 1px solid var(--line);
-  border-radius: var(--radius);
-  background: linear-gradient(135deg, rgba(124,92,255,.20), rgba(0,212,255,.10));
-  box-shadow: var(--shadow);
-}
-.sg-hero h1{
-  font-size: 40px;
-  margin: 0;
-  letter-spacing: -0.02em;
-}
-.sg-hero p{
-  margin: 8px 0 0 0;
-  color: var(--muted);
-  font-size: 15px;
-  line-height: 1.5;
-}
-
-/* Section title */
-.sg-section{
-  margin-top: 18px;
-  margin-bottom: 8px;
-  display:flex;
-  align-items:center;
-  gap:10px;
-}
-.sg-pill{
-  font-size: 12px;
-  color: var(--ink);
-  padding: 6px 10px;
-  border-radius: 999px;
-  border: 1px solid var(--line);
-  background: rgba(255,255,255,.06);
-}
-.sg-section h2{
-  margin:0;
-  font-size: 18px;
-  letter-spacing: -0.01em;
-}
-.sg-sub{
-  color: var(--muted);
-  margin: 4px 0 0 0;
-  font-size: 13px;
-}
-
-/* Game card */
-.sg-card{
-  border: 1px solid var(--line);
-  border-radius: var(--radius);
-  background: linear-gradient(180deg, rgba(16,26,51,.85), rgba(12,19,36,.92));
-  box-shadow: var(--shadow);
-  overflow: hidden;
-}
-.sg-card .sg-cover{
-  width:100%;
-  height: 220px;
-  object-fit: cover;
-  display:block;
-  filter: saturate(1.05) contrast(1.03);
-}
-.sg-card .sg-body{
-  padding: 14px 14px 12px 14px;
-}
-.sg-title{
-  font-size: 18px;
-  margin: 0;
-  line-height: 1.2;
-}
-
-/* new: info block (same readability as content) */
-.sg-info{
-  margin-top: 10px;
-  padding: 10px 12px;
-  border-radius: 14px;
-  border: 1px solid rgba(255,255,255,.10);
-  background: rgba(255,255,255,.04);
-}
-.sg-info .sg-row{
-  margin: 0;
-  font-size: 13.5px;
-  line-height: 1.55;
-  color: var(--ink);
-}
-.sg-info .sg-key{
-  color: var(--muted);
-  font-weight: 600;
-}
-.sg-info .sg-val{
-  color: var(--ink);
-}
-
-/* content text */
-.sg-text{
-  margin-top: 10px;
-  color: var(--ink);
-  font-size: 13.5px;
-  line-height: 1.55;
-}
-.sg-muted{
-  color: var(--muted);
-}
-.sg-divider{
-  height: 1px;
-  background: var(--line);
-  margin: 12px 0;
-}
-
-/* Callout */
-.sg-callout{
-  border: 1px dashed rgba(255,255,255,.18);
-  border-radius: var(--radius);
-  padding: 12px 14px;
-  background: rgba(255,255,255,.03);
-  color: var(--muted);
-}
-
-/* Chat look */
-[data-testid="stChatMessage"]{
-  border-radius: 16px;
-  border: 1px solid var(--line);
-  background: rgba(255,255,255,.03);
-}
-
-/* Reduce default whitespace a bit */
-.block-container{
-  padding-top: 1.2rem;
-  padding-bottom: 2.0rem;
-}
-</style>
-"""
-st.markdown(MAGAZINE_CSS, unsafe_allow_html=True)
-
-
-# -----------------------------
-# Utilities
-# -----------------------------
-def build_openai_client(api_key: str) -> OpenAI:
-    return OpenAI(api_key=api_key)
-
-
-def safe_json_loads(s: str) -> Dict[str, Any]:
-    s = (s or "").strip()
-    if s.startswith("```"):
-        s = re.sub(r"^```[a-zA-Z]*\n?", "", s).strip()
-        s = re.sub(r"\n?```$", "", s).strip()
-    if "{" in s and "}" in s:
-        s2 = s[s.find("{") : s.rfind("}") + 1].strip()
-        try:
-            return json.loads(s2)
-        except Exception:
-            pass
-    return json.loads(s)
-
-
-def join_nonempty(items: List[str]) -> str:
-    items = [x.strip() for x in items if x and x.strip()]
-    return ", ".join(items)
-
-
-def map_platform_choice_to_rawg_tokens(platform_choice: str) -> List[str]:
-    mapping = {
-        "PC": ["PC"],
-        "PS": ["PlayStation"],
-        "Xbox": ["Xbox"],
-        "Switch": ["Nintendo Switch", "Nintendo"],
-        "모바일": ["Android", "iOS"],
-    }
-    return mapping.get(platform_choice, [])
-
-
-def platform_filter_pass(user_platforms: List[str], game_plats: List[str]) -> bool:
-    if not user_platforms:
-        return True
-    tokens: List[str] = []
-    for up in user_platforms:
-        tokens.extend(map_platform_choice_to_rawg_tokens(up))
-    gp = " | ".join(game_plats).lower()
-    return any(t.lower() in gp for t in tokens)
-
-
-# -----------------------------
-# RAWG API helpers (optional)
-# -----------------------------
-def rawg_get(rawg_key: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    if not rawg_key:
-        raise ValueError("RAWG API 키가 필요합니다.")
-    params = params or {}
-    params["key"] = rawg_key
-    url = f"{RAWG_BASE}{endpoint}"
-    r = requests.get(url, params=params, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.json()
-
-
-@st.cache_data(show_spinner=False, ttl=60 * 60 * 24)
-def rawg_search_top(rawg_key: str, query: str) -> Optional[Dict[str, Any]]:
-    data = rawg_get(
-        rawg_key,
-        "/games",
-        params={"search": query, "page_size": 5, "search_precise": True},
-    )
-    results = data.get("results") or []
-    return results[0] if results else None
-
-
-@st.cache_data(show_spinner=False, ttl=60 * 60 * 24)
-def rawg_game_detail(rawg_key: str, game_id: int) -> Dict[str, Any]:
-    return rawg_get(rawg_key, f"/games/{game_id}")
-
-
-def game_platforms(detail: Dict[str, Any]) -> List[str]:
-    out = []
-    for p in detail.get("platforms") or []:
-        name = (p.get("platform") or {}).get("name")
-        if name:
-            out.append(name)
-    # uniq preserve order
-    seen = set()
-    uniq = []
-    for x in out:
-        if x not in seen:
-            uniq.append(x)
-            seen.add(x)
-    return uniq
-
-
-def game_genres(detail: Dict[str, Any]) -> List[str]:
-    out = []
-    for g in detail.get("genres") or []:
-        name = g.get("name")
-        if name:
-            out.append(name)
-    return out
-
-
-# -----------------------------
-# Profile builder
-# -----------------------------
-def build_profile_text(
-    preferred_genres: List[str],
-    wanted_emotions: List[str],
-    wanted_free: str,
-    played_games: str,
-    platforms: List[str],
-    hours_per_day: float,
-) -> str:
-    free = wanted_free.strip()
-    wanted_part = join_nonempty(wanted_emotions) if wanted_emotions else "없음/미선택"
-    if free:
-        wanted_part = f"{wanted_part} + 자유입력: {free}" if wanted_part != "없음/미선택" else f"자유입력: {free}"
-
-    return f"""
-[사용자 선호 프로필]
-- 선호 장르: {join_nonempty(preferred_genres) if preferred_genres else "없음/미선택"}
-- 원하는 사항(플레이 경험/취향): {wanted_part}
-- 재미있게 플레이한 게임(참고): {played_games.strip() if played_games.strip() else "미입력"}
-- 선호 플랫폼/기기: {join_nonempty(platforms) if platforms else "없음/미선택"}
-- 하루 예상 플레이시간: {hours_per_day}시간
-""".strip()
-
-
-# -----------------------------
-# OpenAI steps
-# -----------------------------
-def openai_get_candidates(
-    client: OpenAI,
-    model: str,
-    system_instructions: str,
-    profile_text: str,
-    n: int,
-) -> List[str]:
-    prompt = f"""
-너는 게임 추천 전문가다.
-아래 프로필을 보고 사용자가 좋아할 가능성이 높은 "게임 후보 제목" {n}개를 뽑아라.
-
-규칙:
-- 출력은 "유효한 JSON" 하나만 출력. (설명/마크다운/코드펜스 금지)
-- 키는 candidates 하나만 사용: {{ "candidates": ["title1", ...] }}
-- candidates는 정확히 {n}개.
-- 게임 제목은 가능한 한 공식적으로 통용되는 영문/국문 제목으로.
-- 모호한 제목(시리즈명만 있는 것)은 피하고 가능한 구체적으로.
-
-{profile_text}
-""".strip()
-
-    resp = client.responses.create(model=model, instructions=system_instructions, input=prompt)
-    obj = safe_json_loads(resp.output_text)
-
-    cands = obj.get("candidates", [])
-    if not isinstance(cands, list) or len(cands) != n:
-        raise ValueError("후보 게임명 생성(JSON) 실패 또는 개수 불일치")
-
-    # dedupe
-    cands = [str(x).strip() for x in cands if str(x).strip()]
-    seen = set()
-    uniq: List[str] = []
-    for t in cands:
-        key = t.lower()
-        if key not in seen:
-            uniq.append(t)
-            seen.add(key)
-    return uniq[:n]
-
-
-def openai_select_from_facts(
-    client: OpenAI,
-    model: str,
-    system_instructions: str,
-    profile_text: str,
-    factual_games: List[Dict[str, Any]],
-) -> Dict[str, Any]:
-    compact = []
-    for g in factual_games:
-        compact.append(
-            {
-                "id": g["id"],
-                "name": g["name"],
-                "released": g.get("released"),
-                "genres": g.get("genres", []),
-                "platforms": g.get("platforms", []),
-                "metacritic": g.get("metacritic"),
-                "rating": g.get("rating"),
-            }
-        )
-
-    schema_hint = {
-        "selected": [
-            {
-                "id": 123,
-                "one_liner": "string (한줄 추천, 1~2문장)",
-                "why_for_user": "string (사용자 입력과 연결해 2~4문장)",
-                "summary_memo": "string (요약/메모: 더 길게. 루프/톤/팁/주의점/추천 상황 포함)",
-            }
-        ],
-        "summary": "string",
-        "price_disclaimer": "string",
-    }
-
-    prompt = f"""
-너는 'Select Game'의 편집장(게임 잡지 스타일)이다.
-아래 [사용자 선호 프로필]과 [게임 팩트 목록]을 보고, 정말 잘 맞는 게임만 selected에 담아라.
-
-핵심 규칙:
-- 추천 개수를 억지로 채우지 마라. 확신이 낮으면 제외한다. (보통 2~8개)
-- selected의 id는 반드시 팩트 목록에 존재해야 한다.
-- 출력은 "유효한 JSON" 하나만 출력. (설명/마크다운/코드펜스 금지)
-- JSON 키는 스키마 예시와 동일하게.
-- one_liner: 1~2문장
-- why_for_user: 사용자의 입력(선호 장르/원하는 사항/플랫폼/플레이시간/재밌게 한 게임)과 "왜 어울리는지"를 연결해서 2~4문장
-- summary_memo는 분량을 더 주고, 아래 요소를 가능하면 포함:
-  1) 핵심 재미 루프
-  2) 분위기/톤
-  3) 플레이 팁 1개
-  4) 주의점 1개
-
-[JSON 스키마 예시]
-{json.dumps(schema_hint, ensure_ascii=False, indent=2)}
-
-[사용자 선호 프로필]
-{profile_text}
-
-[게임 팩트 목록]
-{json.dumps(compact, ensure_ascii=False)}
-""".strip()
-
-    resp = client.responses.create(model=model, instructions=system_instructions, input=prompt)
-    text = (resp.output_text or "").strip()
-
-    try:
-        obj = safe_json_loads(text)
-    except Exception:
-        fix_prompt = f"""
-아래 출력은 JSON 파싱에 실패했거나 조건을 어겼다.
-반드시 "유효한 JSON" 하나만 출력해서 수정해라. 다른 텍스트 금지.
-조건: selected의 id는 팩트 목록의 id만 사용.
-
-[잘못된 출력]
-{text}
-""".strip()
-        resp2 = client.responses.create(model=model, instructions=system_instructions, input=fix_prompt)
-        obj = safe_json_loads(resp2.output_text)
-
-    if not isinstance(obj.get("selected", None), list):
-        raise ValueError("선정 결과 JSON 형식이 올바르지 않습니다.")
-    return obj
-
-
-def openai_select_fallback_no_rawg(
-    client: OpenAI,
-    model: str,
-    system_instructions: str,
-    profile_text: str,
-    max_recs: int,
-) -> Dict[str, Any]:
-    schema_hint = {
-        "selected": [
-            {
-                "name": "string",
-                "released": "string or empty",
-                "genres": "string or empty",
-                "platforms": "string or empty",
-                "one_liner": "string (한줄 추천, 1~2문장)",
-                "why_for_user": "string (사용자 입력과 연결해 2~4문장)",
-                "summary_memo": "string (요약/메모: 길게. 루프/톤/팁/주의점/추천 상황)",
-            }
-        ],
-        "summary": "string",
-        "accuracy_note": "string",
-    }
-
-    prompt = f"""
-너는 'Select Game'의 편집장(게임 잡지 스타일)이다.
-현재 외부 게임 DB(RAWG)가 없으므로, 게임 '정보 정확도'는 보수적으로 다뤄야 한다.
-
-규칙:
-- 추천 개수를 억지로 채우지 마라. 확신이 낮으면 제외한다. (0~{max_recs}개)
-- 출력은 "유효한 JSON" 하나만. (설명/마크다운/코드펜스 금지)
-- JSON 키는 스키마 예시와 동일하게.
-- released/genres/platforms는 '확실할 때만' 채우고, 애매하면 빈 문자열로 둔다.
-- one_liner: 1~2문장
-- why_for_user: 사용자 입력과 연결해 2~4문장
-- summary_memo: 루프/톤/팁/주의점/추천 상황을 포함해 길게
-- accuracy_note: RAWG 키를 넣으면 정보 정확도가 올라간다는 안내를 1~2문장
-
-[JSON 스키마 예시]
-{json.dumps(schema_hint, ensure_ascii=False, indent=2)}
-
-[사용자 선호 프로필]
-{profile_text}
-""".strip()
-
-    resp = client.responses.create(model=model, instructions=system_instructions, input=prompt)
-    text = (resp.output_text or "").strip()
-
-    try:
-        obj = safe_json_loads(text)
-    except Exception:
-        fix_prompt = f"""
-아래 출력은 JSON 파싱에 실패했거나 조건을 어겼다.
-반드시 "유효한 JSON" 하나만 출력해서 수정해라. 다른 텍스트 금지.
-조건: selected는 0~{max_recs}개.
-
-[잘못된 출력]
-{text}
-""".strip()
-        resp2 = client.responses.create(model=model, instructions=system_instructions, input=fix_prompt)
-        obj = safe_json_loads(resp2.output_text)
-
-    sel = obj.get("selected", [])
-    if not isinstance(sel, list):
-        raise ValueError("추천 결과 JSON 형식이 올바르지 않습니다.")
-    obj["selected"] = sel[:max_recs]
-    return obj
-
-
-def openai_chat(
-    client: OpenAI,
-    model: str,
-    system_instructions: str,
-    messages: List[Dict[str, str]],
-) -> str:
-    convo = []
-    for m in messages[-20:]:
-        convo.append(f"{m['role'].upper()}: {m['content']}")
-    resp = client.responses.create(model=model, instructions=system_instructions, input="\n".join(convo))
-    return (resp.output_text or "").strip()
-
-
-# -----------------------------
-# Sidebar (controls)
-# -----------------------------
-with st.sidebar:
-    st.markdown("## 🎮 Select Game")
-    st.caption("게임 잡지 느낌 UI로 ‘확신 있는 게임만’ 추천합니다.")
-    st.markdown("---")
-
-    st.markdown("### 🔑 Keys")
-    openai_key = st.text_input("OpenAI API Key", type="password", placeholder="sk-...")
-
-    rawg_key = st.text_input(
-        "RAWG API Key (선택)",
-        type="password",
-        placeholder="없어도 사용 가능",
-        help="RAWG 키를 넣으면 표지/출시일/장르/플랫폼 같은 게임 정보 정확도가 올라갑니다.",
-    )
-
-    st.markdown(
-        """
-<div class="sg-callout">
-<b>RAWG 키는 필수 아님.</b><br>
-키가 없으면 추천은 가능하지만, 출시일/플랫폼/장르/표지 같은 정보는 제한적으로 표시됩니다.
-</div>
-""",
-        unsafe_allow_html=True,
-    )
-
-    st.markdown("---")
-    st.markdown("### 🧩 취향 입력")
-
-    GENRES = ["액션 게임", "슈팅 게임", "어드벤쳐 게임", "전략 게임", "롤플레잉 게임", "퍼즐 게임", "음악게임"]
-    WANTED_EMOTIONS = ["힐링", "성장", "경쟁", "공포", "수집", "몰입 스토리"]
-    PLATFORMS = ["PC", "PS", "Xbox", "Switch", "모바일"]
-
-    preferred_genres = st.multiselect("선호 장르", GENRES, default=[])
-
-    wanted_emotions = st.multiselect("원하는 감정(선지)", WANTED_EMOTIONS, default=[])
-    wanted_free = st.text_input(
-        "원하는 사항(자유 입력)",
-        placeholder="예: 코옵이면 좋음, 멀미 없는 3D, 스토리 위주, 초보도 괜찮은 난이도…",
-    )
-
-    played_games = st.text_area(
-        "재미있게 플레이한 게임",
-        placeholder="예: Hades, Zelda: BOTW, Slay the Spire …",
-        height=90,
-    )
-
-    platforms = st.multiselect("플랫폼/기기", PLATFORMS, default=[])
-
-    hours_per_day = st.number_input(
-        "하루 예상 플레이시간(시간)",
-        min_value=0.0,
-        max_value=24.0,
-        value=1.5,
-        step=0.5,
-    )
-
-    st.markdown("---")
-    model = st.selectbox(
-        "모델",
-        options=["gpt-4.1-mini", "gpt-4.1", "gpt-5", "gpt-5.2"],
-        index=0,
-    )
-
-    get_recs = st.button("📰 오늘의 추천호 발행", use_container_width=True)
-
-
-# -----------------------------
-# Main (Hero)
-# -----------------------------
-st.markdown(
-    """
-<div class="sg-hero">
-  <h1>SELECT GAME</h1>
-  <p>사용자의 조건에 딱 알맞은 명작 게임을 추천해드립니다:)</p>
-</div>
-""",
-    unsafe_allow_html=True,
-)
-
-profile_text = build_profile_text(
-    preferred_genres=preferred_genres,
-    wanted_emotions=wanted_emotions,
-    wanted_free=wanted_free,
-    played_games=played_games,
-    platforms=platforms,
-    hours_per_day=float(hours_per_day),
-)
-
-system_instructions = """
-너는 'Select Game'이라는 게임 추천 챗봇이다.
-- 한국어로 답한다.
-- 사용자의 선호 장르, 원하는 사항(자유입력 포함), 플레이한 게임, 플랫폼, 하루 플레이시간을 최우선 반영한다.
-- 추천 개수는 억지로 채우지 않는다. 확신이 낮으면 제외한다.
-- 문체는 게임 잡지 편집장처럼: 짧고 임팩트 있게, 그러나 과장/허위는 금지.
-""".strip()
-
-
-# Session state
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {"role": "assistant", "content": "원하는 조건을 더 붙여줘도 좋아. 그 조건에 딱 맞는 라인업으로 다시 짜줄게."}
-    ]
-if "recommendations" not in st.session_state:
-    st.session_state.recommendations = None
-if "rawg_mode" not in st.session_state:
-    st.session_state.rawg_mode = False
-
-
-# -----------------------------
-# Recommendation Flow
-# -----------------------------
-if get_recs:
-    if not openai_key:
-        st.error("OpenAI API 키를 먼저 입력해줘.")
-    else:
-        try:
-            client = build_openai_client(openai_key)
-
-            rawg_enabled = bool(rawg_key.strip())
-            st.session_state.rawg_mode = rawg_enabled
-
-            if rawg_enabled:
-                with st.spinner("1) 후보 게임명 수집 중..."):
-                    candidates = openai_get_candidates(
-                        client=client,
-                        model=model,
-                        system_instructions=system_instructions + "\n" + profile_text,
-                        profile_text=profile_text,
-                        n=CANDIDATE_COUNT,
-                    )
-
-                with st.spinner("2) RAWG에서 팩트 확정 중..."):
-                    factual: List[Dict[str, Any]] = []
-                    seen_ids = set()
-
-                    for title in candidates:
-                        top = rawg_search_top(rawg_key, title)
-                        if not top or not top.get("id"):
-                            continue
-
-                        gid = int(top["id"])
-                        if gid in seen_ids:
-                            continue
-
-                        detail = rawg_game_detail(rawg_key, gid)
-                        plats = game_platforms(detail)
-
-                        if not platform_filter_pass(platforms, plats):
-                            continue
-
-                        seen_ids.add(gid)
-                        factual.append(
-                            {
-                                "id": gid,
-                                "name": detail.get("name") or top.get("name") or title,
-                                "released": detail.get("released"),
-                                "genres": game_genres(detail),
-                                "platforms": plats,
-                                "metacritic": detail.get("metacritic"),
-                                "rating": detail.get("rating"),
-                                "background_image": detail.get("background_image"),
-                            }
-                        )
-
-                        if len(factual) >= RAWG_MATCH_LIMIT:
-                            break
-
-                    if not factual:
-                        raise ValueError(
-                            "RAWG에서 매칭되는 게임을 찾지 못했습니다. 플랫폼 선택을 완화하거나, '재미있게 플레이한 게임'에 힌트를 더 넣어봐."
-                        )
-
-                with st.spinner("3) 확신 있는 게임만 선별/원고 작성 중..."):
-                    picked_obj = openai_select_from_facts(
-                        client=client,
-                        model=model,
-                        system_instructions=system_instructions + "\n" + profile_text,
-                        profile_text=profile_text,
-                        factual_games=factual,
-                    )
-
-                fact_map = {g["id"]: g for g in factual}
-                selected_merged: List[Dict[str, Any]] = []
-                for s in picked_obj.get("selected", []):
-                    try:
-                        gid = int(s.get("id"))
-                    except Exception:
-                        continue
-                    if gid in fact_map:
-                        selected_merged.append({**fact_map[gid], **s})
-
-                st.session_state.recommendations = {
-                    "selected": selected_merged,
-                    "summary": picked_obj.get("summary", ""),
-                    "note": picked_obj.get("price_disclaimer", ""),
-                }
-
-            else:
-                with st.spinner("추천 원고 작성 중... (RAWG 없이 실행)"):
-                    picked_obj = openai_select_fallback_no_rawg(
-                        client=client,
-                        model=model,
-                        system_instructions=system_instructions + "\n" + profile_text,
-                        profile_text=profile_text,
-                        max_recs=FALLBACK_MAX_RECS,
-                    )
-
-                st.session_state.recommendations = {
-                    "selected": picked_obj.get("selected", []),
-                    "summary": picked_obj.get("summary", ""),
-                    "note": picked_obj.get("accuracy_note", ""),
-                }
-
-        except Exception as e:
-            st.session_state.recommendations = None
-            st.error(f"추천 생성 실패: {e}")
-
-
-# -----------------------------
-# Render Issue
-# -----------------------------
-recs_obj = st.session_state.recommendations
-
-st.markdown(
-    """
-<div class="sg-section">
-  <span class="sg-pill">ISSUE</span>
-  <h2>오늘의 추천 지면</h2>
-</div>
-<p class="sg-sub">추천은 확신 있는 게임만.</p>
-""",
-    unsafe_allow_html=True,
-)
-
-if recs_obj is not None:
-    if recs_obj.get("note"):
-        st.caption(recs_obj["note"])
-
-    selected = recs_obj.get("selected", [])
-    if not selected:
-        st.warning("이번 조건에선 확신 있게 추천할 게임이 부족했어. 원하는 사항(자유입력)에 조건을 더 넣어줘.")
-    else:
-        cols = st.columns(3, gap="large")
-
-        for idx, g in enumerate(selected):
-            col = cols[idx % 3]
-            with col:
-                cover = g.get("background_image") if st.session_state.rawg_mode else None
-
-                title = g.get("name") or g.get("title") or ""
-                released = g.get("released") or ""
-                genres = ""
-                plats = ""
-
-                mc = None
-                rawg_rating = None
-
-                if st.session_state.rawg_mode:
-                    genres = ", ".join(g.get("genres", [])) if isinstance(g.get("genres"), list) else ""
-                    plats = ", ".join(g.get("platforms", [])) if isinstance(g.get("platforms"), list) else ""
-                    mc = g.get("metacritic")
-                    rawg_rating = g.get("rating")
-                else:
-                    genres = g.get("genres", "") or ""
-                    plats = g.get("platforms", "") or ""
-
-                one_liner = (g.get("one_liner") or "").strip()
-                why_for_user = (g.get("why_for_user") or "").strip()
-                memo = (g.get("summary_memo") or "").strip()
-
-                # info rows (bigger & placed above one-liner)
-                row_release = f"<p class='sg-row'><span class='sg-key'>출시</span>: <span class='sg-val'>{released}</span></p>" if released else ""
-                row_genre = f"<p class='sg-row'><span class='sg-key'>장르</span>: <span class='sg-val'>{genres}</span></p>" if genres else ""
-                row_plat = f"<p class='sg-row'><span class='sg-key'>플랫폼</span>: <span class='sg-val'>{plats}</span></p>" if plats else ""
-
-                row_scores = ""
-                score_bits = []
-                if mc is not None:
-                    score_bits.append(f"MC {mc}")
-                if rawg_rating is not None:
-                    score_bits.append(f"RAWG {rawg_rating}")
-                if score_bits:
-                    row_scores = f"<p class='sg-row'><span class='sg-key'>스코어</span>: <span class='sg-val'>{' · '.join(score_bits)}</span></p>"
-
-                info_block = ""
-                if row_release or row_genre or row_plat or row_scores:
-                    info_block = f"""
-<div class="sg-info">
-  {row_release}
-  {row_scores}
-  {row_genre}
-  {row_plat}
-</div>
-"""
-
-                card_html = f"""
-<div class="sg-card">
-  {f'<img class="sg-cover" src="{cover}" />' if cover else ''}
-  <div class="sg-body">
-    <h3 class="sg-title">{idx+1}. {title}</h3>
-
-    {info_block}
-
-    <div class="sg-divider"></div>
-
-    <div class="sg-text">
-      <b>한줄 추천</b><br>
-      <span class="sg-muted">{one_liner if one_liner else "—"}</span>
-    </div>
-
-    <div class="sg-text">
-      <b>사용자에게 추천하는 이유</b><br>
-      <span class="sg-muted">{why_for_user if why_for_user else "—"}</span>
-    </div>
-
-    <div class="sg-text">
-      <b>요약/메모</b><br>
-      <span class="sg-muted">{memo if memo else "—"}</span>
-    </div>
-  </div>
-</div>
-"""
-                st.html(card_html)
-
-        if recs_obj.get("summary"):
-            st.markdown(
-                """
-<div class="sg-section">
-  <span class="sg-pill">EDITOR'S NOTE</span>
-  <h2>편집장 메모</h2>
-</div>
-""",
-                unsafe_allow_html=True,
-            )
-            st.info(recs_obj["summary"])
-
-
-# -----------------------------
-# Chat (Q&A corner)
-# -----------------------------
-st.markdown(
-    """
-<div class="sg-section">
-  <span class="sg-pill">Q&A</span>
-  <h2>추가 요청</h2>
-</div>
-<p class="sg-sub">예: “추천 중에서 스위치로만 다시”, “난이도 낮은 쪽만”, “코옵 가능한 것만”</p>
-""",
-    unsafe_allow_html=True,
-)
-
-for m in st.session_state.messages:
-    with st.chat_message(m["role"]):
-        st.markdown(m["content"])
-
-user_text = st.chat_input("조건을 더 추가해줘 (예: ‘멀미 없는 1인칭’, ‘로그라이크는 제외’)")
-
-if user_text:
-    st.session_state.messages.append({"role": "user", "content": user_text})
-    with st.chat_message("user"):
-        st.markdown(user_text)
-
-    if not openai_key:
-        assistant_text = "OpenAI API 키가 없어요. 사이드바에 입력해줘."
-        st.session_state.messages.append({"role": "assistant", "content": assistant_text})
-        with st.chat_message("assistant"):
-            st.markdown(assistant_text)
-    else:
-        try:
-            client = build_openai_client(openai_key)
-            with st.spinner("답변 작성 중..."):
-                assistant_text = openai_chat(
-                    client=client,
-                    model=model,
-                    system_instructions=system_instructions + "\n" + profile_text,
-                    messages=st.session_state.messages,
-                )
-            st.session_state.messages.append({"role": "assistant", "content": assistant_text})
-            with st.chat_message("assistant"):
-                st.markdown(assistant_text)
-        except Exception as e:
-            err = f"오류: {e}"
-            st.session_state.messages.append({"role": "assistant", "content": err})
-            with st.chat_message("assistant"):
-                st.markdown(err)
+# app.py
+import html
+import json
+import os
+import time
+from contextlib import contextmanager
+from string import Template
+from typing import Any, Dict, Iterator, List, Optional
+
+import streamlit as st
+
+from engine import (
+    ChatContext,
+    DEFAULT_MODEL,
+    GENRES,
+    ISSUE_RESULT_KEYS,
+    MODELS,
+    PIPELINE_CANDIDATES,
+    PLATFORMS,
+    SYSTEM_INSTRUCTIONS,
+    Span,
+    WANTED_EMOTIONS,
+    app_counters,
+    build_openai_client,
+    build_profile_text,
+    cover_mode,
+    cover_sources,
+    issue_cache,
+    issue_fingerprint,
+    job_manager,
+    limiter_stats,
+    openai_chat,
+    openai_client_registry,
+    prompt_token_reports,
+    rawg_alias_index,
+    rawg_fact_cache,
+    rawg_breaker,
+    rawg_pool_stats,
+    semantic_issue_cache,
+    session_scope,
+    submit_recommendation,
+    thumbnail_cache,
+    tracer,
+)
+
+
+# -----------------------------
+# App Config
+# -----------------------------
+st.set_page_config(
+    page_title="Select Game",
+    page_icon="🎮",
+    layout="wide",
+    initial_sidebar_state="expanded",
+)
+
+
+# -----------------------------
+# Rerun metrics (per session)
+# -----------------------------
+# 전체 재실행(app)과 조각 단독 재실행(issue/chat/job)을 나눠 횟수와 소요 시간을 센다
+rerun_t0 = time.perf_counter()
+if "rerun_stats" not in st.session_state:
+    st.session_state.rerun_stats = {}
+if "render_stats" not in st.session_state:
+    st.session_state.render_stats = {}
+
+
+def record_rerun(scope: str, ms: float) -> None:
+    stats = st.session_state.rerun_stats.setdefault(scope, {"count": 0, "total_ms": 0.0, "last_ms": 0.0, "max_ms": 0.0})
+    stats["count"] += 1
+    stats["total_ms"] += ms
+    stats["last_ms"] = ms
+    stats["max_ms"] = max(stats["max_ms"], ms)
+    app_counters().inc(f'ui_reruns_total{{scope="{scope}"}}')
+    tracer().observe(f"ui.rerun.{scope}", ms)
+
+
+@contextmanager
+def full_run() -> Iterator[None]:
+    # 전체 재실행에서 조각을 부르는 동안만 True. 도중에 rerun/예외로 끊겨도 되돌려 놓는다
+    st.session_state.in_full_run = True
+    try:
+        yield
+    finally:
+        st.session_state.in_full_run = False
+
+
+@contextmanager
+def fragment_rerun(scope: str) -> Iterator[None]:
+    # 전체 재실행 안에서 도는 조각은 app 에 포함되므로 조각만 단독으로 다시 돌 때만 기록
+    standalone = not st.session_state.get("in_full_run", False)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if standalone:
+            record_rerun(scope, (time.perf_counter() - t0) * 1000)
+
+
+# -----------------------------
+# Magazine UI (CSS)
+# -----------------------------
+MAGAZINE_CSS = """
+<style>
+:root{
+  --bg:#0b0f19;
+  --ink:#e8eefc;
+  --muted:#9fb0d0;
+  --card:#101a33;
+  --line:rgba(255,255,255,0.08);
+  --shadow: 0 14px 40px rgba(0,0,0,.35);
+  --radius: 18px;
+}
+
+/* App background */
+.stApp{
+  background: radial-gradient(1200px 600px at 10% 0%, rgba(124,92,255,.22), transparent 60%),
+              radial-gradient(900px 500px at 90% 15%, rgba(0,212,255,.16), transparent 55%),
+              linear-gradient(180deg, var(--bg), #070a12);
+  color: var(--ink);
+}
+
+/* Sidebar */
+section[data-testid="stSidebar"]{
+  background: linear-gradient(180deg, rgba(15,22,40,.96), rgba(10,15,25,.96));
+  border-right: 1px solid var(--line);
+}
+section[data-testid="stSidebar"] *{
+  color: var(--ink);
+}
+section[data-testid="stSidebar"] .stTextInput input,
+section[data-testid="stSidebar"] .stTextArea textarea,
+section[data-testid="stSidebar"] .stNumberInput input{
+  background: rgba(255,255,255,.06) !important;
+  border: 1px solid rgba(255,255,255,.10) !important;
+  color: var(--ink) !important;
+  border-radius: 12px !important;
+}
+section[data-testid="stSidebar"] .stMultiSelect div[data-baseweb="select"]{
+  background: rgba(255,255,255,.06) !important;
+  border: 1px solid rgba(255,255,255,.10) !important;
+  border-radius: 12px !important;
+}
+section[data-testid="stSidebar"] .stSelectbox div[data-baseweb="select"]{
+  background: rgba(255,255,255,.06) !important;
+  border: 1px solid rgba(255,255,255,.10) !important;
+  border-radius: 12px !important;
+}
+section[data-testid="stSidebar"] button{
+  border-radius: 14px !important;
+}
+
+/* Headline blocks */
+.sg-hero{
+  padding: 22px 22px;
+  border: 1px solid var(--line);
+  border-radius: var(--radius);
+  background: linear-gradient(135deg, rgba(124,92,255,.20), rgba(0,212,255,.10));
+  box-shadow: var(--shadow);
+}
+.sg-hero h1{
+  font-size: 40px;
+  margin: 0;
+  letter-spacing: -0.02em;
+}
+.sg-hero p{
+  margin: 8px 0 0 0;
+  color: var(--muted);
+  font-size: 15px;
+  line-height: 1.5;
+}
+
+/* Section title */
+.sg-section{
+  margin-top: 18px;
+  margin-bottom: 8px;
+  display:flex;
+  align-items:center;
+  gap:10px;
+}
+.sg-pill{
+  font-size: 12px;
+  color: var(--ink);
+  padding: 6px 10px;
+  border-radius: 999px;
+  border: 1px solid var(--line);
+  background: rgba(255,255,255,.06);
+}
+.sg-pill-cache{
+  border-color: rgba(0,212,255,.45);
+  background: rgba(0,212,255,.12);
+}
+.sg-section h2{
+  margin:0;
+  font-size: 18px;
+  letter-spacing: -0.01em;
+}
+.sg-sub{
+  color: var(--muted);
+  margin: 4px 0 0 0;
+  font-size: 13px;
+}
+
+/* Game card */
+.sg-card{
+  border: 1px solid var(--line);
+  border-radius: var(--radius);
+  background: linear-gradient(180deg, rgba(16,26,51,.85), rgba(12,19,36,.92));
+  box-shadow: var(--shadow);
+  overflow: hidden;
+}
+.sg-card .sg-cover{
+  width:100%;
+  height: 220px;
+  object-fit: cover;
+  display:block;
+  filter: saturate(1.05) contrast(1.03);
+}
+.sg-card .sg-body{
+  padding: 14px 14px 12px 14px;
+}
+.sg-title{
+  font-size: 18px;
+  margin: 0;
+  line-height: 1.2;
+}
+
+/* Card grid: 3 columns in one block, stacked on narrow screens */
+.sg-grid{
+  display:flex;
+  gap: 2rem;
+  align-items:flex-start;
+}
+.sg-col{
+  flex: 1 1 0;
+  min-width: 0;
+  display:flex;
+  flex-direction:column;
+  gap: 1rem;
+}
+@media (max-width: 900px){
+  .sg-grid{ flex-direction:column; }
+}
+
+/* new: info block (same readability as content) */
+.sg-info{
+  margin-top: 10px;
+  padding: 10px 12px;
+  border-radius: 14px;
+  border: 1px solid rgba(255,255,255,.10);
+  background: rgba(255,255,255,.04);
+}
+.sg-info .sg-row{
+  margin: 0;
+  font-size: 13.5px;
+  line-height: 1.55;
+  color: var(--ink);
+}
+.sg-info .sg-key{
+  color: var(--muted);
+  font-weight: 600;
+}
+.sg-info .sg-val{
+  color: var(--ink);
+}
+
+/* content text */
+.sg-text{
+  margin-top: 10px;
+  color: var(--ink);
+  font-size: 13.5px;
+  line-height: 1.55;
+}
+.sg-muted{
+  color: var(--muted);
+}
+.sg-divider{
+  height: 1px;
+  background: var(--line);
+  margin: 12px 0;
+}
+
+/* Debug waterfall */
+.sg-wf{
+  font-size: 11px;
+  color: var(--ink);
+}
+.sg-wf-total{
+  color: var(--muted);
+  margin-bottom: 6px;
+}
+.sg-wf-row{
+  display:flex;
+  align-items:center;
+  gap:6px;
+  margin: 2px 0;
+}
+.sg-wf-label{
+  width: 42%;
+  white-space: nowrap;
+  overflow: hidden;
+  text-overflow: ellipsis;
+}
+.sg-wf-track{
+  position: relative;
+  flex: 1;
+  height: 10px;
+  border-radius: 4px;
+  background: rgba(255,255,255,.05);
+}
+.sg-wf-bar{
+  position: absolute;
+  top: 0;
+  bottom: 0;
+  border-radius: 4px;
+  background: rgba(0,212,255,.65);
+}
+.sg-wf-bar.err{
+  background: rgba(255,90,90,.75);
+}
+.sg-wf-ms{
+  width: 48px;
+  text-align: right;
+  color: var(--muted);
+}
+
+/* Callout */
+.sg-callout{
+  border: 1px dashed rgba(255,255,255,.18);
+  border-radius: var(--radius);
+  padding: 12px 14px;
+  background: rgba(255,255,255,.03);
+  color: var(--muted);
+}
+
+/* Chat look */
+[data-testid="stChatMessage"]{
+  border-radius: 16px;
+  border: 1px solid var(--line);
+  background: rgba(255,255,255,.03);
+}
+
+/* Reduce default whitespace a bit */
+.block-container{
+  padding-top: 1.2rem;
+  padding-bottom: 2.0rem;
+}
+</style>
+"""
+st.markdown(MAGAZINE_CSS, unsafe_allow_html=True)
+
+
+# -----------------------------
+# Card rendering
+# -----------------------------
+# 템플릿은 모듈 로드 때 한 번만 만든다. 값은 모두 html.escape 를 거쳐 들어간다 (모델이 쓴 글 포함)
+CARD_TEMPLATE = Template(
+    """<div class="sg-card">$cover<div class="sg-body">"""
+    """<h3 class="sg-title">$num. $title</h3>$info<div class="sg-divider"></div>"""
+    """<div class="sg-text"><b>한줄 추천</b><br><span class="sg-muted">$one_liner</span></div>"""
+    """<div class="sg-text"><b>사용자에게 추천하는 이유</b><br><span class="sg-muted">$why_for_user</span></div>"""
+    """<div class="sg-text"><b>요약/메모</b><br><span class="sg-muted">$memo</span></div>"""
+    """</div></div>"""
+)
+# 첫 줄 카드 표지만 바로 받고 나머지는 화면에 가까워질 때 (loading=lazy). sizes 는 3열/1열 레이아웃 기준
+COVER_TEMPLATE = Template(
+    '<img class="sg-cover" src="$src"$srcset sizes="(max-width: 900px) 100vw, 33vw"'
+    ' loading="$loading" decoding="async" width="640" height="220" alt="" />'
+)
+INFO_ROW_TEMPLATE = Template("<p class='sg-row'><span class='sg-key'>$key</span>: <span class='sg-val'>$val</span></p>")
+GRID_COLUMNS = 3
+
+
+def _esc(value: Any) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def _join_list(value: Any) -> str:
+    return ", ".join(str(x) for x in value) if isinstance(value, list) else str(value or "")
+
+
+def cover_img_html(idx: int, attrs: Dict[str, str]) -> str:
+    srcset = f' srcset="{_esc(attrs["srcset"])}"' if attrs.get("srcset") else ""
+    return COVER_TEMPLATE.substitute(src=_esc(attrs["src"]), srcset=srcset, loading="eager" if idx < GRID_COLUMNS else "lazy")
+
+
+def render_card_html(idx: int, g: Dict[str, Any], rawg_mode: bool, covers: Optional[Dict[str, Dict[str, str]]] = None) -> str:
+    cover = g.get("background_image") if rawg_mode else None
+    if cover and covers is None:
+        covers = cover_sources([cover])
+    title = g.get("name") or g.get("title") or ""
+
+    score_bits = []
+    if rawg_mode:
+        if g.get("metacritic") is not None:
+            score_bits.append(f"MC {g['metacritic']}")
+        if g.get("rating") is not None:
+            score_bits.append(f"RAWG {g['rating']}")
+        genres = _join_list(g.get("genres")) if isinstance(g.get("genres"), list) else ""
+        plats = _join_list(g.get("platforms")) if isinstance(g.get("platforms"), list) else ""
+    else:
+        genres = _join_list(g.get("genres"))
+        plats = _join_list(g.get("platforms"))
+
+    # 출시 -> 스코어 -> 장르 -> 플랫폼 순, 값이 있는 줄만
+    rows = [
+        ("출시", g.get("released") or ""),
+        ("스코어", " · ".join(score_bits)),
+        ("장르", genres),
+        ("플랫폼", plats),
+    ]
+    info = "".join(INFO_ROW_TEMPLATE.substitute(key=k, val=_esc(v)) for k, v in rows if v)
+
+    return CARD_TEMPLATE.substitute(
+        cover=cover_img_html(idx, covers[cover]) if cover else "",
+        num=idx + 1,
+        title=_esc(title),
+        info=f'<div class="sg-info">{info}</div>' if info else "",
+        one_liner=_esc((g.get("one_liner") or "").strip() or "—"),
+        why_for_user=_esc((g.get("why_for_user") or "").strip() or "—"),
+        memo=_esc((g.get("summary_memo") or "").strip() or "—"),
+    )
+
+
+def render_grid_html(cards: List[Dict[str, Any]], rawg_mode: bool) -> str:
+    """카드 전체를 3열 그리드 HTML 하나로 (st.html 한 번 = 델타 하나). 열 배치는 st.columns 때와 같다(idx % 3)."""
+    # 표지는 지면 단위로 한 번에 변환 (local 모드면 썸네일을 동시에 받는다)
+    covers = cover_sources(g.get("background_image") for g in cards) if rawg_mode else {}
+    cols: List[List[str]] = [[] for _ in range(GRID_COLUMNS)]
+    for idx, g in enumerate(cards):
+        cols[idx % GRID_COLUMNS].append(render_card_html(idx, g, rawg_mode, covers))
+    return '<div class="sg-grid">' + "".join(f'<div class="sg-col">{"".join(c)}</div>' for c in cols) + "</div>"
+
+
+def emit_grid(cards: List[Dict[str, Any]], rawg_mode: bool, scope: str) -> None:
+    # 그리드를 한 번에 내보내고 렌더 시간/바이트를 세션 통계에 남긴다
+    t0 = time.perf_counter()
+    grid_html = render_grid_html(cards, rawg_mode)
+    ms = (time.perf_counter() - t0) * 1000
+    size = len(grid_html.encode("utf-8"))
+    st.html(grid_html)
+    st.session_state.render_stats[scope] = {"cards": len(cards), "render_ms": round(ms, 2), "bytes": size, "deltas": 1}
+    app_counters().inc(f'ui_render_bytes_total{{scope="{scope}"}}', size)
+    tracer().observe(f"ui.render.{scope}", ms)
+
+
+def render_waterfall_html(spans: List[Dict[str, Any]]) -> str:
+    # 한 실행(trace)의 span 들을 시작 시각 기준 막대로 (들여쓰기 = 부모/자식 깊이)
+    t0 = min(r["start"] for r in spans)
+    t1 = max(r["start"] + r["duration_ms"] / 1000 for r in spans)
+    total_ms = max((t1 - t0) * 1000, 1e-3)
+    depth: Dict[str, int] = {}
+    by_id = {r["span_id"]: r for r in spans}
+
+    def span_depth(r: Dict[str, Any]) -> int:
+        if r["span_id"] not in depth:
+            parent = by_id.get(r["parent_id"])
+            depth[r["span_id"]] = span_depth(parent) + 1 if parent else 0
+        return depth[r["span_id"]]
+
+    rows = []
+    for r in spans:
+        left = (r["start"] - t0) * 1000 / total_ms * 100
+        width = max(r["duration_ms"] / total_ms * 100, 0.4)
+        label = r["name"] + (f" · {r['attrs']['title']}" if r["attrs"].get("title") else "")
+        tip = html.escape(json.dumps(r["attrs"], ensure_ascii=False, default=str), quote=True)
+        err = " err" if r["status"] != "ok" else ""
+        rows.append(
+            f'<div class="sg-wf-row" title="{tip}">'
+            f'<div class="sg-wf-label" style="padding-left:{span_depth(r) * 8}px">{html.escape(label)}</div>'
+            f'<div class="sg-wf-track"><div class="sg-wf-bar{err}" style="left:{left:.2f}%;width:{width:.2f}%"></div></div>'
+            f'<div class="sg-wf-ms">{r["duration_ms"]:.0f}ms</div>'
+            "</div>"
+        )
+    return f'<div class="sg-wf"><div class="sg-wf-total">전체 {total_ms / 1000:.2f}s · span {len(spans)}개</div>{"".join(rows)}</div>'
+
+
+# -----------------------------
+# Sidebar (controls)
+# -----------------------------
+def consume_force_refresh() -> None:
+    # 발행 버튼 콜백 (재실행 전에 돈다): 체크 값은 이번 발행에만 쓰고 체크박스는 바로 되돌린다
+    st.session_state.force_refresh_once = st.session_state.get("force_refresh", False)
+    st.session_state.force_refresh = False
+
+
+with st.sidebar:
+    st.markdown("## 🎮 Select Game")
+    st.caption("게임 잡지 느낌 UI로 ‘확신 있는 게임만’ 추천합니다.")
+    st.markdown("---")
+
+    st.markdown("### 🔑 Keys")
+    openai_key = st.text_input("OpenAI API Key", type="password", placeholder="sk-...")
+
+    rawg_key = st.text_input(
+        "RAWG API Key (선택)",
+        type="password",
+        placeholder="없어도 사용 가능",
+        help="RAWG 키를 넣으면 표지/출시일/장르/플랫폼 같은 게임 정보 정확도가 올라갑니다.",
+    )
+
+    st.markdown(
+        """
+<div class="sg-callout">
+<b>RAWG 키는 필수 아님.</b><br>
+키가 없으면 추천은 가능하지만, 출시일/플랫폼/장르/표지 같은 정보는 제한적으로 표시됩니다.
+</div>
+""",
+        unsafe_allow_html=True,
+    )
+
+    breaker = rawg_breaker().stats()
+    if rawg_key.strip() and breaker["state"] != "closed":
+        retry = f" · {breaker['retry_in_s']:.0f}초 뒤 재확인" if breaker["retry_in_s"] is not None else " · 재확인 중"
+        st.warning(f"RAWG 응답이 불안정해 잠시 RAWG 없이 추천합니다 ({breaker['reason']}{retry}).")
+
+    st.markdown("---")
+    st.markdown("### 🧩 취향 입력")
+
+    # 입력은 발행 버튼을 누를 때 한 번에 반영 (타이핑할 때마다 전체 재실행하지 않는다)
+    with st.form("profile_form", border=False):
+        preferred_genres = st.multiselect("선호 장르", GENRES, default=[])
+
+        wanted_emotions = st.multiselect("원하는 감정(선지)", WANTED_EMOTIONS, default=[])
+        wanted_free = st.text_input(
+            "원하는 사항(자유 입력)",
+            placeholder="예: 코옵이면 좋음, 멀미 없는 3D, 스토리 위주, 초보도 괜찮은 난이도…",
+        )
+
+        played_games = st.text_area(
+            "재미있게 플레이한 게임",
+            placeholder="예: Hades, Zelda: BOTW, Slay the Spire …",
+            height=90,
+        )
+
+        platforms = st.multiselect("플랫폼/기기", PLATFORMS, default=[])
+
+        hours_per_day = st.number_input(
+            "하루 예상 플레이시간(시간)",
+            min_value=0.0,
+            max_value=24.0,
+            value=1.5,
+            step=0.5,
+        )
+
+        st.markdown("---")
+        model = st.selectbox(
+            "모델",
+            options=MODELS,
+            index=MODELS.index(DEFAULT_MODEL) if DEFAULT_MODEL in MODELS else 0,
+        )
+
+        pipelined = st.toggle(
+            "⚡ 파이프라인 모드",
+            value=PIPELINE_CANDIDATES,
+            help="후보 게임명이 생성되는 대로 RAWG 조회를 시작해 1·2단계를 겹쳐 실행합니다.",
+        )
+
+        st.checkbox("🔄 캐시 무시하고 새로 발행", value=False, key="force_refresh")
+
+        get_recs = st.form_submit_button("📰 오늘의 추천호 발행", use_container_width=True, on_click=consume_force_refresh)
+
+    show_trace = st.toggle("🔬 디버그: 마지막 실행 워터폴", value=False)
+    # 흐름이 끝난 뒤(스크립트 끝)에 채운다
+    trace_slot = st.container() if show_trace else None
+
+    with st.expander("🗂 캐시 / RAWG 별칭 인덱스"):
+        ic = issue_cache().stats()
+        sc = semantic_issue_cache().stats()
+        st.caption(
+            f"추천호 캐시 hit {ic['hits']} / miss {ic['misses']} ({ic['entries']}건)"
+            f" · 유사 프로필 캐시 hit {sc['hits']} / miss {sc['misses']} ({sc['entries']}/{sc['capacity']}건,"
+            f" 조회 평균 {sc['lookup_ms_avg']}ms · p95 {sc['lookup_ms_p95']}ms)"
+        )
+        counters = app_counters().snapshot()
+        shared_rawg = counters.get('singleflight_shared_total{kind="rawg"}', 0)
+        shared_issue = counters.get('singleflight_shared_total{kind="issue"}', 0)
+        st.caption(
+            f"동시 요청 합치기(single-flight)로 생략한 호출: RAWG {shared_rawg:.0f}회 · 추천호 파이프라인 {shared_issue:.0f}회"
+        )
+        cover_line = f"표지: {cover_mode()} 모드"
+        if cover_mode() == "local":
+            tc = thumbnail_cache().stats()
+            cover_line += (
+                f" · 새로 만든 썸네일 {counters.get('cover_resized_total', 0):.0f}장"
+                f" · 썸네일({tc['format']}) hit {tc['hits']} / miss {tc['misses']} / 실패 {tc['failures']}"
+                f" (재시도 대기 {tc['failed']}개)"
+                f" · {tc['files']}개 {tc['bytes'] / 1024 / 1024:.1f}MB · 절약 {tc['saved_bytes'] / 1024 / 1024:.1f}MB"
+            )
+        st.caption(cover_line)
+        js = job_manager().stats()
+        st.caption(
+            f"발행 작업: 진행 {js['running']} · 대기 {js['queued']} · 완료 {js['done']}"
+            f" · 실패 {js['failed']} · 취소 {js['cancelled']}"
+        )
+        bs = rawg_breaker().stats()
+        st.caption(
+            f"RAWG 서킷 브레이커: {bs['state']} · 최근 {bs['calls']}건 중 실패/지연 {bs['failures']}건"
+            + (f" · {bs['reason']}" if bs["reason"] else "")
+        )
+        ls = limiter_stats()
+        st.caption(
+            " · ".join(
+                f"{name} 리미터: 진행 {x['in_flight']}/{x['limit']:g} · 대기 {x['queued']}건({x['sessions']}세션)"
+                f" · 스로틀 {x['throttled']} · 대기초과 {x['timeouts']}"
+                for name, x in (("RAWG", ls["rawg"]), ("OpenAI", ls["openai"]))
+            )
+        )
+        oc = openai_client_registry().stats()
+        st.caption(
+            f"OpenAI 클라이언트 {oc['clients']}개 · 생성 {oc['created']} · 재사용 {oc['reused']}"
+            f" · 유휴 정리 {oc['evicted']} · 타임아웃 {oc['timeouts']}"
+        )
+        alias_stats = rawg_alias_index().stats()
+        st.caption(
+            f"별칭 {alias_stats['entries']}개 · 생략한 search: 이번 프로세스 {alias_stats['saved_searches']}회"
+            f" / 누적 {alias_stats['saved_searches_total']}회"
+        )
+        st.dataframe(rawg_alias_index().entries(limit=50), use_container_width=True, hide_index=True)
+
+
+# -----------------------------
+# Main (Hero)
+# -----------------------------
+st.markdown(
+    """
+<div class="sg-hero">
+  <h1>SELECT GAME</h1>
+  <p>사용자의 조건에 딱 알맞은 명작 게임을 추천해드립니다:)</p>
+</div>
+""",
+    unsafe_allow_html=True,
+)
+
+prefs = {
+    "preferred_genres": preferred_genres,
+    "wanted_emotions": wanted_emotions,
+    "wanted_free": wanted_free,
+    "played_games": played_games,
+    "platforms": platforms,
+    "hours_per_day": float(hours_per_day),
+}
+profile_text = build_profile_text(**prefs)
+
+# Session state
+if "messages" not in st.session_state:
+    st.session_state.messages = [
+        {"role": "assistant", "content": "원하는 조건을 더 붙여줘도 좋아. 그 조건에 딱 맞는 라인업으로 다시 짜줄게."}
+    ]
+if "chat_ctx" not in st.session_state:
+    st.session_state.chat_ctx = {}
+if "recommendations" not in st.session_state:
+    st.session_state.recommendations = None
+if "rawg_mode" not in st.session_state:
+    st.session_state.rawg_mode = False
+if "rawg_timings" not in st.session_state:
+    st.session_state.rawg_timings = None
+if "selection_metrics" not in st.session_state:
+    st.session_state.selection_metrics = None
+if "stage_timings" not in st.session_state:
+    st.session_state.stage_timings = None
+if "issue_cache_hit" not in st.session_state:
+    st.session_state.issue_cache_hit = None
+if "last_trace_id" not in st.session_state:
+    st.session_state.last_trace_id = None
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
+if "finished_job_id" not in st.session_state:
+    st.session_state.finished_job_id = None
+if "job_error" not in st.session_state:
+    st.session_state.job_error = None
+if "session_key" not in st.session_state:
+    # 공유 리미터의 공정 큐 단위 (브라우저 세션마다 하나)
+    st.session_state.session_key = os.urandom(8).hex()
+
+
+# -----------------------------
+# Recommendation Flow (background job)
+# -----------------------------
+# 발행은 백그라운드 작업으로 돌고, 세션에는 작업 id 만 둔다. 위젯을 바꿔 재실행돼도 작업은 계속된다
+JOB_POLL_S = 0.5
+
+current_fingerprint = issue_fingerprint(prefs, model, rawg_key)
+active_job = job_manager().get(st.session_state.job_id)
+if active_job is not None and not active_job.done and active_job.fingerprint != current_fingerprint:
+    # 진행 중에 프로필/모델/RAWG 모드가 바뀌면 낡은 작업은 멈춰 RAWG/OpenAI 호출을 아낀다
+    active_job.cancel()
+    st.session_state.job_id = None
+    active_job = None
+    st.toast("입력이 바뀌어 진행 중이던 발행을 취소했어.")
+
+if get_recs:
+    force_refresh = st.session_state.pop("force_refresh_once", False)
+    if not openai_key:
+        st.error("OpenAI API 키를 먼저 입력해줘.")
+    else:
+        job_manager().cancel(st.session_state.job_id)
+        for k in ISSUE_RESULT_KEYS:
+            st.session_state[k] = None
+        active_job = submit_recommendation(
+            client=build_openai_client(openai_key),
+            model=model,
+            rawg_key=rawg_key,
+            prefs=prefs,
+            system_instructions=SYSTEM_INSTRUCTIONS,
+            pipelined=pipelined,
+            force_refresh=force_refresh,
+            session=st.session_state.session_key,
+        )
+        st.session_state.job_id = active_job.id
+
+
+@st.fragment(run_every=JOB_POLL_S)
+def job_progress() -> None:
+    # 작업이 도는 동안만 호출되는 폴링 조각. 끝나면 결과를 세션에 옮기고 전체를 다시 그린다
+    with fragment_rerun("job"):
+        job = job_manager().get(st.session_state.job_id)
+        if job is None:
+            return
+        if not job.done and st.button("⏹ 발행 취소", key="job_cancel"):
+            job.cancel()
+        snap = job.snapshot()
+        if not job.done:
+            st.caption(f"발행 중… {snap['elapsed_s']:.1f}s" + (" · 대기 중" if snap["status"] == "queued" else ""))
+            for row in snap["stages"]:
+                if row["status"] == "done":
+                    st.caption(f"✅ {row['label']} ({row['ms'] / 1000:.1f}s)")
+                else:
+                    st.caption(f"⏳ {row['label']}")
+            if snap["cards"]:
+                emit_grid(snap["cards"], bool(rawg_key.strip()), "live")
+            return
+
+        st.session_state.job_id = None
+        if snap["status"] == "done":
+            for k in ISSUE_RESULT_KEYS:
+                st.session_state[k] = job.result[k]
+            st.session_state.last_trace_id = snap["trace_id"]
+            st.session_state.finished_job_id = job.id
+        elif snap["status"] == "failed":
+            st.session_state.job_error = snap["error"]
+            st.session_state.last_trace_id = snap["trace_id"]
+        st.rerun()
+
+
+if active_job is not None:
+    with full_run():
+        job_progress()
+
+if st.session_state.job_error:
+    st.error(f"추천 생성 실패: {st.session_state.job_error}")
+    st.session_state.job_error = None
+
+# 방금 끝난 작업의 첫 렌더링은 같은 trace 에 붙인다
+finished_job = job_manager().get(st.session_state.finished_job_id)
+issue_span: Optional[Span] = finished_job.span if finished_job is not None else None
+st.session_state.finished_job_id = None
+
+
+# -----------------------------
+# Render Issue
+# -----------------------------
+@st.fragment
+def issue_section(render_parent: Optional[Span]) -> None:
+    # ISSUE 지면은 독립 조각: 채팅 턴이나 발행 진행 폴링으로는 카드를 다시 그리지 않는다
+    with fragment_rerun("issue"):
+        recs_obj = st.session_state.recommendations
+
+        cache_badge = ""
+        cache_hit = st.session_state.issue_cache_hit
+        if recs_obj is not None and cache_hit:
+            if cache_hit["kind"] == "exact":
+                cache_badge = '<span class="sg-pill sg-pill-cache">⚡ CACHED</span>'
+            elif cache_hit["kind"] == "inflight":
+                cache_badge = '<span class="sg-pill sg-pill-cache">⇄ SHARED</span>'
+            else:
+                cache_badge = f'<span class="sg-pill sg-pill-cache">≈ SIMILAR {cache_hit["similarity"]:.2f}</span>'
+
+        st.markdown(
+            f"""
+<div class="sg-section">
+  <span class="sg-pill">ISSUE</span>
+  <h2>오늘의 추천 지면</h2>
+  {cache_badge}
+</div>
+<p class="sg-sub">추천은 확신 있는 게임만.</p>
+""",
+            unsafe_allow_html=True,
+        )
+
+        if recs_obj is not None:
+            if recs_obj.get("degraded"):
+                st.warning(recs_obj["note"])
+            elif recs_obj.get("note"):
+                st.caption(recs_obj["note"])
+
+            sel_metrics = st.session_state.selection_metrics
+            if sel_metrics:
+                st.caption(
+                    f"첫 카드까지 {sel_metrics['ttfc_ms'] / 1000:.1f}s · 선별 {sel_metrics['select_ms'] / 1000:.1f}s"
+                    f" · 전체 {sel_metrics['total_ms'] / 1000:.1f}s" + (" (스트리밍)" if sel_metrics["streamed"] else "")
+                    + f" · JSON 복구 호출 누적 {sum(v for k, v in app_counters().snapshot().items() if k.startswith('llm_json_repair_total')):.0f}회"
+                )
+
+            stage = st.session_state.stage_timings
+            if stage:
+                st.caption(
+                    f"[{stage['mode']}] 첫 후보 {stage['first_candidate_ms'] / 1000:.1f}s · 후보 완료 {stage['candidates_ms'] / 1000:.1f}s"
+                    f" · RAWG {stage['rawg_ms'] / 1000:.1f}s · 1·2단계 합계 {stage['stage12_ms'] / 1000:.1f}s"
+                )
+
+            selected = recs_obj.get("selected", [])
+            if not selected:
+                st.warning("이번 조건에선 확신 있게 추천할 게임이 부족했어. 원하는 사항(자유입력)에 조건을 더 넣어줘.")
+            else:
+                parent = render_parent if st.session_state.get("in_full_run", False) else None
+                with tracer().span("render.cards", parent=parent, cards=len(selected)) as span:
+                    emit_grid(selected, st.session_state.rawg_mode, "issue")
+                    span.set(bytes=st.session_state.render_stats["issue"]["bytes"])
+
+                if recs_obj.get("summary"):
+                    st.markdown(
+                        """
+<div class="sg-section">
+  <span class="sg-pill">EDITOR'S NOTE</span>
+  <h2>편집장 메모</h2>
+</div>
+""",
+                        unsafe_allow_html=True,
+                    )
+                    st.info(recs_obj["summary"])
+
+            timings = st.session_state.rawg_timings
+            if timings and timings.get("titles"):
+                with st.expander(
+                    f"⏱ RAWG 조회 시간 — 실제 {timings['wall_ms'] / 1000:.1f}s (직렬 합계 {timings['serial_ms'] / 1000:.1f}s)"
+                ):
+                    pool = rawg_pool_stats()
+                    fc = rawg_fact_cache().stats()
+                    st.caption(
+                        f"커넥션 재사용 {pool['reused']}/{pool['requests']} · 새 커넥션 {pool['connections']} · 재시도 {pool['retries']}"
+                        f" · 팩트 캐시 hit {fc['hits']} / miss {fc['misses']} ({fc['entries']}건)"
+                        f" · 별칭으로 생략한 search {rawg_alias_index().stats()['saved_searches']}회"
+                    )
+                    st.dataframe(timings["titles"], use_container_width=True, hide_index=True)
+
+            reports = prompt_token_reports()
+            if reports:
+                with st.expander("🧮 프롬프트 토큰 추정 (섹션별)"):
+                    st.caption("stable:* 은 호출마다 동일한 prefix(캐시 대상), input:* 은 매번 바뀌는 부분")
+                    rows = [
+                        {"call": call, "section": section, "tokens": tokens}
+                        for call, report in reports.items()
+                        for section, tokens in report.items()
+                    ]
+                    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
+with full_run():
+    issue_section(issue_span)
+
+if trace_slot is not None:
+    with trace_slot:
+        last_spans = tracer().trace(st.session_state.last_trace_id) if st.session_state.last_trace_id else []
+        if last_spans:
+            st.html(render_waterfall_html(last_spans))
+        else:
+            st.caption("아직 기록된 실행이 없습니다. 추천호를 발행하면 단계별 소요 시간이 여기에 표시됩니다.")
+        rerun_rows = [
+            {
+                "scope": scope,
+                "count": v["count"],
+                "avg_ms": round(v["total_ms"] / v["count"], 1),
+                "last_ms": round(v["last_ms"], 1),
+                "max_ms": round(v["max_ms"], 1),
+            }
+            for scope, v in st.session_state.rerun_stats.items()
+        ]
+        if rerun_rows:
+            st.caption("이 세션의 재실행 (app = 전체, 나머지는 조각 단독)")
+            st.dataframe(rerun_rows, use_container_width=True, hide_index=True)
+        for scope, r in st.session_state.render_stats.items():
+            st.caption(
+                f"카드 그리드({scope}) 렌더 {r['render_ms']:.2f}ms · HTML {r['bytes'] / 1024:.1f}KB"
+                f" · 카드 {r['cards']}장 · st.html {r['deltas']}회"
+            )
+        with st.expander("📈 Prometheus 스냅샷"):
+            st.code(tracer().prometheus_text(), language="text")
+
+
+# -----------------------------
+# Chat (Q&A corner)
+# -----------------------------
+def chat_turn_caption(turn: Dict[str, Any]) -> str:
+    actual = turn.get("input_tokens")
+    actual_txt = f"{actual}" if actual is not None else "?"
+    return f"입력 토큰 {actual_txt} (추정 {turn['input_tokens_est']}) · {turn['mode']}"
+
+
+@st.fragment
+def chat_section() -> None:
+    # 채팅 코너는 독립 조각: 메시지를 보내도 이 조각만 다시 돈다
+    with fragment_rerun("chat"):
+        st.markdown(
+            """
+<div class="sg-section">
+  <span class="sg-pill">Q&A</span>
+  <h2>추가 요청</h2>
+</div>
+<p class="sg-sub">예: “추천 중에서 스위치로만 다시”, “난이도 낮은 쪽만”, “코옵 가능한 것만”</p>
+""",
+            unsafe_allow_html=True,
+        )
+
+        for m in st.session_state.messages:
+            with st.chat_message(m["role"]):
+                st.markdown(m["content"])
+                if m.get("turn"):
+                    st.caption(chat_turn_caption(m["turn"]))
+
+        user_text = st.chat_input("조건을 더 추가해줘 (예: ‘멀미 없는 1인칭’, ‘로그라이크는 제외’)")
+
+        if user_text:
+            st.session_state.messages.append({"role": "user", "content": user_text})
+            with st.chat_message("user"):
+                st.markdown(user_text)
+
+            if not openai_key:
+                assistant_text = "OpenAI API 키가 없어요. 사이드바에 입력해줘."
+                st.session_state.messages.append({"role": "assistant", "content": assistant_text})
+                with st.chat_message("assistant"):
+                    st.markdown(assistant_text)
+            else:
+                try:
+                    client = build_openai_client(openai_key)
+                    chat_ctx = ChatContext(st.session_state.chat_ctx)
+                    with st.spinner("답변 작성 중..."), session_scope(st.session_state.session_key):
+                        assistant_text = openai_chat(
+                            client=client,
+                            model=model,
+                            system_instructions=SYSTEM_INSTRUCTIONS,
+                            messages=st.session_state.messages,
+                            ctx=chat_ctx,
+                            profile_text=profile_text,
+                        )
+                    turn = chat_ctx.state["turns"][-1] if chat_ctx.state["turns"] else None
+                    st.session_state.messages.append({"role": "assistant", "content": assistant_text, "turn": turn})
+                    with st.chat_message("assistant"):
+                        st.markdown(assistant_text)
+                        if turn:
+                            st.caption(chat_turn_caption(turn))
+                except Exception as e:
+                    err = f"오류: {e}"
+                    st.session_state.messages.append({"role": "assistant", "content": err})
+                    with st.chat_message("assistant"):
+                        st.markdown(err)
+
+
+with full_run():
+    chat_section()
+
+record_rerun("app", (time.perf_counter() - rerun_t0) * 1000)
@@ -0,0 +1,180 @@
+# batch.py
+"""프로필 JSONL 을 읽어 추천호를 일괄 발행하고, 끝나는 대로 결과를 JSONL 로 쓴다.
+
+    python batch.py profiles.jsonl -o results.jsonl --concurrency 4
+    cat profiles.jsonl | python batch.py - > results.jsonl
+
+입력 한 줄 = 프로필 하나: {"id": "u1", "preferred_genres": ["퍼즐 게임"], "platforms": "PC, Switch", ...}
+(키는 build_profile_text 인자와 같고, 빠진 키는 기본값, 그 밖의 키는 무시). 깨진 줄은 ok: false 행으로 남긴다.
+키는 OPENAI_API_KEY / RAWG_API_KEY 환경변수나 옵션으로.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, Optional, Set, TextIO, Tuple
+
+from engine import DEFAULT_MODEL, MODELS, PIPELINE_CANDIDATES, PROFILE_DEFAULTS, RecommendationEngine, tracer
+
+
+def read_profiles(f: TextIO) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    # (줄 번호, 레코드, 오류). 읽을 수 없는 줄도 건너뛰지 않고 오류와 함께 내보낸다
+    for lineno, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield lineno, None, f"JSONDecodeError: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield lineno, None, "ValueError: 프로필은 JSON 객체여야 합니다."
+            continue
+        yield lineno, record, None
+
+
+def error_row(lineno: int, error: str) -> Dict[str, Any]:
+    return {"id": lineno, "line": lineno, "ok": False, "ms": 0.0, "error": error}
+
+
+def process(engine: RecommendationEngine, lineno: int, record: Dict[str, Any], force_refresh: bool) -> Dict[str, Any]:
+    rid = record.get("id", lineno)
+    # 프로필 키만 넘긴다 (id, force_refresh / on_card 같은 recommend 인자 이름은 버림)
+    profile = {k: v for k, v in record.items() if k in PROFILE_DEFAULTS}
+    t0 = time.perf_counter()
+    try:
+        with tracer().span("batch.issue", id=str(rid)):
+            result = engine.recommend(force_refresh=force_refresh, **profile)
+        return {
+            "id": rid,
+            "line": lineno,
+            "ok": True,
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+            "cache": (result["issue_cache_hit"] or {}).get("kind", "miss"),
+            "rawg_mode": result["rawg_mode"],
+            "recommendations": result["recommendations"],
+            "selection_metrics": result["selection_metrics"],
+            "stage_timings": result["stage_timings"],
+        }
+    except Exception as e:
+        return {
+            "id": rid,
+            "line": lineno,
+            "ok": False,
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+
+def run_batch(
+    engine: RecommendationEngine,
+    src: TextIO,
+    out: TextIO,
+    concurrency: int,
+    ordered: bool = False,
+    force_refresh: bool = False,
+    progress: Optional[TextIO] = None,
+) -> Dict[str, Any]:
+    """동시에 최대 concurrency 개만 처리. 입력은 한 줄씩 읽어 들여 큰 파일도 메모리에 다 올리지 않는다.
+
+    ordered=True 면 입력 순서대로 쓰고(앞 줄이 끝날 때까지 뒤 결과는 보관), 아니면 끝나는 순서대로 쓴다.
+    """
+    write_lock = threading.Lock()
+    pending: Dict[int, Dict[str, Any]] = {}
+    next_seq = 0
+    stats = {"total": 0, "ok": 0, "failed": 0, "cache_hits": 0}
+    t0 = time.perf_counter()
+
+    def emit(seq: int, row: Dict[str, Any]) -> None:
+        nonlocal next_seq
+        with write_lock:
+            stats["total"] += 1
+            stats["ok" if row["ok"] else "failed"] += 1
+            if row.get("cache", "miss") != "miss":
+                stats["cache_hits"] += 1
+            if progress is not None:
+                status = f"{row['ms'] / 1000:.1f}s {row.get('cache', '')}" if row["ok"] else row["error"]
+                progress.write(f"[{stats['total']}] {row['id']}: {status}\n")
+                progress.flush()
+            if not ordered:
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+                return
+            pending[seq] = row
+            while next_seq in pending:
+                out.write(json.dumps(pending.pop(next_seq), ensure_ascii=False) + "\n")
+                next_seq += 1
+            out.flush()
+
+    in_flight: Set[Future] = set()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+        for seq, (lineno, record, error) in enumerate(read_profiles(src)):
+            if record is None:
+                emit(seq, error_row(lineno, error or ""))
+                continue
+            if len(in_flight) >= concurrency:
+                # 백프레셔: 하나가 끝나야 다음 줄을 읽는다
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            fut = pool.submit(process, engine, lineno, record, force_refresh)
+            fut.add_done_callback(lambda f, seq=seq: emit(seq, f.result()))
+            in_flight.add(fut)
+        wait(in_flight)
+
+    stats["wall_s"] = round(time.perf_counter() - t0, 2)
+    return stats
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Select Game 추천호 일괄 발행 (JSONL -> JSONL)")
+    ap.add_argument("input", help="프로필 JSONL 경로 (- 면 stdin)")
+    ap.add_argument("-o", "--output", default="-", help="결과 JSONL 경로 (기본 stdout)")
+    ap.add_argument("-c", "--concurrency", type=int, default=4, help="동시에 처리할 프로필 수")
+    ap.add_argument("--model", default=DEFAULT_MODEL, choices=MODELS)
+    ap.add_argument("--openai-key", default=os.environ.get("OPENAI_API_KEY", ""))
+    ap.add_argument("--rawg-key", default=os.environ.get("RAWG_API_KEY", ""), help="없으면 RAWG 없이 추천")
+    ap.add_argument("--batch-mode", action="store_true", help="파이프라인 모드 끄기 (후보를 다 받은 뒤 RAWG 조회)")
+    ap.add_argument("--ordered", action="store_true", help="입력 순서대로 결과 쓰기")
+    ap.add_argument("--force-refresh", action="store_true", help="추천호 캐시 무시")
+    ap.add_argument("-q", "--quiet", action="store_true", help="진행 상황을 stderr 에 쓰지 않음")
+    args = ap.parse_args()
+
+    if not args.openai_key:
+        ap.error("OpenAI API 키가 필요합니다 (--openai-key 또는 OPENAI_API_KEY).")
+
+    engine = RecommendationEngine(
+        openai_key=args.openai_key,
+        rawg_key=args.rawg_key,
+        model=args.model,
+        pipelined=PIPELINE_CANDIDATES and not args.batch_mode,
+    )
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = run_batch(
+            engine,
+            src,
+            out,
+            concurrency=args.concurrency,
+            ordered=args.ordered,
+            force_refresh=args.force_refresh,
+            progress=None if args.quiet else sys.stderr,
+        )
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+
+    print(
+        f"done: {stats['ok']}/{stats['total']} ok · 실패 {stats['failed']} · 캐시 {stats['cache_hits']} · {stats['wall_s']}s",
+        file=sys.stderr,
+    )
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
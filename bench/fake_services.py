@@ -0,0 +1,332 @@
+# bench/fake_services.py
+"""로컬 대역 서버: OpenAI Responses API 와 RAWG API 를 흉내 낸다 (벤치마크 전용).
+
+- POST /v1/responses        : 일반 JSON 응답 + stream=True 면 SSE (지연/토큰 속도 조절 가능)
+- GET  /api/games?search=   : 카탈로그에서 제목이 일치하는 게임
+- GET  /api/games/{id}      : 게임 상세
+
+응답 내용은 요청의 text.format 스키마 이름(candidate_list / fact_selection / fallback_selection)을 보고 정한다.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+CATALOG = [
+    "Hades", "Stardew Valley", "Celeste", "Hollow Knight", "Slay the Spire", "Dead Cells", "Terraria",
+    "Minecraft", "Portal 2", "The Witcher 3: Wild Hunt", "Disco Elysium", "Outer Wilds", "Inscryption",
+    "Cuphead", "Ori and the Will of the Wisps", "Spiritfarer", "Unpacking", "A Short Hike", "Return of the Obra Dinn",
+    "Into the Breach", "FTL: Faster Than Light", "Baba Is You", "Katana ZERO", "Hotline Miami", "Undertale",
+    "Night in the Woods", "Firewatch", "What Remains of Edith Finch", "Journey", "Abzu", "Gris", "Limbo",
+    "Inside", "Braid", "Fez", "Super Meat Boy", "Risk of Rain 2", "Vampire Survivors", "Balatro", "Monster Hunter: World",
+    "Elden Ring", "Dark Souls III", "Sekiro: Shadows Die Twice", "Bloodborne", "Persona 5 Royal", "Final Fantasy VII Remake",
+    "Dragon Quest XI S", "Octopath Traveler", "Xenoblade Chronicles 3", "Fire Emblem: Three Houses",
+    "Civilization VI", "XCOM 2", "Crusader Kings III", "Stellaris", "Factorio", "RimWorld", "Cities: Skylines",
+    "Overcooked! 2", "It Takes Two", "Portal", "Tetris Effect", "Beat Saber", "Rhythm Heaven Fever", "Thumper",
+]
+PARENT_PLATFORMS = [(1, "PC"), (2, "PlayStation"), (3, "Xbox"), (7, "Nintendo"), (4, "iOS"), (8, "Android")]
+CHILD_PLATFORMS = {1: (4, "PC"), 2: (187, "PlayStation 5"), 3: (186, "Xbox Series S/X"), 7: (7, "Nintendo Switch"),
+                   4: (3, "iOS"), 8: (21, "Android")}
+
+
+def _game(i: int, name: str) -> Dict[str, Any]:
+    rng = random.Random(i)
+    parents = rng.sample(PARENT_PLATFORMS, k=rng.randint(1, 4))
+    if (1, "PC") not in parents:
+        parents.append((1, "PC"))
+    g: Dict[str, Any] = {
+        "id": 1000 + i,
+        "name": name,
+        "slug": re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-"),
+        "released": f"{2008 + i % 16}-0{1 + i % 9}-1{i % 9}",
+        "rating": round(3.2 + rng.random() * 1.7, 2),
+        "genres": [{"id": 4, "name": rng.choice(["Action", "Indie", "RPG", "Strategy", "Puzzle", "Adventure"])}],
+        "parent_platforms": [{"platform": {"id": pid, "name": pname}} for pid, pname in parents],
+        "platforms": [{"platform": {"id": CHILD_PLATFORMS[pid][0], "name": CHILD_PLATFORMS[pid][1]}} for pid, _ in parents],
+        "background_image": f"https://media.rawg.io/media/games/{i:03d}/{i:03d}cover.jpg",
+    }
+    # 일부 게임은 search 결과에 metacritic 키가 없어 detail 호출이 필요하다
+    if i % 4:
+        g["metacritic"] = 60 + rng.randint(0, 38)
+    return g
+
+
+GAMES = [_game(i, name) for i, name in enumerate(CATALOG)]
+GAMES_BY_NAME = {g["name"].lower(): g for g in GAMES}
+GAMES_BY_ID = {g["id"]: g for g in GAMES}
+
+
+class ServiceStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def inc(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+class FakeConfig:
+    """지연 설정. openai_ttft 는 첫 토큰까지, openai_tps 는 초당 출력 토큰, rawg_latency 는 요청당 (초)."""
+
+    def __init__(self, openai_ttft: float = 0.35, openai_tps: float = 180.0, rawg_latency: float = 0.12) -> None:
+        self.openai_ttft = openai_ttft
+        self.openai_tps = openai_tps
+        self.rawg_latency = rawg_latency
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _schema_name(body: Dict[str, Any]) -> str:
+    fmt = ((body.get("text") or {}).get("format") or {})
+    return fmt.get("name") or ""
+
+
+def _fact_ids(body: Dict[str, Any]) -> List[int]:
+    schema = ((body.get("text") or {}).get("format") or {}).get("schema") or {}
+    try:
+        return list(schema["properties"]["selected"]["items"]["properties"]["id"]["enum"])
+    except (KeyError, TypeError):
+        return []
+
+
+def output_text_for(body: Dict[str, Any]) -> str:
+    name = _schema_name(body)
+    prompt = str(body.get("input") or "")
+    rng = random.Random(_seed(prompt))
+    memo = "핵심 루프가 짧고 명확해서 한 판씩 끊어 하기 좋다. 초반엔 회피를 익히고, 후반엔 빌드를 좁혀라."
+    if name == "candidate_list":
+        m = re.search(r"\"게임 후보 제목\" (\d+)개", str(body.get("instructions") or ""))
+        n = int(m.group(1)) if m else 18
+        return json.dumps({"candidates": rng.sample(CATALOG, k=min(n, len(CATALOG)))}, ensure_ascii=False)
+    if name == "fact_selection":
+        ids = _fact_ids(body)
+        picks = rng.sample(ids, k=min(len(ids), rng.randint(3, 6))) if ids else []
+        return json.dumps(
+            {
+                "selected": [
+                    {"id": gid, "one_liner": "지금 딱 맞는 한 판.", "why_for_user": "선호 장르와 플레이 시간에 맞는다.", "summary_memo": memo}
+                    for gid in picks
+                ],
+                "summary": "이번 호는 짧게 끊어 즐기기 좋은 게임 위주로 골랐다.",
+                "price_disclaimer": "가격/할인은 스토어마다 다를 수 있다.",
+            },
+            ensure_ascii=False,
+        )
+    if name == "fallback_selection":
+        picks = rng.sample(CATALOG, k=rng.randint(2, 5))
+        return json.dumps(
+            {
+                "selected": [
+                    {"name": t, "released": "", "genres": "", "platforms": "", "one_liner": "가볍게 시작하기 좋다.",
+                     "why_for_user": "입력한 취향과 잘 맞는다.", "summary_memo": memo}
+                    for t in picks
+                ],
+                "summary": "RAWG 없이 고른 라인업.",
+                "accuracy_note": "RAWG 키를 넣으면 출시일/플랫폼 정보가 정확해진다.",
+            },
+            ensure_ascii=False,
+        )
+    if "요약" in str(body.get("instructions") or "") + prompt[:80]:
+        return "- 사용자는 코옵과 짧은 세션을 선호\n- 이미 추천: Hades, Celeste"
+    return "조건에 맞춰 다시 골라봤어. " + ", ".join(rng.sample(CATALOG, k=3)) + " 쪽이 잘 맞을 거야."
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 3)
+
+
+def _response_obj(body: Dict[str, Any], text: str, resp_id: str) -> Dict[str, Any]:
+    in_tokens = _estimate_tokens(str(body.get("instructions") or "") + str(body.get("input") or ""))
+    out_tokens = _estimate_tokens(text)
+    # 이전 응답을 이어 쓰거나 prefix 가 같은 요청은 캐시된 것으로 친다 (대략)
+    cached = in_tokens // 2 if body.get("previous_response_id") or body.get("prompt_cache_key") else 0
+    return {
+        "id": resp_id,
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model") or "fake",
+        "status": "completed",
+        "output": [
+            {
+                "type": "message",
+                "id": "msg_" + resp_id[5:],
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": in_tokens,
+            "input_tokens_details": {"cached_tokens": cached},
+            "output_tokens": out_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": in_tokens + out_tokens,
+        },
+    }
+
+
+def make_handler(config: FakeConfig, stats: ServiceStats) -> type:
+    counter = {"n": 0}
+    counter_lock = threading.Lock()
+
+    def next_id() -> str:
+        with counter_lock:
+            counter["n"] += 1
+            return f"resp_{counter['n']:08d}"
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _send_json(self, status: int, obj: Any) -> None:
+            data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        # ---- RAWG ----
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            time.sleep(config.rawg_latency)
+            if url.path.rstrip("/") == "/api/games":
+                stats.inc("rawg_search")
+                q = (parse_qs(url.query).get("search") or [""])[0].strip().lower()
+                g = GAMES_BY_NAME.get(q)
+                pp = (parse_qs(url.query).get("parent_platforms") or [""])[0]
+                if g and pp:
+                    wanted = {int(x) for x in pp.split(",") if x}
+                    if not wanted & {p["platform"]["id"] for p in g["parent_platforms"]}:
+                        g = None
+                self._send_json(200, {"count": int(g is not None), "results": [g] if g else []})
+                return
+            m = re.fullmatch(r"/api/games/(\d+)", url.path.rstrip("/"))
+            if m:
+                stats.inc("rawg_detail")
+                g = GAMES_BY_ID.get(int(m.group(1)))
+                if g is None:
+                    self._send_json(404, {"detail": "Not found."})
+                    return
+                detail = dict(g)
+                detail.setdefault("metacritic", None)
+                detail["description_raw"] = f"{g['name']} 상세 설명."
+                self._send_json(200, detail)
+                return
+            self._send_json(404, {"detail": "Not found."})
+
+        # ---- OpenAI Responses ----
+        def do_POST(self) -> None:
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if url.path.rstrip("/") != "/v1/responses":
+                self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                return
+            stats.inc("openai_stream" if body.get("stream") else "openai")
+            text = output_text_for(body)
+            resp_id = next_id()
+            per_token = 1.0 / config.openai_tps if config.openai_tps > 0 else 0.0
+
+            if not body.get("stream"):
+                time.sleep(config.openai_ttft + _estimate_tokens(text) * per_token)
+                self._send_json(200, _response_obj(body, text, resp_id))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            seq = 0
+
+            def send(event: Dict[str, Any]) -> None:
+                nonlocal seq
+                event["sequence_number"] = seq
+                seq += 1
+                self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            try:
+                time.sleep(config.openai_ttft)
+                send({"type": "response.created", "response": {**_response_obj(body, "", resp_id), "status": "in_progress", "output": []}})
+                chunk = 12  # 대략 4토큰
+                for i in range(0, len(text), chunk):
+                    piece = text[i : i + chunk]
+                    time.sleep(_estimate_tokens(piece) * per_token)
+                    send({"type": "response.output_text.delta", "item_id": "msg_" + resp_id[5:], "output_index": 0,
+                          "content_index": 0, "delta": piece})
+                send({"type": "response.completed", "response": _response_obj(body, text, resp_id)})
+            except (BrokenPipeError, ConnectionResetError):
+                # 클라이언트가 스트림을 일찍 닫음 (후보를 다 받았거나 조기 종료)
+                stats.inc("openai_stream_cancelled")
+
+    return Handler
+
+
+class FakeServices:
+    """OpenAI/RAWG 대역 서버 하나를 백그라운드 스레드로 띄운다. with 문으로 쓴다."""
+
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or FakeConfig()
+        self.stats = ServiceStats()
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.config, self.stats))
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-services", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self) -> Tuple[str, str]:
+        # (OPENAI_BASE_URL, SG_RAWG_BASE)
+        return f"{self.base_url}/v1", f"{self.base_url}/api"
+
+    def __enter__(self) -> "FakeServices":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    # 단독 실행: 앱을 대역 서버에 붙여 수동으로 확인할 때
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Select Game 벤치마크용 OpenAI/RAWG 대역 서버")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--ttft", type=float, default=0.35)
+    ap.add_argument("--tps", type=float, default=180.0)
+    ap.add_argument("--rawg-latency", type=float, default=0.12)
+    args = ap.parse_args()
+    with FakeServices(FakeConfig(args.ttft, args.tps, args.rawg_latency), port=args.port) as svc:
+        openai_url, rawg_url = svc.urls
+        print(f"OPENAI_BASE_URL={openai_url}")
+        print(f"SG_RAWG_BASE={rawg_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,564 @@
+# bench/run_bench.py
+"""오프라인 부하/지연 벤치마크. 실제 OpenAI/RAWG 대신 bench/fake_services.py 의 대역 서버를 쓴다.
+
+    python bench/run_bench.py                       # headless + AppTest, 결과 출력
+    python bench/run_bench.py --baseline bench/baseline.json --check   # 기준 대비 회귀면 exit 1
+    python bench/run_bench.py --update-baseline     # 현재 결과를 기준 파일로 저장
+
+- headless : engine.py 의 run_recommendation / openai_chat 을 N개 세션(스레드)으로 동시에 실행 (Streamlit 없이)
+- apptest  : streamlit.testing 의 AppTest 로 위젯 입력 -> 발행 버튼 -> 채팅까지 세션별로 순서대로 실행
+- api      : server.py 를 uvicorn 으로 띄우고 N개 세션이 /recommend (NDJSON 스트림) 와 /chat 을 동시에 호출
+
+모드마다 별도 프로세스 + 빈 캐시 디렉터리로 실행해 캐시/메모리 수치가 섞이지 않게 한다.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+APP_PATH = os.path.join(ROOT, "app.py")
+sys.path.insert(0, BENCH_DIR)
+
+from fake_services import CATALOG, FakeConfig, FakeServices  # noqa: E402
+
+GENRES = ["액션 게임", "슈팅 게임", "어드벤쳐 게임", "전략 게임", "롤플레잉 게임", "퍼즐 게임", "음악게임"]
+EMOTIONS = ["힐링", "성장", "경쟁", "공포", "수집", "몰입 스토리"]
+PLATFORMS = ["PC", "PS", "Xbox", "Switch", "모바일"]
+FREE_TEXT = ["", "코옵이면 좋음", "스토리 위주", "초보도 괜찮은 난이도", "짧게 끊어서 할 수 있는 것"]
+CHAT_TURNS = ["스위치로만 다시", "난이도 낮은 쪽만", "코옵 가능한 것만", "스토리 좋은 걸로 두 개만"]
+
+# 기준 비교 대상: (경로, 클수록 나쁜지)
+# 지연은 캐시 miss 발행만 비교한다 (동시 세션에서는 hit/miss 비율이 실행마다 조금씩 달라 전체 p50 이 흔들린다)
+COMPARED_METRICS = [
+    ("issue_miss_ms.p50", True),
+    ("issue_miss_ms.p99", True),
+    ("ttfc_miss_ms.p50", True),
+    ("chat_ms.p50", True),
+    ("rawg_calls_per_issue", True),
+    ("memory.max_rss_mb", True),
+    ("throughput_issues_per_s", False),
+]
+
+
+# -----------------------------
+# Workload
+# -----------------------------
+def make_profiles(n: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(n):
+        profiles.append(
+            {
+                "preferred_genres": rng.sample(GENRES, k=rng.randint(1, 3)),
+                "wanted_emotions": rng.sample(EMOTIONS, k=rng.randint(0, 2)),
+                "wanted_free": rng.choice(FREE_TEXT),
+                "played_games": ", ".join(rng.sample(CATALOG, k=rng.randint(1, 3))),
+                "platforms": rng.sample(PLATFORMS, k=rng.randint(0, 2)),
+                "hours_per_day": rng.choice([0.5, 1.0, 1.5, 2.0, 3.0]),
+            }
+        )
+    return profiles
+
+
+def session_plan(cfg: Dict[str, Any], session_id: int) -> List[Dict[str, Any]]:
+    # 세션별 발행 순서: 프로필 풀에서 뽑되, 일부는 사소하게 바꾼 근접 프로필 (유사 캐시 대상)
+    profiles = make_profiles(cfg["profiles"], cfg["seed"])
+    rng = random.Random(cfg["seed"] * 1000 + session_id)
+    plan = []
+    for _ in range(cfg["issues"]):
+        prefs = dict(rng.choice(profiles))
+        if rng.random() < cfg["near_ratio"]:
+            prefs["played_games"] = prefs["played_games"].upper() + " "
+            prefs["hours_per_day"] = prefs["hours_per_day"] + 0.5
+        plan.append(prefs)
+    return plan
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=float)
+    return {
+        "n": int(arr.size),
+        "mean": round(float(arr.mean()), 1),
+        "p50": round(float(np.percentile(arr, 50)), 1),
+        "p90": round(float(np.percentile(arr, 90)), 1),
+        "p99": round(float(np.percentile(arr, 99)), 1),
+        "max": round(float(arr.max()), 1),
+    }
+
+
+def trace_cache_stats(trace_path: str) -> Dict[str, Any]:
+    # 팩트 캐시 hit/miss 는 rawg.search / rawg.detail span 의 cache 속성으로 센다 (두 모드 공통)
+    # 공유 리미터 대기/스로틀은 어느 span 이든 limiter_wait_ms / throttled 속성을 더한다
+    # 플랫폼 필터 검색이 필터 없이 다시 찾은 횟수는 rawg.search span 의 fallback 속성으로 센다
+    hits = misses = shared = throttled = fallbacks = 0
+    limiter_wait_ms = 0.0
+    if os.path.exists(trace_path):
+        with open(trace_path, encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                limiter_wait_ms += rec["attrs"].get("limiter_wait_ms", 0)
+                throttled += rec["attrs"].get("throttled", 0)
+                if rec["name"] == "rawg.search" and rec["attrs"].get("fallback"):
+                    fallbacks += 1
+                if rec["name"] in ("rawg.search", "rawg.detail"):
+                    if rec["attrs"].get("cache") == "hit":
+                        hits += 1
+                    elif rec["attrs"].get("cache") == "miss":
+                        misses += 1
+                    elif rec["attrs"].get("cache") == "shared":
+                        shared += 1
+    total = hits + misses
+    return {
+        "fact_hits": hits,
+        "fact_misses": misses,
+        "fact_shared": shared,
+        "search_fallbacks": fallbacks,
+        "fact_hit_rate": round(hits / total, 3) if total else None,
+        "limiter_wait_ms_total": round(limiter_wait_ms, 1),
+        "limiter_throttled": throttled,
+    }
+
+
+def max_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# -----------------------------
+# Workers (별도 프로세스에서 실행)
+# -----------------------------
+def run_headless(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    # 환경변수(대역 서버 주소/캐시 경로)를 받은 뒤에 import 해야 설정이 반영된다
+    sys.path.insert(0, ROOT)
+    import engine as app
+
+    client = app.build_openai_client("sk-bench")
+    rawg_key = "bench" if cfg["rawg"] else ""
+    records: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def session(sid: int) -> None:
+        messages: List[Dict[str, Any]] = [{"role": "assistant", "content": "원하는 조건을 더 붙여줘도 좋아."}]
+        chat_state: Dict[str, Any] = {}
+        prefs: Dict[str, Any] = {}
+        for prefs in session_plan(cfg, sid):
+            cards: List[Dict[str, Any]] = []
+            t0 = time.perf_counter()
+            try:
+                with app.tracer().span("bench.issue", session=sid):
+                    result = app.run_recommendation(
+                        client=client,
+                        model=cfg["model"],
+                        rawg_key=rawg_key,
+                        prefs=prefs,
+                        system_instructions=app.SYSTEM_INSTRUCTIONS,
+                        pipelined=cfg["pipelined"],
+                        on_card=cards.append,
+                    )
+                rec = {
+                    "kind": "issue",
+                    "ms": (time.perf_counter() - t0) * 1000,
+                    "ttfc_ms": result["selection_metrics"]["ttfc_ms"],
+                    "cache": (result["issue_cache_hit"] or {}).get("kind", "miss"),
+                    "cards": len(result["recommendations"]["selected"]),
+                }
+            except Exception as e:
+                rec = {"kind": "issue", "error": f"{type(e).__name__}: {e}"}
+            with lock:
+                records.append(rec)
+
+        ctx = app.ChatContext(chat_state)
+        profile_text = app.build_profile_text(**prefs) if prefs else ""
+        for i in range(cfg["chat_turns"]):
+            messages.append({"role": "user", "content": CHAT_TURNS[(sid + i) % len(CHAT_TURNS)]})
+            t0 = time.perf_counter()
+            try:
+                text = app.openai_chat(client, cfg["model"], app.SYSTEM_INSTRUCTIONS, messages, ctx=ctx, profile_text=profile_text)
+                messages.append({"role": "assistant", "content": text})
+                rec = {"kind": "chat", "ms": (time.perf_counter() - t0) * 1000}
+            except Exception as e:
+                rec = {"kind": "chat", "error": f"{type(e).__name__}: {e}"}
+            with lock:
+                records.append(rec)
+
+    def scoped_session(sid: int) -> None:
+        # 세션마다 공유 리미터의 대기열을 따로 둔다 (Streamlit 세션 / API session_id 와 같은 단위)
+        with app.session_scope(f"bench-{sid}"):
+            session(sid)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=cfg["sessions"]) as pool:
+        list(pool.map(scoped_session, range(cfg["sessions"])))
+    wall = time.perf_counter() - t0
+    return {"records": records, "wall_s": wall, "max_rss_mb": max_rss_mb()}
+
+
+def run_apptest(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    from streamlit.testing.v1 import AppTest
+
+    records: List[Dict[str, Any]] = []
+    t_start = time.perf_counter()
+    # AppTest 는 세션 하나를 스크립트 실행기로 흉내 내므로, 세션은 순서대로 돈다 (동시성은 headless 에서 측정)
+    for sid in range(cfg["sessions"]):
+        at = AppTest.from_file(APP_PATH, default_timeout=cfg["timeout"])
+        at.run()
+        at.sidebar.text_input[0].set_value("sk-bench")
+        at.sidebar.text_input[1].set_value("bench" if cfg["rawg"] else "")
+        at.sidebar.selectbox[0].set_value(cfg["model"])
+        at.sidebar.toggle[0].set_value(cfg["pipelined"])
+        prefs: Dict[str, Any] = {}
+        for prefs in session_plan(cfg, sid):
+            at.sidebar.multiselect[0].set_value(prefs["preferred_genres"])
+            at.sidebar.multiselect[1].set_value(prefs["wanted_emotions"])
+            at.sidebar.text_input[2].set_value(prefs["wanted_free"])
+            at.sidebar.text_area[0].set_value(prefs["played_games"])
+            at.sidebar.multiselect[2].set_value(prefs["platforms"])
+            at.sidebar.number_input[0].set_value(prefs["hours_per_day"])
+            button = next(b for b in at.sidebar.button if "추천호" in b.label)
+            t0 = time.perf_counter()
+            button.click().run()
+            # 발행은 백그라운드 작업이므로 브라우저의 폴링처럼 끝날 때까지 재실행한다
+            while at.session_state["job_id"] is not None and time.perf_counter() - t0 < cfg["timeout"]:
+                time.sleep(0.2)
+                at.run()
+            ms = (time.perf_counter() - t0) * 1000
+            metrics = at.session_state["selection_metrics"] if "selection_metrics" in at.session_state else None
+            if at.exception or at.error or not metrics:
+                err = [e.value for e in at.exception] + [e.value for e in at.error]
+                records.append({"kind": "issue", "error": "; ".join(map(str, err)) or "no result"})
+                continue
+            hit = at.session_state["issue_cache_hit"]
+            records.append(
+                {
+                    "kind": "issue",
+                    "ms": ms,
+                    "ttfc_ms": metrics["ttfc_ms"],
+                    "cache": (hit or {}).get("kind", "miss"),
+                    "cards": len(at.session_state["recommendations"]["selected"]),
+                }
+            )
+        for i in range(cfg["chat_turns"]):
+            t0 = time.perf_counter()
+            at.chat_input[0].set_value(CHAT_TURNS[(sid + i) % len(CHAT_TURNS)]).run()
+            ms = (time.perf_counter() - t0) * 1000
+            last = at.session_state["messages"][-1]
+            if at.exception or str(last.get("content", "")).startswith("오류:"):
+                records.append({"kind": "chat", "error": str(last.get("content"))})
+            else:
+                records.append({"kind": "chat", "ms": ms})
+    return {"records": records, "wall_s": time.perf_counter() - t_start, "max_rss_mb": max_rss_mb()}
+
+
+def run_api(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    os.environ["RAWG_API_KEY"] = "bench" if cfg["rawg"] else ""
+    import socket
+
+    import uvicorn
+
+    import server
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    uv = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=uv.run, daemon=True).start()
+    while not uv.started:
+        time.sleep(0.05)
+    base = f"http://127.0.0.1:{port}"
+
+    def post(path: str, body: Dict[str, Any], accept: str = "application/json") -> Any:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(base + path, data=data, headers={"Content-Type": "application/json", "Accept": accept})
+        return urllib.request.urlopen(req, timeout=cfg["timeout"])
+
+    records: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def session(sid: int) -> None:
+        prefs: Dict[str, Any] = {}
+        for prefs in session_plan(cfg, sid):
+            t0 = time.perf_counter()
+            ttfc_ms = None
+            result = None
+            try:
+                with post("/recommend", {"profile": prefs, "model": cfg["model"]}, "application/x-ndjson") as resp:
+                    for line in resp:
+                        event = json.loads(line)
+                        if event["event"] == "card" and ttfc_ms is None:
+                            ttfc_ms = (time.perf_counter() - t0) * 1000
+                        elif event["event"] == "result":
+                            result = event["data"]
+                        elif event["event"] == "error":
+                            raise RuntimeError(event["data"]["error"])
+                if result is None:
+                    raise RuntimeError("stream ended without result")
+                rec = {
+                    "kind": "issue",
+                    "ms": (time.perf_counter() - t0) * 1000,
+                    # 캐시 hit 은 카드 이벤트 없이 result 만 오므로 전체 응답 시간을 첫 카드 시간으로 본다
+                    "ttfc_ms": ttfc_ms if ttfc_ms is not None else (time.perf_counter() - t0) * 1000,
+                    "cache": result["cache"]["kind"],
+                    "cards": len(result["recommendations"]["selected"]),
+                }
+            except urllib.error.HTTPError as e:
+                rec = {"kind": "issue", "error": f"HTTP {e.code}"}
+            except Exception as e:
+                rec = {"kind": "issue", "error": f"{type(e).__name__}: {e}"}
+            with lock:
+                records.append(rec)
+
+        chat_id = f"bench-{sid}"
+        for i in range(cfg["chat_turns"]):
+            t0 = time.perf_counter()
+            body = {"session_id": chat_id, "message": CHAT_TURNS[(sid + i) % len(CHAT_TURNS)], "profile": prefs, "model": cfg["model"]}
+            try:
+                with post("/chat", body) as resp:
+                    json.loads(resp.read())
+                rec = {"kind": "chat", "ms": (time.perf_counter() - t0) * 1000}
+            except urllib.error.HTTPError as e:
+                rec = {"kind": "chat", "error": f"HTTP {e.code}"}
+            except Exception as e:
+                rec = {"kind": "chat", "error": f"{type(e).__name__}: {e}"}
+            with lock:
+                records.append(rec)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=cfg["sessions"]) as pool:
+        list(pool.map(session, range(cfg["sessions"])))
+    wall = time.perf_counter() - t0
+    uv.should_exit = True
+    return {"records": records, "wall_s": wall, "max_rss_mb": max_rss_mb()}
+
+
+WORKERS = {"headless": run_headless, "apptest": run_apptest, "api": run_api}
+
+
+# -----------------------------
+# Orchestration
+# -----------------------------
+def summarize(mode: str, raw: Dict[str, Any], service_calls: Dict[str, int], cache_stats: Dict[str, Any]) -> Dict[str, Any]:
+    issues = [r for r in raw["records"] if r["kind"] == "issue"]
+    chats = [r for r in raw["records"] if r["kind"] == "chat"]
+    ok_issues = [r for r in issues if "error" not in r]
+    n = max(len(ok_issues), 1)
+    rawg_calls = service_calls.get("rawg_search", 0) + service_calls.get("rawg_detail", 0)
+    openai_calls = service_calls.get("openai", 0) + service_calls.get("openai_stream", 0)
+    misses = sum(1 for r in ok_issues if r["cache"] == "miss")
+    return {
+        "mode": mode,
+        "issues": len(issues),
+        "chat_turns": len(chats),
+        "errors": sum(1 for r in raw["records"] if "error" in r),
+        "error_samples": sorted({r["error"] for r in raw["records"] if "error" in r})[:3],
+        "wall_s": round(raw["wall_s"], 2),
+        "throughput_issues_per_s": round(len(ok_issues) / raw["wall_s"], 2) if raw["wall_s"] else None,
+        "issue_ms": percentiles([r["ms"] for r in ok_issues]),
+        "issue_miss_ms": percentiles([r["ms"] for r in ok_issues if r["cache"] == "miss"]),
+        "ttfc_ms": percentiles([r["ttfc_ms"] for r in ok_issues]),
+        "ttfc_miss_ms": percentiles([r["ttfc_ms"] for r in ok_issues if r["cache"] == "miss"]),
+        "chat_ms": percentiles([r["ms"] for r in chats if "error" not in r]),
+        "rawg_calls_per_issue": round(rawg_calls / n, 2),
+        "rawg_calls_per_miss_issue": round(rawg_calls / misses, 2) if misses else None,
+        "openai_calls_per_issue": round(openai_calls / n, 2),
+        "service_calls": service_calls,
+        "cache": {
+            "issue_exact_rate": round(sum(1 for r in ok_issues if r["cache"] == "exact") / n, 3),
+            "issue_similar_rate": round(sum(1 for r in ok_issues if r["cache"] == "similar") / n, 3),
+            "issue_inflight_rate": round(sum(1 for r in ok_issues if r["cache"] == "inflight") / n, 3),
+            **cache_stats,
+        },
+        "memory": {"max_rss_mb": raw["max_rss_mb"]},
+    }
+
+
+def run_mode(mode: str, cfg: Dict[str, Any], services: FakeServices) -> Dict[str, Any]:
+    openai_url, rawg_url = services.urls
+    with tempfile.TemporaryDirectory(prefix=f"sg-bench-{mode}-") as tmp:
+        env = dict(os.environ)
+        env.update(
+            {
+                "OPENAI_BASE_URL": openai_url,
+                "SG_RAWG_BASE": rawg_url,
+                "SG_FACT_CACHE_PATH": os.path.join(tmp, "rawg_facts.sqlite3"),
+                "SG_ALIAS_INDEX_PATH": os.path.join(tmp, "rawg_aliases.sqlite3"),
+                "SG_ISSUE_CACHE_PATH": os.path.join(tmp, "issues.sqlite3"),
+                "SG_TRACE_PATH": os.path.join(tmp, "traces.jsonl"),
+                # 캐시 hit/miss 를 trace 에서 세므로 모든 실행을 남긴다
+                "SG_TRACE_SAMPLE": "1",
+                "SG_METRICS_PATH": os.path.join(tmp, "metrics.prom"),
+                "SG_PIPELINE_CANDIDATES": "1" if cfg["pipelined"] else "0",
+            }
+        )
+        before = services.stats.snapshot()
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", mode, "--worker-config", json.dumps(cfg)],
+            env=env,
+            cwd=tmp,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{mode} worker failed:\n{proc.stderr[-4000:]}")
+        raw = json.loads(proc.stdout.strip().splitlines()[-1])
+        after = services.stats.snapshot()
+        calls = {k: after.get(k, 0) - before.get(k, 0) for k in after}
+        return summarize(mode, raw, calls, trace_cache_stats(env["SG_TRACE_PATH"]))
+
+
+def lookup(d: Dict[str, Any], path: str) -> Optional[float]:
+    for part in path.split("."):
+        if not isinstance(d, dict) or d.get(part) is None:
+            return None
+        d = d[part]
+    return d if isinstance(d, (int, float)) else None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """기준 대비 tolerance(비율) 이상 나빠진 지표 목록."""
+    regressions = []
+    for mode, cur in results["results"].items():
+        base = baseline.get("results", {}).get(mode)
+        if not base:
+            continue
+        for path, higher_is_worse in COMPARED_METRICS:
+            b, c = lookup(base, path), lookup(cur, path)
+            if b is None or c is None or b == 0:
+                continue
+            change = (c - b) / abs(b)
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            flag = "REGRESSION" if worse else "ok"
+            print(f"  [{mode}] {path:<28} base {b:>10} -> {c:>10}  ({change:+.1%})  {flag}")
+            if worse:
+                regressions.append(f"{mode}:{path}")
+        if cur["errors"] > base.get("errors", 0):
+            regressions.append(f"{mode}:errors")
+    return regressions
+
+
+def print_summary(s: Dict[str, Any]) -> None:
+    def pct(p: Optional[Dict[str, float]]) -> str:
+        return f"p50 {p['p50']:.0f} / p90 {p['p90']:.0f} / p99 {p['p99']:.0f} ms" if p else "-"
+
+    print(f"\n== {s['mode']} == issues {s['issues']} · chat {s['chat_turns']} · errors {s['errors']} · wall {s['wall_s']}s")
+    print(f"  issue       {pct(s['issue_ms'])}   (cache miss only: {pct(s['issue_miss_ms'])})")
+    print(f"  first card  {pct(s['ttfc_ms'])}")
+    print(f"  chat        {pct(s['chat_ms'])}")
+    print(f"  throughput  {s['throughput_issues_per_s']} issues/s")
+    print(
+        f"  RAWG calls/issue {s['rawg_calls_per_issue']} (per miss {s['rawg_calls_per_miss_issue']})"
+        f" · OpenAI calls/issue (채팅 포함) {s['openai_calls_per_issue']}"
+    )
+    c = s["cache"]
+    print(
+        f"  cache       issue exact {c['issue_exact_rate']:.0%} · similar {c['issue_similar_rate']:.0%}"
+        f" · in-flight shared {c.get('issue_inflight_rate', 0):.0%}"
+        f" · fact hit {c['fact_hit_rate'] if c['fact_hit_rate'] is not None else '-'} (shared {c.get('fact_shared', 0)})"
+        f" · search fallback {c.get('search_fallbacks', 0)}"
+    )
+    print(f"  memory      max RSS {s['memory']['max_rss_mb']} MB")
+    for e in s["error_samples"]:
+        print(f"  ! {e}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Select Game 오프라인 벤치마크")
+    ap.add_argument("--mode", choices=["headless", "apptest", "api", "both", "all"], default="both", help="both = headless + apptest")
+    ap.add_argument("--sessions", type=int, default=8, help="동시 세션 수 (apptest 는 순서대로)")
+    ap.add_argument("--issues", type=int, default=3, help="세션당 추천호 발행 횟수")
+    ap.add_argument("--chat-turns", type=int, default=2, help="세션당 채팅 턴 수")
+    ap.add_argument("--profiles", type=int, default=6, help="프로필 풀 크기 (작을수록 캐시 hit 증가)")
+    ap.add_argument("--near-ratio", type=float, default=0.2, help="사소하게 바꾼 근접 프로필 비율")
+    ap.add_argument("--no-rawg", action="store_true", help="RAWG 없이 (fallback 경로)")
+    ap.add_argument("--batch", action="store_true", help="파이프라인 모드 끄기")
+    ap.add_argument("--model", default="gpt-4.1-mini")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--ttft", type=float, default=0.35, help="가짜 OpenAI 첫 토큰 지연(초)")
+    ap.add_argument("--tps", type=float, default=180.0, help="가짜 OpenAI 출력 토큰/초")
+    ap.add_argument("--rawg-latency", type=float, default=0.12, help="가짜 RAWG 요청당 지연(초)")
+    ap.add_argument("--timeout", type=float, default=120.0, help="AppTest 실행 / API 요청 제한(초)")
+    ap.add_argument("--out", default=os.path.join(BENCH_DIR, "results", "latest.json"))
+    ap.add_argument("--baseline", default=os.path.join(BENCH_DIR, "baseline.json"))
+    ap.add_argument("--tolerance", type=float, default=0.25, help="회귀로 볼 변화 비율")
+    ap.add_argument("--check", action="store_true", help="기준 대비 회귀가 있으면 exit 1")
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--worker", choices=sorted(WORKERS), help=argparse.SUPPRESS)
+    ap.add_argument("--worker-config", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        raw = WORKERS[args.worker](json.loads(args.worker_config))
+        print(json.dumps(raw, ensure_ascii=False))
+        return 0
+
+    cfg = {
+        "sessions": args.sessions,
+        "issues": args.issues,
+        "chat_turns": args.chat_turns,
+        "profiles": args.profiles,
+        "near_ratio": args.near_ratio,
+        "rawg": not args.no_rawg,
+        "pipelined": not args.batch,
+        "model": args.model,
+        "seed": args.seed,
+        "timeout": args.timeout,
+    }
+    fake_cfg = FakeConfig(openai_ttft=args.ttft, openai_tps=args.tps, rawg_latency=args.rawg_latency)
+    modes = {"both": ["headless", "apptest"], "all": ["headless", "apptest", "api"]}.get(args.mode, [args.mode])
+
+    results: Dict[str, Any] = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {**cfg, "ttft": args.ttft, "tps": args.tps, "rawg_latency": args.rawg_latency},
+        "results": {},
+    }
+    with FakeServices(fake_cfg) as services:
+        for mode in modes:
+            summary = run_mode(mode, cfg, services)
+            results["results"][mode] = summary
+            print_summary(summary)
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nresults -> {args.out}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"baseline -> {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("\n(기준 파일과 설정이 달라 비교 결과는 참고용)")
+        print(f"\nvs baseline ({args.baseline}, tolerance {args.tolerance:.0%})")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("regressions: " + ", ".join(regressions))
+            if args.check:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3753 @@
+# engine.py
+"""Select Game 추천 엔진: 후보 게임명 -> RAWG 팩트 확정 -> 선별, 그리고 채팅.
+
+Streamlit 에 의존하지 않는다. UI(app.py), 배치 CLI(batch.py), 벤치마크(bench/)가 같은 코드를 쓴다.
+공유 자원(HTTP 세션, 캐시, 트레이서 등)은 lazy_singleton 으로 프로세스당 하나만 만든다.
+"""
+import abc
+import atexit
+import contextvars
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from email.utils import parsedate_to_datetime
+from functools import lru_cache, partial, wraps
+from typing import Any, Callable, ContextManager, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, TypedDict
+
+import numpy as np
+import openai
+import requests
+from openai import OpenAI
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # 최신 openai SDK 는 httpx 대신 httpx2 를 쓴다
+    import httpx2 as httpx
+
+try:
+    import tiktoken
+except ImportError:  # 없으면 글자 수 기반 추정
+    tiktoken = None
+
+try:
+    from PIL import Image, features as pil_features
+except ImportError:  # 없으면 표지 local 모드 대신 cdn 모드
+    Image = None
+    pil_features = None
+
+
+# -----------------------------
+# Config
+# -----------------------------
+RAWG_BASE = os.environ.get("SG_RAWG_BASE", "https://api.rawg.io/api")
+TIMEOUT = 15
+
+# RAWG HTTP 세션: 프로세스 전체에서 하나를 공유 (keep-alive 커넥션 풀)
+RAWG_POOL_SIZE = int(os.environ.get("SG_RAWG_POOL_SIZE", "16"))
+RAWG_MAX_RETRIES = int(os.environ.get("SG_RAWG_MAX_RETRIES", "3"))
+RAWG_BACKOFF_BASE = 0.5
+RAWG_BACKOFF_MAX = 8.0
+RAWG_RETRY_STATUS = {429, 500, 502, 503, 504}
+# 서킷 브레이커: 최근 WINDOW 건 중 실패(연결 오류/타임아웃/5xx/SLOW_MS 초과) 비율이 FAILURE_RATE 이상이면 열고,
+# 열린 동안은 RAWG 를 부르지 않고 RAWG 없는 선별로 바로 넘어간다. COOLDOWN 뒤 백그라운드 확인 요청이 성공하면 닫고,
+# 실패하면 COOLDOWN 을 두 배로 (최대 MAX_COOLDOWN)
+RAWG_BREAKER_ENABLED = os.environ.get("SG_RAWG_BREAKER", "1") != "0"
+RAWG_BREAKER_WINDOW = int(os.environ.get("SG_RAWG_BREAKER_WINDOW", "20"))
+RAWG_BREAKER_MIN_CALLS = int(os.environ.get("SG_RAWG_BREAKER_MIN_CALLS", "5"))
+RAWG_BREAKER_FAILURE_RATE = float(os.environ.get("SG_RAWG_BREAKER_FAILURE_RATE", "0.5"))
+RAWG_BREAKER_SLOW_MS = float(os.environ.get("SG_RAWG_BREAKER_SLOW_MS", "5000"))
+RAWG_BREAKER_COOLDOWN_S = float(os.environ.get("SG_RAWG_BREAKER_COOLDOWN_S", "30"))
+RAWG_BREAKER_MAX_COOLDOWN_S = 300.0
+RAWG_BREAKER_PROBE_TIMEOUT = 5
+
+# OpenAI 클라이언트: API 키(해시)별로 하나를 재사용. 타임아웃/커넥션 풀/재시도는 명시적으로
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get("SG_OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_READ_TIMEOUT = float(os.environ.get("SG_OPENAI_READ_TIMEOUT", "120"))
+OPENAI_MAX_RETRIES = int(os.environ.get("SG_OPENAI_MAX_RETRIES", "2"))
+OPENAI_POOL_MAX_CONNECTIONS = int(os.environ.get("SG_OPENAI_POOL_MAX_CONNECTIONS", "20"))
+OPENAI_POOL_MAX_KEEPALIVE = int(os.environ.get("SG_OPENAI_POOL_MAX_KEEPALIVE", "10"))
+OPENAI_CLIENT_IDLE_TTL = 60 * 15
+
+# 채팅 컨텍스트: 최근 턴은 토큰 예산 안에서 그대로, 그 이전은 요약으로 압축
+CHAT_TOKEN_BUDGET = int(os.environ.get("SG_CHAT_TOKEN_BUDGET", "1500"))
+# previous_response_id 로 서버 측 대화 상태를 이어 쓰되, 누적 입력이 이만큼 커지면 요약 후 새로 시작
+CHAT_SERVER_STATE = os.environ.get("SG_CHAT_SERVER_STATE", "1") != "0"
+CHAT_CHAIN_MAX_INPUT_TOKENS = int(os.environ.get("SG_CHAT_CHAIN_MAX_INPUT_TOKENS", "6000"))
+
+# RAWG 팩트 캐시: 공개 게임 데이터라 API 키와 무관하게 공유 (sqlite | memory)
+FACT_CACHE_BACKEND = os.environ.get("SG_FACT_CACHE", "sqlite")
+FACT_CACHE_PATH = os.environ.get("SG_FACT_CACHE_PATH", os.path.join(".cache", "rawg_facts.sqlite3"))
+FACT_CACHE_TTL = 60 * 60 * 24
+FACT_CACHE_MAX_ENTRIES = int(os.environ.get("SG_FACT_CACHE_MAX_ENTRIES", "20000"))
+
+# 별칭 인덱스: 정규화된 제목 -> RAWG id (한 번 확정된 제목은 다음부터 search 생략)
+ALIAS_INDEX_PATH = os.environ.get("SG_ALIAS_INDEX_PATH", os.path.join(".cache", "rawg_aliases.sqlite3"))
+
+# 추천호 전체 결과 캐시: 같은 프로필(정규화)+모델+RAWG 모드면 LLM/RAWG 호출 없이 재사용
+ISSUE_CACHE_BACKEND = os.environ.get("SG_ISSUE_CACHE", FACT_CACHE_BACKEND)
+ISSUE_CACHE_PATH = os.environ.get("SG_ISSUE_CACHE_PATH", os.path.join(".cache", "issues.sqlite3"))
+ISSUE_CACHE_TTL = 60 * 60 * 6
+ISSUE_CACHE_MAX_ENTRIES = int(os.environ.get("SG_ISSUE_CACHE_MAX_ENTRIES", "2000"))
+
+# 의미 기반(근사) 추천호 캐시: 사소하게 다른 프로필은 코사인 유사도로 이전 결과를 재사용
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SG_SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get("SG_SEMANTIC_CACHE_CAPACITY", "1024"))
+SEMANTIC_NGRAM_DIM = 256
+
+# 사이드바 선택지 (프로필 벡터의 one-hot 축으로도 쓰인다)
+GENRES = ["액션 게임", "슈팅 게임", "어드벤쳐 게임", "전략 게임", "롤플레잉 게임", "퍼즐 게임", "음악게임"]
+WANTED_EMOTIONS = ["힐링", "성장", "경쟁", "공포", "수집", "몰입 스토리"]
+PLATFORMS = ["PC", "PS", "Xbox", "Switch", "모바일"]
+
+MODELS = ["gpt-4.1-mini", "gpt-4.1", "gpt-5", "gpt-5.2"]
+DEFAULT_MODEL = os.environ.get("SG_MODEL", "gpt-4.1-mini")
+
+# 후보를 넉넉히 만들되, 최종 추천은 "확신 있는 것만" (개수 강제 X)
+CANDIDATE_COUNT = 18
+RAWG_MATCH_LIMIT = 18
+
+# RAWG 팩트 확정 단계의 동시 조회 수 (후보별 search/detail 을 병렬 처리)
+RAWG_MAX_WORKERS = 6
+
+# search 결과에 팩트 필드가 다 있으면 detail 호출 생략 (빠진 필드가 있을 때만 detail)
+RAWG_FAST_PATH = os.environ.get("SG_RAWG_FAST_PATH", "1") != "0"
+RAWG_FACT_FIELDS = ("name", "released", "genres", "platforms", "rating", "metacritic", "background_image")
+
+# RAWG 키가 없을 때: 모델만으로 추천은 가능하되, 팩트는 보수적으로
+FALLBACK_MAX_RECS = 8
+
+# 파이프라인 모드: 후보 제목이 스트리밍되는 대로 RAWG 조회를 시작 (1·2단계 겹치기)
+PIPELINE_CANDIDATES = os.environ.get("SG_PIPELINE_CANDIDATES", "1") != "0"
+
+# OpenAI 호출은 strict JSON schema(Structured Outputs)로 받는다. JSON 복구 호출은 최후의 수단
+STRUCTURED_OUTPUTS = os.environ.get("SG_STRUCTURED_OUTPUTS", "1") != "0"
+
+# 선별 단계 응답을 스트리밍으로 받아, 게임 하나가 완성될 때마다 카드를 바로 그린다
+STREAM_SELECTION = os.environ.get("SG_STREAM_SELECTION", "1") != "0"
+
+# 단계별 트레이싱: span 은 JSONL 로, 카운터/구간 히스토그램은 Prometheus 텍스트로 남긴다
+TRACE_ENABLED = os.environ.get("SG_TRACE", "1") != "0"
+TRACE_PATH = os.environ.get("SG_TRACE_PATH", os.path.join(".cache", "traces.jsonl"))
+# JSONL 에 남길 실행 비율 (오류가 난 실행은 항상 남긴다). 메모리의 최근 실행(워터폴)은 비율과 무관
+TRACE_SAMPLE_RATE = float(os.environ.get("SG_TRACE_SAMPLE", "0.1"))
+# 파일이 이 크기를 넘으면 <path>.1 로 넘기고 새로 쓴다 (백업은 1개만)
+TRACE_MAX_BYTES = int(os.environ.get("SG_TRACE_MAX_BYTES", str(64 * 1024 * 1024)))
+METRICS_PATH = os.environ.get("SG_METRICS_PATH", os.path.join(".cache", "metrics.prom"))
+TRACE_KEEP_RUNS = 32
+SPAN_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# 표지 이미지: cdn = RAWG 리사이즈 URL + srcset (기본) | local = 원본을 받아 WebP 썸네일로 줄여 디스크 캐시 | off = 원본 URL
+COVER_MODE = os.environ.get("SG_COVER_MODE", "cdn")
+COVER_WIDTHS = (420, 640, 1280)
+COVER_DEFAULT_WIDTH = 640
+# local 썸네일은 Streamlit 정적 서빙(server.enableStaticServing)으로 내보낸다: app.py 옆 static/ 아래 -> app/static/...
+THUMB_CACHE_DIR = os.environ.get(
+    "SG_THUMB_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "thumbs")
+)
+THUMB_URL_PREFIX = os.environ.get("SG_THUMB_URL_PREFIX", "app/static/thumbs/")
+THUMB_CACHE_MAX_BYTES = int(os.environ.get("SG_THUMB_CACHE_MAX_MB", "64")) * 1024 * 1024
+THUMB_WIDTH = 640
+THUMB_QUALITY = 72
+THUMB_MAX_WORKERS = 8
+# 받기/변환에 실패한 표지는 이 시간 동안 다시 시도하지 않는다 (그동안은 CDN URL 로)
+THUMB_FAILURE_TTL = 10 * 60
+THUMB_FAILURE_MAX_ENTRIES = 1024
+
+# 백그라운드 추천호 작업: UI 재실행과 무관하게 돌고, 끝난 작업은 최근 JOB_KEEP 개까지 보관
+JOB_WORKERS = int(os.environ.get("SG_JOB_WORKERS", "4"))
+JOB_KEEP = int(os.environ.get("SG_JOB_KEEP", "200"))
+
+# 외부 API 공유 레이트 리미터: 토큰 버킷(초당 RATE, 최대 BURST) + 적응형 동시성(AIMD) + 세션별 공정 큐
+# 429/503 이나 지연 목표 초과면 동시성 한도를 줄이고, 정상이면 조금씩 늘린다. RAWG 동시성 상한은 커넥션 풀 크기
+RAWG_RATE = float(os.environ.get("SG_RAWG_RATE", "40"))
+RAWG_BURST = int(os.environ.get("SG_RAWG_BURST", "80"))
+RAWG_LATENCY_TARGET_MS = float(os.environ.get("SG_RAWG_LATENCY_TARGET_MS", "2000"))
+OPENAI_RATE = float(os.environ.get("SG_OPENAI_RATE", "8"))
+OPENAI_BURST = int(os.environ.get("SG_OPENAI_BURST", "16"))
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("SG_OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_LATENCY_TARGET_MS = float(os.environ.get("SG_OPENAI_LATENCY_TARGET_MS", "30000"))
+# 경로를 주면 토큰 버킷을 SQLite 파일로 여러 프로세스(Streamlit, API 서버, 배치)가 나눠 쓴다
+LIMITER_SHARED_PATH = os.environ.get("SG_LIMITER_SHARED_PATH", "")
+LIMITER_MAX_WAIT_S = float(os.environ.get("SG_LIMITER_MAX_WAIT_S", "60"))
+LIMITER_THROTTLE_STATUS = {429, 503}
+
+
+# -----------------------------
+# Utilities
+# -----------------------------
+def lazy_singleton(fn: Callable[[], Any]) -> Callable[[], Any]:
+    # 인자 없는 팩토리를 프로세스당 한 번만 호출 (스레드 안전). UI 가 없어도 동작하는 공유 자원용
+    lock = threading.Lock()
+    holder: List[Any] = []
+
+    @wraps(fn)
+    def get() -> Any:
+        if not holder:
+            with lock:
+                if not holder:
+                    holder.append(fn())
+        return holder[0]
+
+    return get
+
+
+class Counters:
+    """프로세스 전체에서 공유하는 단순 카운터 + 게이지 (스레드 안전)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def inc(self, name: str, value: float = 1.0) -> None:
+        with self._lock:
+            self._values[name] = self._values.get(name, 0.0) + value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._values.get(name, 0.0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        # 누적이 아니라 현재 값 (대기열 길이, 동시성 한도 등)
+        with self._lock:
+            self._gauges[name] = value
+
+    def gauges(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._gauges)
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 호출을 하나로 합친다 (프로세스 전체).
+
+    먼저 온 호출만 fn 을 실행하고, 그동안 같은 키로 온 호출은 성공한 결과만 같이 받는다.
+    먼저 온 호출이 실패(취소 포함)하면 기다리던 호출이 직접 다시 시도한다 (그중 하나가 새로 실행).
+    끝난 뒤에 온 호출은 새로 실행한다 (결과 보관은 캐시의 몫). 합쳐진 호출 수는 singleflight_shared_total.
+    """
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Flight] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], wait_check: Optional[Callable[[], None]] = None) -> Tuple[Any, bool]:
+        """(결과, 다른 호출의 결과를 받았는지). wait_check 는 기다리는 동안 주기적으로 호출 (예외로 대기 중단)."""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Flight()
+            if leader:
+                break
+            if wait_check is None:
+                call.done.wait()
+            else:
+                while not call.done.wait(0.1):
+                    wait_check()
+            if call.error is None:
+                app_counters().inc(f'singleflight_shared_total{{kind="{self.kind}"}}')
+                return call.value, True
+            # 앞선 호출의 오류는 그 호출자에게만 -> 다시 줄을 선다
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class CircuitBreaker:
+    """외부 서비스 호출의 서킷 브레이커 (closed -> open -> half_open -> closed).
+
+    closed 에서는 최근 window 건의 성공/실패를 모으다가 실패율이 failure_rate 이상이면 open.
+    open 동안 allow() 는 바로 False 를 돌려주고, cooldown 이 지나면 probe 를 백그라운드 스레드에서 한 번 돌린다
+    (half_open: 그동안에도 요청은 막는다). probe 가 성공하면 closed, 실패하면 cooldown 을 두 배로 늘려 다시 open.
+    """
+
+    STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(
+        self,
+        name: str,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_ms: float,
+        cooldown_s: float,
+        max_cooldown_s: float,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.clock = clock
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_ms = slow_ms
+        self.base_cooldown_s = cooldown_s
+        self.max_cooldown_s = max(cooldown_s, max_cooldown_s)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._window: Deque[bool] = deque(maxlen=max(self.min_calls, window))
+        self._state = "closed"
+        self._cooldown_s = cooldown_s
+        self._retry_at = 0.0
+        self._opened_at: Optional[float] = None
+        self._last_reason = ""
+        self._publish_locked()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _publish_locked(self) -> None:
+        app_counters().set_gauge(f'circuit_breaker_state{{service="{self.name}"}}', self.STATE_VALUES[self._state])
+
+    def _transition_locked(self, state: str) -> None:
+        self._state = state
+        self._publish_locked()
+        app_counters().inc(f'circuit_breaker_transitions_total{{service="{self.name}",to="{state}"}}')
+
+    def _open_locked(self, reason: str) -> None:
+        self._window.clear()
+        self._retry_at = self.clock() + self._cooldown_s
+        self._opened_at = time.time()
+        self._last_reason = reason
+        self._transition_locked("open")
+
+    def allow(self, probe: Optional[Callable[[], bool]] = None) -> bool:
+        # open 이고 cooldown 이 지났으면 probe 를 백그라운드로 띄운다 (이번 호출은 그래도 거절)
+        if not self.enabled or self._state == "closed":
+            return True
+        start_probe = False
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and probe is not None and self.clock() >= self._retry_at:
+                self._transition_locked("half_open")
+                start_probe = True
+        if start_probe:
+            threading.Thread(target=self._probe, args=(probe,), name=f"{self.name}-probe", daemon=True).start()
+        app_counters().inc(f'circuit_breaker_rejected_total{{service="{self.name}"}}')
+        return False
+
+    def record(self, ok: bool, duration_ms: float) -> None:
+        # 느린 성공도 실패로 센다 (사용자에게는 타임아웃과 다를 바 없다)
+        if not self.enabled:
+            return
+        failed = not ok or duration_ms > self.slow_ms
+        with self._lock:
+            if self._state != "closed":
+                # 열리기 전에 나가 있던 호출의 결과는 판단에 쓰지 않는다
+                return
+            self._window.append(failed)
+            failures = sum(self._window)
+            if len(self._window) >= self.min_calls and failures / len(self._window) >= self.failure_rate:
+                self._open_locked(f"최근 {len(self._window)}건 중 {failures}건 실패/지연")
+
+    def _probe(self, probe: Callable[[], bool]) -> None:
+        try:
+            ok = bool(probe())
+        except Exception:
+            ok = False
+        app_counters().inc(f'circuit_breaker_probes_total{{service="{self.name}",result="{"ok" if ok else "fail"}"}}')
+        with self._lock:
+            if ok:
+                self._cooldown_s = self.base_cooldown_s
+                self._window.clear()
+                self._opened_at = None
+                self._transition_locked("closed")
+            else:
+                self._cooldown_s = min(self.max_cooldown_s, self._cooldown_s * 2)
+                self._open_locked("확인 요청 실패")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = sum(self._window)
+            return {
+                "state": self._state,
+                "enabled": self.enabled,
+                "calls": len(self._window),
+                "failures": failures,
+                "reason": self._last_reason if self._state != "closed" else "",
+                "opened_at": self._opened_at,
+                "retry_in_s": round(max(0.0, self._retry_at - self.clock()), 1) if self._state == "open" else None,
+            }
+
+
+@lazy_singleton
+def app_counters() -> Counters:
+    return Counters()
+
+
+# -----------------------------
+# Rate limiting (RAWG / OpenAI, shared)
+# -----------------------------
+# 대기열 공정성 단위. 작업/요청 진입점에서 session_scope 로 정하고, 워커 스레드에는 copy_context 로 따라간다
+limiter_session_var: "contextvars.ContextVar[str]" = contextvars.ContextVar("sg_limiter_session", default="")
+
+
+@contextmanager
+def session_scope(session: str) -> Iterator[None]:
+    token = limiter_session_var.set(session or "")
+    try:
+        yield
+    finally:
+        limiter_session_var.reset(token)
+
+
+def parse_retry_after(value: Optional[str], cap: float) -> Optional[float]:
+    # Retry-After(초 또는 HTTP-date) -> 대기 초 (cap 이하). 없거나 못 읽으면 None
+    if not value:
+        return None
+    try:
+        return min(max(0.0, float(value)), cap)
+    except ValueError:
+        try:
+            return min(max(0.0, parsedate_to_datetime(value).timestamp() - time.time()), cap)
+        except Exception:
+            return None
+
+
+class TokenBucket:
+    """초당 rate 개씩 차는 토큰 버킷 (최대 burst). rate <= 0 이면 제한 없음. clock 은 테스트에서 바꿔 끼운다."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._stamp = clock()
+        self._blocked_until = 0.0
+
+    def try_take(self) -> float:
+        # 토큰이 있으면 하나 쓰고 0, 없으면 다음 토큰까지 남은 초
+        with self._lock:
+            now = self.clock()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self.rate <= 0:
+                return 0.0
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def block(self, seconds: float) -> None:
+        # 서버가 Retry-After 로 알려준 동안은 토큰을 내주지 않는다
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+            self._tokens = 0.0
+
+
+class SqliteTokenBucket(TokenBucket):
+    """여러 프로세스가 SQLite 파일 하나로 같은 버킷을 나눠 쓴다. DB 오류 시에는 프로세스 로컬 버킷으로 동작.
+
+    프로세스끼리 시각을 맞춰야 하므로 clock 기본값은 벽시계(time.time).
+    """
+
+    def __init__(self, path: str, name: str, rate: float, burst: float, clock: Callable[[], float] = time.time) -> None:
+        super().__init__(rate, burst, clock)
+        self.name = name
+        self._db_lock = threading.Lock()
+        self._conn = sqlite_connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS limiter_buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL, blocked_until REAL NOT NULL)"
+        )
+
+    def _update(self, fn: Callable[[float, float, float, float], Tuple[float, float, float, float]]) -> Optional[float]:
+        # (tokens, stamp, blocked_until, now) -> (tokens, stamp, blocked_until, 반환값) 을 한 트랜잭션으로
+        with self._db_lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = self.clock()
+                    row = self._conn.execute(
+                        "SELECT tokens, stamp, blocked_until FROM limiter_buckets WHERE name = ?", (self.name,)
+                    ).fetchone()
+                    tokens, stamp, blocked = row if row else (self.burst, now, 0.0)
+                    tokens, stamp, blocked, result = fn(tokens, stamp, blocked, now)
+                    self._conn.execute(
+                        "INSERT INTO limiter_buckets (name, tokens, stamp, blocked_until) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, stamp = excluded.stamp, "
+                        "blocked_until = excluded.blocked_until",
+                        (self.name, tokens, stamp, blocked),
+                    )
+                    self._conn.execute("COMMIT")
+                    return result
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error:
+                app_counters().inc(f'limiter_shared_errors_total{{service="{self.name}"}}')
+                return None
+
+    def try_take(self) -> float:
+        def take(tokens: float, stamp: float, blocked: float, now: float) -> Tuple[float, float, float, float]:
+            if now < blocked:
+                return tokens, stamp, blocked, blocked - now
+            if self.rate <= 0:
+                return tokens, now, blocked, 0.0
+            tokens = min(self.burst, tokens + max(0.0, now - stamp) * self.rate)
+            if tokens >= 1:
+                return tokens - 1, now, blocked, 0.0
+            return tokens, now, blocked, (1 - tokens) / self.rate
+
+        wait = self._update(take)
+        return super().try_take() if wait is None else wait
+
+    def block(self, seconds: float) -> None:
+        def extend(tokens: float, stamp: float, blocked: float, now: float) -> Tuple[float, float, float, float]:
+            return 0.0, now, max(blocked, now + seconds), 0.0
+
+        if self._update(extend) is None:
+            super().block(seconds)
+
+
+class RateLimited(RuntimeError):
+    """리미터 대기열에서 LIMITER_MAX_WAIT_S 안에 차례가 오지 않음."""
+
+
+class _Ticket:
+    def __init__(self, session: str, now: float) -> None:
+        self.session = session
+        self.granted = False
+        self.t_enqueued = now
+        self.t_granted = 0.0
+        self.throttled = False
+        self.retry_after = 0.0
+        # 스트리밍은 슬롯을 잡은 시간이 곧 생성 시간이라 지연 신호로 쓰지 않는다
+        self.track_latency = True
+
+    def throttle(self, retry_after: float = 0.0) -> None:
+        # 서버가 429/503 으로 거절함 -> 반납 때 동시성을 줄이고 retry_after 동안 버킷을 막는다
+        self.throttled = True
+        self.retry_after = max(self.retry_after, retry_after)
+
+
+class AdaptiveLimiter:
+    """외부 API 하나에 대한 프로세스 공유 리미터.
+
+    토큰 버킷으로 초당 요청 수를, AIMD 로 동시 요청 수를 제한한다. 429/503 이면 한도를 절반으로,
+    지연이 목표를 넘으면 0.9 배로 줄이고 (1초에 한 번까지), 정상 응답마다 1/한도 씩 늘린다.
+    대기열은 세션별로 나눠 두고 세션을 돌아가며 한 건씩 허가한다 (한 세션이 몰아 보내도 다른 세션이 밀리지 않게).
+    """
+
+    DECREASE_COOLDOWN_S = 1.0
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        max_concurrency: int,
+        latency_target_ms: float,
+        bucket: Optional[TokenBucket] = None,
+        max_wait: float = LIMITER_MAX_WAIT_S,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.clock = clock
+        self.bucket = bucket or TokenBucket(rate, burst, clock)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.latency_target_ms = latency_target_ms
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._publish_locked()
+
+    def _grant_locked(self) -> Optional[float]:
+        # 세션 큐 맨 앞을 돌아가며 허가. 토큰이 모자라면 다음 토큰까지 남은 초를 돌려준다
+        granted = False
+        wait: Optional[float] = None
+        while self._queues and self._in_flight < max(1, int(self.limit)):
+            wait = self.bucket.try_take()
+            if wait > 0:
+                break
+            wait = None
+            session, queue = self._queues.popitem(last=False)
+            ticket = queue.popleft()
+            if queue:
+                self._queues[session] = queue
+            ticket.granted = True
+            ticket.t_granted = self.clock()
+            self._in_flight += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        return wait
+
+    def _drop_locked(self, ticket: _Ticket) -> None:
+        queue = self._queues.get(ticket.session)
+        if queue is None:
+            return
+        try:
+            queue.remove(ticket)
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[ticket.session]
+
+    def _publish_locked(self) -> None:
+        counters = app_counters()
+        label = f'{{service="{self.name}"}}'
+        counters.set_gauge(f"limiter_queue_depth{label}", sum(len(q) for q in self._queues.values()))
+        counters.set_gauge(f"limiter_in_flight{label}", self._in_flight)
+        counters.set_gauge(f"limiter_concurrency_limit{label}", round(self.limit, 2))
+
+    def acquire(self, session: Optional[str] = None) -> _Ticket:
+        ticket = _Ticket(limiter_session_var.get() if session is None else session, self.clock())
+        deadline = ticket.t_enqueued + self.max_wait
+        with self._cond:
+            self._queues.setdefault(ticket.session, deque()).append(ticket)
+            while True:
+                wait = self._grant_locked()
+                if ticket.granted:
+                    break
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    self._drop_locked(ticket)
+                    self._publish_locked()
+                    app_counters().inc(f'limiter_timeouts_total{{service="{self.name}"}}')
+                    raise RateLimited(f"{self.name} 요청 대기 시간 초과 ({self.max_wait:g}s)")
+                self._publish_locked()
+                # 토큰 대기면 다음 토큰까지, 동시성 대기면 반납 알림까지
+                self._cond.wait(min(remaining, wait) if wait else remaining)
+            self._publish_locked()
+
+        waited_ms = (ticket.t_granted - ticket.t_enqueued) * 1000
+        app_counters().inc(f'limiter_acquired_total{{service="{self.name}"}}')
+        tracer().observe(f"limiter.wait.{self.name}", waited_ms)
+        span_add("limiter_wait_ms", round(waited_ms, 1))
+        return ticket
+
+    def _decrease_locked(self, factor: float, reason: str, now: float) -> None:
+        app_counters().inc(f'limiter_throttled_total{{service="{self.name}",reason="{reason}"}}')
+        span_add("throttled")
+        if now - self._last_decrease < self.DECREASE_COOLDOWN_S:
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit * factor)
+
+    def release(self, ticket: _Ticket) -> None:
+        now = self.clock()
+        with self._cond:
+            self._in_flight -= 1
+            if ticket.throttled:
+                self._decrease_locked(0.5, "throttled", now)
+            elif ticket.track_latency and (now - ticket.t_granted) * 1000 > self.latency_target_ms:
+                self._decrease_locked(0.9, "latency", now)
+            elif self.limit < self.max_concurrency:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._grant_locked()
+            self._publish_locked()
+            # 토큰 대기 중인 스레드도 깨워 새 한도로 다시 계산하게 한다
+            self._cond.notify_all()
+        if ticket.throttled and ticket.retry_after > 0:
+            self.bucket.block(ticket.retry_after)
+
+    @contextmanager
+    def slot(self, session: Optional[str] = None) -> Iterator[_Ticket]:
+        ticket = self.acquire(session)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = sum(len(q) for q in self._queues.values())
+            snap = {
+                "queued": queued,
+                "sessions": len(self._queues),
+                "in_flight": self._in_flight,
+                "limit": round(self.limit, 2),
+                "max": self.max_concurrency,
+            }
+        counters = app_counters().snapshot()
+        prefix = f'limiter_throttled_total{{service="{self.name}",'
+        snap["throttled"] = int(sum(v for k, v in counters.items() if k.startswith(prefix)))
+        snap["timeouts"] = int(counters.get(f'limiter_timeouts_total{{service="{self.name}"}}', 0))
+        return snap
+
+
+def make_limiter(name: str, rate: float, burst: float, max_concurrency: int, latency_target_ms: float) -> AdaptiveLimiter:
+    bucket: Optional[TokenBucket] = None
+    if LIMITER_SHARED_PATH:
+        try:
+            bucket = SqliteTokenBucket(LIMITER_SHARED_PATH, name, rate, burst)
+        except sqlite3.Error:
+            # 공유 파일을 못 열면 프로세스 로컬 버킷으로
+            bucket = None
+    return AdaptiveLimiter(name, rate, burst, max_concurrency, latency_target_ms, bucket=bucket)
+
+
+@lazy_singleton
+def rawg_limiter() -> AdaptiveLimiter:
+    return make_limiter("rawg", RAWG_RATE, RAWG_BURST, RAWG_POOL_SIZE, RAWG_LATENCY_TARGET_MS)
+
+
+@lazy_singleton
+def openai_limiter() -> AdaptiveLimiter:
+    return make_limiter("openai", OPENAI_RATE, OPENAI_BURST, OPENAI_MAX_CONCURRENCY, OPENAI_LATENCY_TARGET_MS)
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {"rawg": rawg_limiter().stats(), "openai": openai_limiter().stats()}
+
+
+# -----------------------------
+# Tracing (spans / metrics)
+# -----------------------------
+class Span:
+    """한 구간의 시작/끝과 속성. 같은 trace_id 의 span 들이 한 번의 실행(워터폴)을 이룬다."""
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attrs: Dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        self.span_id = os.urandom(4).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ts = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self._t0 = time.perf_counter()
+        self._token: Optional[contextvars.Token] = None
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def add(self, key: str, value: float = 1) -> "Span":
+        self.attrs[key] = self.attrs.get(key, 0) + value
+        return self
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def fail(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.attrs["error"] = type(exc).__name__
+
+    def end(self) -> None:
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._t0) * 1000
+        if self._token is not None:
+            try:
+                self.tracer.current_var.reset(self._token)
+            except ValueError:
+                # 다른 컨텍스트에서 닫힌 경우 (제너레이터 등) -> 부모로 되돌리는 것은 생략
+                pass
+            self._token = None
+        self.tracer.finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start_ts, 6),
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "status": self.status,
+            "attrs": self.attrs,
+        }
+
+
+class Tracer:
+    """span 수집기. 최근 실행들은 메모리에, 표본으로 뽑힌 실행은 JSONL 파일에 남긴다.
+
+    파일에는 루트 span 이 끝날 때 그 실행의 span 을 한 번에 쓴다 (열어 둔 핸들 하나, 크기 초과 시 회전).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        metrics_path: Optional[str],
+        keep_runs: int = TRACE_KEEP_RUNS,
+        enabled: bool = TRACE_ENABLED,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        max_bytes: int = TRACE_MAX_BYTES,
+    ) -> None:
+        self.path = path
+        self.metrics_path = metrics_path
+        self.keep_runs = keep_runs
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._fh: Optional[io.TextIOWrapper] = None
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        # 루트가 끝난 실행의 기록 여부 (루트보다 늦게 끝나는 span 을 따라 쓰기 위함)
+        self._kept: "OrderedDict[str, bool]" = OrderedDict()
+        self._hist: Dict[str, List[int]] = {}
+        self._hist_sum: Dict[str, float] = {}
+        # 현재 span 은 트레이서 인스턴스가 소유한다 -> Tracer 와 span_set/span_add 가 항상 같은 변수를 본다
+        self.current_var: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("sg_current_span", default=None)
+        for p in (path, metrics_path):
+            if p:
+                os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+        atexit.register(self.close)
+
+    def start(self, name: str, parent: Optional[Span] = None, activate: bool = True, **attrs: Any) -> Span:
+        span = Span(self, name, parent or self.current_var.get(), attrs)
+        if activate:
+            span._token = self.current_var.set(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attrs: Any) -> Iterator[Span]:
+        s = self.start(name, parent=parent, **attrs)
+        try:
+            yield s
+        except BaseException as e:
+            s.fail(e)
+            raise
+        finally:
+            s.end()
+
+    def _observe_locked(self, name: str, duration_ms: float) -> None:
+        counts = self._hist.setdefault(name, [0] * (len(SPAN_BUCKETS_MS) + 1))
+        for i, le in enumerate(SPAN_BUCKETS_MS):
+            if duration_ms <= le:
+                counts[i] += 1
+        counts[-1] += 1
+        self._hist_sum[name] = self._hist_sum.get(name, 0.0) + duration_ms
+
+    def observe(self, name: str, duration_ms: float) -> None:
+        # 워터폴(trace)에는 남기지 않고 구간 히스토그램에만 더한다 (UI 재실행처럼 잦고 짧은 구간용)
+        with self._lock:
+            self._observe_locked(name, duration_ms)
+
+    def finish(self, span: Span) -> None:
+        rec = span.to_dict()
+        pending: List[Dict[str, Any]] = []
+        with self._lock:
+            run = self._traces.setdefault(span.trace_id, [])
+            self._traces.move_to_end(span.trace_id)
+            run.append(rec)
+            while len(self._traces) > self.keep_runs:
+                self._traces.popitem(last=False)
+            self._observe_locked(span.name, rec["duration_ms"])
+            if self.enabled and self.path:
+                if span.parent_id is None:
+                    keep = random.random() < self.sample_rate or any(r["status"] == "error" for r in run)
+                    self._kept[span.trace_id] = keep
+                    while len(self._kept) > self.keep_runs:
+                        self._kept.popitem(last=False)
+                    pending = list(run) if keep else []
+                elif self._kept.get(span.trace_id):
+                    pending = [rec]
+
+        if not self.enabled:
+            return
+        # 트레이싱 실패가 추천 흐름을 깨면 안 된다
+        try:
+            with self._write_lock:
+                if pending:
+                    self._write_locked(pending)
+                if self.metrics_path and span.parent_id is None:
+                    tmp = self.metrics_path + ".tmp"
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        f.write(self.prometheus_text())
+                    os.replace(tmp, self.metrics_path)
+        except OSError:
+            pass
+
+    def _write_locked(self, recs: List[Dict[str, Any]]) -> None:
+        fh = self._fh
+        if fh is not None:
+            try:
+                # 다른 프로세스가 회전시켰으면 새 파일로 다시 연다
+                if os.stat(self.path).st_ino != os.fstat(fh.fileno()).st_ino:
+                    fh = None
+            except FileNotFoundError:
+                fh = None
+            if fh is None:
+                self._fh.close()
+                self._fh = None
+        if fh is None:
+            fh = self._fh = open(self.path, "a", encoding="utf-8")
+        fh.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in recs))
+        fh.flush()
+        if fh.tell() >= self.max_bytes:
+            fh.close()
+            self._fh = None
+            os.replace(self.path, self.path + ".1")
+
+    def close(self) -> None:
+        with self._write_lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._traces.get(trace_id, []), key=lambda r: r["start"])
+
+    def prometheus_text(self) -> str:
+        # 카운터 이름은 이미 name{label="..."} 형식이므로 접두사만 붙인다
+        lines: List[str] = []
+        series_by_base: Dict[str, List[Tuple[str, float]]] = {}
+        for name, value in sorted(app_counters().snapshot().items()):
+            series_by_base.setdefault(name.split("{", 1)[0], []).append((name, value))
+        for base, series in series_by_base.items():
+            lines.append(f"# TYPE sg_{base} counter")
+            lines.extend(f"sg_{name} {value:g}" for name, value in series)
+        gauges_by_base: Dict[str, List[Tuple[str, float]]] = {}
+        for name, value in sorted(app_counters().gauges().items()):
+            gauges_by_base.setdefault(name.split("{", 1)[0], []).append((name, value))
+        for base, series in gauges_by_base.items():
+            lines.append(f"# TYPE sg_{base} gauge")
+            lines.extend(f"sg_{name} {value:g}" for name, value in series)
+
+        with self._lock:
+            hist = {name: list(counts) for name, counts in self._hist.items()}
+            sums = dict(self._hist_sum)
+        if hist:
+            lines.append("# TYPE sg_span_duration_ms histogram")
+        for name in sorted(hist):
+            counts = hist[name]
+            for le, c in zip(SPAN_BUCKETS_MS, counts):
+                lines.append(f'sg_span_duration_ms_bucket{{span="{name}",le="{le}"}} {c}')
+            lines.append(f'sg_span_duration_ms_bucket{{span="{name}",le="+Inf"}} {counts[-1]}')
+            lines.append(f'sg_span_duration_ms_sum{{span="{name}"}} {sums[name]:.3f}')
+            lines.append(f'sg_span_duration_ms_count{{span="{name}"}} {counts[-1]}')
+        return "\n".join(lines) + "\n"
+
+
+@lazy_singleton
+def tracer() -> Tracer:
+    return Tracer(TRACE_PATH, METRICS_PATH)
+
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    # 함수 호출 전체를 span 하나로 감싼다 (제너레이터 함수에는 쓰지 않는다)
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with tracer().span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def current_span() -> Optional[Span]:
+    return tracer().current_var.get()
+
+
+def span_set(**attrs: Any) -> None:
+    span = current_span()
+    if span is not None:
+        span.set(**attrs)
+
+
+def span_add(key: str, value: float = 1) -> None:
+    span = current_span()
+    if span is not None:
+        span.add(key, value)
+
+
+def trace_usage(resp: Any, span: Optional[Span] = None) -> None:
+    # resp.usage 의 토큰 수를 span 과 카운터에 누적 (스트리밍은 완료 이벤트의 응답으로 호출)
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "input_tokens_details", None)
+    tokens = {
+        "input": getattr(usage, "input_tokens", 0) or 0,
+        "output": getattr(usage, "output_tokens", 0) or 0,
+        "cached": getattr(details, "cached_tokens", 0) or 0,
+    }
+    span = span or current_span()
+    counters = app_counters()
+    for kind, n in tokens.items():
+        if span is not None:
+            span.add(f"{kind}_tokens", n)
+        counters.inc(f'openai_tokens_total{{kind="{kind}"}}', n)
+
+
+class OpenAIClientRegistry:
+    """API 키 해시 -> OpenAI 클라이언트. 커넥션 풀을 유지하고, 오래 안 쓴 클라이언트는 닫는다."""
+
+    def __init__(self, idle_ttl: float) -> None:
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Tuple[OpenAI, float]] = {}
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key_id(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    def _new_client(self, api_key: str) -> OpenAI:
+        timeout = httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+        http_client = openai.DefaultHttpxClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=OPENAI_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=60,
+            ),
+        )
+        return OpenAI(api_key=api_key, timeout=timeout, max_retries=OPENAI_MAX_RETRIES, http_client=http_client)
+
+    def get(self, api_key: str) -> OpenAI:
+        kid = self.key_id(api_key)
+        now = time.time()
+        stale: List[OpenAI] = []
+        with self._lock:
+            for k, (c, last_used) in list(self._clients.items()):
+                if k != kid and now - last_used > self.idle_ttl:
+                    stale.append(c)
+                    del self._clients[k]
+                    self.evicted += 1
+            entry = self._clients.get(kid)
+            if entry is not None:
+                client = entry[0]
+                self.reused += 1
+            else:
+                client = self._new_client(api_key)
+                self.created += 1
+            self._clients[kid] = (client, now)
+        for c in stale:
+            try:
+                c.close()
+            except Exception:
+                pass
+        return client
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+                "timeouts": int(app_counters().get("openai_timeouts_total")),
+            }
+
+
+@lazy_singleton
+def openai_client_registry() -> OpenAIClientRegistry:
+    return OpenAIClientRegistry(OPENAI_CLIENT_IDLE_TTL)
+
+
+def build_openai_client(api_key: str) -> OpenAI:
+    return openai_client_registry().get(api_key)
+
+
+class _LimitedStream:
+    """스트리밍 응답은 다 읽고 닫을 때까지 리미터 슬롯을 잡는다 (close 에서 한 번만 반납)."""
+
+    def __init__(self, stream: Any, limiter: AdaptiveLimiter, ticket: _Ticket) -> None:
+        self._stream = stream
+        self._limiter = limiter
+        self._ticket: Optional[_Ticket] = ticket
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._stream)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._stream, "close", None)
+            if callable(close):
+                close()
+        finally:
+            ticket, self._ticket = self._ticket, None
+            if ticket is not None:
+                self._limiter.release(ticket)
+
+
+def responses_create(client: OpenAI, **kwargs: Any) -> Any:
+    # 모든 Responses API 호출의 공통 입구 (공유 리미터 + 타임아웃/스로틀 집계)
+    limiter = openai_limiter()
+    ticket = limiter.acquire()
+    try:
+        resp = client.responses.create(**kwargs)
+    except BaseException as e:
+        if isinstance(e, (openai.APITimeoutError, httpx.TimeoutException)):
+            app_counters().inc("openai_timeouts_total")
+            span_add("timeouts")
+        elif isinstance(e, openai.APIStatusError) and e.status_code in LIMITER_THROTTLE_STATUS:
+            ticket.throttle(parse_retry_after(e.response.headers.get("retry-after"), 60.0) or 1.0)
+        limiter.release(ticket)
+        raise
+    if kwargs.get("stream"):
+        ticket.track_latency = False
+        return _LimitedStream(resp, limiter, ticket)
+    limiter.release(ticket)
+    trace_usage(resp)
+    return resp
+
+
+def safe_json_loads(s: str) -> Dict[str, Any]:
+    s = (s or "").strip()
+    if s.startswith("```"):
+        s = re.sub(r"^```[a-zA-Z]*\n?", "", s).strip()
+        s = re.sub(r"\n?```$", "", s).strip()
+    if "{" in s and "}" in s:
+        s2 = s[s.find("{") : s.rfind("}") + 1].strip()
+        try:
+            return json.loads(s2)
+        except Exception:
+            pass
+    return json.loads(s)
+
+
+def join_nonempty(items: List[str]) -> str:
+    items = [x.strip() for x in items if x and x.strip()]
+    return ", ".join(items)
+
+
+class JsonArrayStreamParser:
+    """스트리밍 JSON 에서 `"<key>": [ ... ]` 배열의 원소를 완성되는 즉시 꺼낸다.
+
+    feed() 에 텍스트 조각을 넣으면, 그 사이 닫힌 원소(객체/문자열)를 파싱해 돌려준다.
+    """
+
+    def __init__(self, key: str) -> None:
+        self._key_re = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self._buf = ""
+        self._pos = 0
+        self._in_array = False
+        self.done = False
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+        self._start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Any]:
+        self._buf += chunk
+        out: List[Any] = []
+        if self.done:
+            return out
+        if not self._in_array:
+            m = self._key_re.search(self._buf)
+            if not m:
+                return out
+            self._in_array = True
+            self._pos = m.end()
+
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+                    if self._depth == 0 and self._start is not None:
+                        out.append(self._emit(i))
+            elif ch == '"':
+                self._in_str = True
+                if self._depth == 0 and self._start is None:
+                    self._start = i
+            elif ch in "{[":
+                if self._depth == 0 and self._start is None:
+                    self._start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # 배열 자체가 닫힘
+                    self.done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._start is not None:
+                    out.append(self._emit(i))
+            i += 1
+        self._pos = i
+        return [x for x in out if x is not None]
+
+    def _emit(self, end: int) -> Any:
+        text = self._buf[self._start : end + 1]
+        self._start = None
+        try:
+            return json.loads(text)
+        except Exception:
+            return None
+
+
+def iter_output_text(client: OpenAI, final: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Iterator[str]:
+    # Responses API 스트림의 텍스트 조각을 순서대로 내보낸다. 중간에 멈추면 스트림도 닫는다.
+    # final 을 넘기면 완료 이벤트의 응답 객체를 final["response"] 에 담는다.
+    stream = responses_create(client, stream=True, **kwargs)
+    try:
+        for event in stream:
+            etype = getattr(event, "type", "")
+            if etype == "response.output_text.delta":
+                yield event.delta
+            elif etype == "response.completed":
+                if final is not None:
+                    final["response"] = event.response
+            elif etype in ("response.failed", "error"):
+                err = getattr(getattr(event, "response", None), "error", None) or getattr(event, "message", "")
+                raise RuntimeError(f"OpenAI 스트리밍 실패: {err}")
+    except (openai.APITimeoutError, httpx.TimeoutException):
+        app_counters().inc("openai_timeouts_total")
+        raise
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            close()
+
+
+def stream_response_text(
+    client: OpenAI,
+    on_delta: Callable[[str], None],
+    **kwargs: Any,
+) -> Tuple[str, Any]:
+    # Responses API 스트림을 소비하며 텍스트 조각을 on_delta 로 넘긴다. (전체 텍스트, 최종 응답) 반환
+    parts: List[str] = []
+    final: Dict[str, Any] = {}
+    for delta in iter_output_text(client, final=final, **kwargs):
+        parts.append(delta)
+        on_delta(delta)
+    return "".join(parts), final.get("response")
+
+
+def run_selection_call(
+    client: OpenAI,
+    on_item: Optional[Callable[[Dict[str, Any]], None]],
+    **kwargs: Any,
+) -> str:
+    # on_item 이 있으면 스트리밍으로 selected 원소를 하나씩 넘기고, 없으면 한 번에 받는다
+    if on_item is None:
+        resp = responses_create(client, **kwargs)
+        return (resp.output_text or "").strip()
+
+    parser = JsonArrayStreamParser("selected")
+
+    def _on_delta(delta: str) -> None:
+        for item in parser.feed(delta):
+            if isinstance(item, dict):
+                on_item(item)
+
+    text, final_resp = stream_response_text(client, _on_delta, **kwargs)
+    trace_usage(final_resp)
+    return text.strip()
+
+
+def map_platform_choice_to_rawg_tokens(platform_choice: str) -> List[str]:
+    mapping = {
+        "PC": ["PC"],
+        "PS": ["PlayStation"],
+        "Xbox": ["Xbox"],
+        "Switch": ["Nintendo Switch", "Nintendo"],
+        "모바일": ["Android", "iOS"],
+    }
+    return mapping.get(platform_choice, [])
+
+
+# 사이드바 플랫폼 -> RAWG parent_platforms id (1 PC, 2 PlayStation, 3 Xbox, 4 iOS, 7 Nintendo, 8 Android)
+PLATFORM_PARENT_IDS: Dict[str, Tuple[int, ...]] = {
+    "PC": (1,),
+    "PS": (2,),
+    "Xbox": (3,),
+    "Switch": (7,),
+    "모바일": (4, 8),
+}
+
+
+def platform_parent_ids(user_platforms: List[str]) -> Tuple[int, ...]:
+    ids = set()
+    for up in user_platforms:
+        ids.update(PLATFORM_PARENT_IDS.get(up, ()))
+    return tuple(sorted(ids))
+
+
+def parent_ids_mask(parent_ids: Any) -> int:
+    mask = 0
+    for pid in parent_ids:
+        mask |= 1 << int(pid)
+    return mask
+
+
+@lru_cache(maxsize=512)
+def platform_name_mask(name: str) -> int:
+    # parent_platforms 가 없는 응답용: 플랫폼 이름 -> 비트 (이름당 한 번만 계산)
+    lname = name.lower()
+    mask = 0
+    for choice, pids in PLATFORM_PARENT_IDS.items():
+        if any(t.lower() in lname for t in map_platform_choice_to_rawg_tokens(choice)):
+            mask |= parent_ids_mask(pids)
+    return mask
+
+
+def game_platform_mask(game: Dict[str, Any]) -> int:
+    parents = [(p.get("platform") or {}).get("id") for p in game.get("parent_platforms") or []]
+    parents = [pid for pid in parents if pid]
+    if parents:
+        return parent_ids_mask(parents)
+    mask = 0
+    for name in game_platforms(game):
+        mask |= platform_name_mask(name)
+    return mask
+
+
+# -----------------------------
+# RAWG fact cache (persistent)
+# -----------------------------
+_MISS = object()
+
+
+def sqlite_connect(path: str) -> sqlite3.Connection:
+    # 여러 프로세스/스레드가 같은 파일을 쓰므로 WAL + busy_timeout
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class FactCacheBackend(abc.ABC):
+    """RAWG 응답 캐시 인터페이스. 키는 정규화된 질의/게임 id 만 사용한다 (API 키 X)."""
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @abc.abstractmethod
+    def get(self, key: str, default: Any = _MISS) -> Any:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": type(self).__name__,
+            "entries": len(self),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+class MemoryFactCache(FactCacheBackend):
+    """프로세스 메모리 LRU (테스트/단일 프로세스용)."""
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        super().__init__(ttl, max_entries)
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str, default: Any = _MISS) -> Any:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                value = item[1]
+            else:
+                if item is not None:
+                    del self._data[key]
+                value = _MISS
+        self._count(value is not _MISS)
+        return default if value is _MISS else value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SqliteFactCache(FactCacheBackend):
+    """디스크 SQLite 캐시. WAL 모드라 여러 워커 프로세스가 같은 파일을 동시에 읽고 쓸 수 있다."""
+
+    # last_access 갱신은 이 간격보다 오래된 경우에만 (읽기마다 쓰기 방지)
+    TOUCH_INTERVAL = 60.0
+    # set 이 이 횟수만큼 쌓이면 만료/초과분 정리
+    EVICT_EVERY = 200
+
+    def __init__(self, path: str, ttl: float, max_entries: int) -> None:
+        super().__init__(ttl, max_entries)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS facts (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS facts_last_access ON facts(last_access)")
+        purge_folded_numeral_keys(conn, "facts", "key", "search:")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 커넥션은 스레드마다 하나씩
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite_connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, default: Any = _MISS) -> Any:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires_at, last_access FROM facts WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            if row is not None:
+                conn.execute("DELETE FROM facts WHERE key = ? AND expires_at <= ?", (key, now))
+            self._count(False)
+            return default
+        if now - row[2] > self.TOUCH_INTERVAL:
+            conn.execute("UPDATE facts SET last_access = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO facts (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now),
+        )
+        with self._writes_lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM facts WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            """
+            DELETE FROM facts WHERE key IN (
+                SELECT key FROM facts ORDER BY last_access ASC
+                LIMIT MAX(0, (SELECT COUNT(*) FROM facts) - ?)
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def __len__(self) -> int:
+        return int(self._conn().execute("SELECT COUNT(*) FROM facts").fetchone()[0])
+
+
+def make_fact_cache(
+    kind: str,
+    path: str = FACT_CACHE_PATH,
+    ttl: float = FACT_CACHE_TTL,
+    max_entries: int = FACT_CACHE_MAX_ENTRIES,
+) -> FactCacheBackend:
+    if kind == "memory":
+        return MemoryFactCache(ttl=ttl, max_entries=max_entries)
+    if kind == "sqlite":
+        return SqliteFactCache(path, ttl=ttl, max_entries=max_entries)
+    raise ValueError(f"알 수 없는 캐시 백엔드: {kind}")
+
+
+@lazy_singleton
+def rawg_fact_cache() -> FactCacheBackend:
+    return make_fact_cache(FACT_CACHE_BACKEND)
+
+
+@lazy_singleton
+def issue_cache() -> FactCacheBackend:
+    # 값: 최종 st.session_state.recommendations payload + rawg_mode
+    return make_fact_cache(ISSUE_CACHE_BACKEND, ISSUE_CACHE_PATH, ISSUE_CACHE_TTL, ISSUE_CACHE_MAX_ENTRIES)
+
+
+# -----------------------------
+# Title normalization / alias index
+# -----------------------------
+_TITLE_MARKS = re.compile(r"[™®©℠]")
+_TITLE_PUNCT = re.compile(r"[^\w\s]|_")
+# 한 글자(v, x)는 접지 않는다: "Mega Man X" 와 "Mega Man 10", "Pokémon X" 처럼 숫자가 아닌 이름이 많다
+_ROMAN_NUMERALS = {
+    "ii": "2",
+    "iii": "3",
+    "iv": "4",
+    "vi": "6",
+    "vii": "7",
+    "viii": "8",
+    "ix": "9",
+    "xi": "11",
+    "xii": "12",
+    "xiii": "13",
+    "xiv": "14",
+    "xv": "15",
+}
+
+
+def normalize_title(title: str) -> str:
+    """같은 게임의 표기 차이를 하나로 접는다.
+
+    전각/반각(NFKC), 악센트, ™/®, 대소문자, 구두점, 두 글자 이상 로마 숫자(II -> 2)를 정리한다.
+    한글은 그대로 남는다.
+    """
+    t = unicodedata.normalize("NFKC", _TITLE_MARKS.sub("", title or ""))
+    t = "".join(ch for ch in unicodedata.normalize("NFKD", t) if unicodedata.category(ch) != "Mn")
+    t = unicodedata.normalize("NFC", t).casefold().replace("&", " and ")
+    t = _TITLE_PUNCT.sub(" ", t)
+    return " ".join(_ROMAN_NUMERALS.get(tok, tok) for tok in t.split())
+
+
+# 정규화 규칙이 바뀌면 올린다. 2: 단독 v/x 를 더 이상 5/10 으로 접지 않음
+TITLE_NORMALIZATION_VERSION = 2
+
+
+def purge_folded_numeral_keys(conn: sqlite3.Connection, table: str, column: str, prefix: str = "") -> None:
+    # 1판이 v/x 를 접어 만든 키(5/10 토큰)는 다른 게임을 가리킬 수 있다. 파일마다 한 번만 지운다
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= TITLE_NORMALIZATION_VERSION:
+        return
+    padded = f"(' ' || replace({column}, '|', ' ') || ' ')"
+    conn.execute(
+        f"DELETE FROM {table} WHERE {column} LIKE ? AND ({padded} LIKE '% 5 %' OR {padded} LIKE '% 10 %')",
+        (prefix + "%",),
+    )
+    conn.execute(f"PRAGMA user_version = {TITLE_NORMALIZATION_VERSION}")
+
+
+class AliasIndex:
+    """정규화 제목 -> RAWG id 를 학습하는 영속 인덱스 (SQLite)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.saved_searches = 0
+        self._conn().execute(
+            """
+            CREATE TABLE IF NOT EXISTS aliases (
+                alias TEXT PRIMARY KEY,
+                game_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_hit REAL
+            )
+            """
+        )
+        purge_folded_numeral_keys(self._conn(), "aliases", "alias")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite_connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, title: str) -> Optional[int]:
+        alias = normalize_title(title)
+        if not alias:
+            return None
+        conn = self._conn()
+        row = conn.execute("SELECT game_id FROM aliases WHERE alias = ?", (alias,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE aliases SET hits = hits + 1, last_hit = ? WHERE alias = ?", (time.time(), alias))
+        with self._lock:
+            self.saved_searches += 1
+        return int(row[0])
+
+    def record(self, game_id: int, *titles: str) -> None:
+        now = time.time()
+        conn = self._conn()
+        for title in titles:
+            alias = normalize_title(title)
+            if not alias:
+                continue
+            conn.execute(
+                """
+                INSERT INTO aliases (alias, game_id, title, created_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(alias) DO UPDATE SET game_id = excluded.game_id, title = excluded.title
+                """,
+                (alias, int(game_id), title, now),
+            )
+
+    def entries(self, limit: int = 200) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT alias, game_id, title, hits FROM aliases ORDER BY hits DESC, created_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [{"alias": a, "game_id": gid, "title": t, "hits": h} for a, gid, t, h in rows]
+
+    def stats(self) -> Dict[str, int]:
+        entries, total_hits = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM aliases").fetchone()
+        with self._lock:
+            saved = self.saved_searches
+        return {"entries": int(entries), "saved_searches": saved, "saved_searches_total": int(total_hits)}
+
+
+@lazy_singleton
+def rawg_alias_index() -> AliasIndex:
+    return AliasIndex(ALIAS_INDEX_PATH)
+
+
+# -----------------------------
+# RAWG API helpers (optional)
+# -----------------------------
+@lazy_singleton
+def rawg_http_session() -> requests.Session:
+    # 세션/어댑터는 한 번만 만들고 모든 세션·스레드가 공유 -> TCP+TLS 핸드셰이크 재사용
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=RAWG_POOL_SIZE, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive", "User-Agent": "SelectGame/1.0"})
+    return session
+
+
+def rawg_pool_stats() -> Dict[str, int]:
+    # urllib3 풀의 요청 수/새 커넥션 수로 재사용률을 계산
+    adapter = rawg_http_session().get_adapter(RAWG_BASE)
+    pools = adapter.poolmanager.pools
+    total_requests = 0
+    new_connections = 0
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        total_requests += pool.num_requests
+        new_connections += pool.num_connections
+    return {
+        "requests": total_requests,
+        "connections": new_connections,
+        "reused": max(0, total_requests - new_connections),
+        "retries": int(app_counters().get("rawg_retries_total")),
+        "search_fallbacks": int(app_counters().get("rawg_search_fallbacks_total")),
+    }
+
+
+def rawg_backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    # Retry-After(초 또는 HTTP-date)를 우선, 없으면 full-jitter 지수 백오프
+    wait = parse_retry_after(retry_after, RAWG_BACKOFF_MAX)
+    if wait is not None:
+        return wait
+    return random.uniform(0, min(RAWG_BACKOFF_MAX, RAWG_BACKOFF_BASE * (2**attempt)))
+
+
+@lazy_singleton
+def rawg_flight() -> SingleFlight:
+    # 키는 팩트 캐시 키와 같다 (search:<제목>|pp=.. / detail:<id>)
+    return SingleFlight("rawg")
+
+
+class RawgUnavailable(RuntimeError):
+    """RAWG 서킷 브레이커가 열려 있어 호출하지 않았음."""
+
+
+@lazy_singleton
+def rawg_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        "rawg",
+        window=RAWG_BREAKER_WINDOW,
+        min_calls=RAWG_BREAKER_MIN_CALLS,
+        failure_rate=RAWG_BREAKER_FAILURE_RATE,
+        slow_ms=RAWG_BREAKER_SLOW_MS,
+        cooldown_s=RAWG_BREAKER_COOLDOWN_S,
+        max_cooldown_s=RAWG_BREAKER_MAX_COOLDOWN_S,
+        enabled=RAWG_BREAKER_ENABLED,
+    )
+
+
+def rawg_probe(rawg_key: str) -> bool:
+    # 반개방 확인용 가벼운 요청 하나 (짧은 타임아웃, 재시도 없음). 429 는 살아 있다는 뜻이므로 성공으로 본다
+    t0 = time.perf_counter()
+    try:
+        r = rawg_http_session().get(
+            f"{RAWG_BASE}/games", params={"key": rawg_key, "page_size": 1}, timeout=RAWG_BREAKER_PROBE_TIMEOUT
+        )
+        r.close()
+    except requests.RequestException:
+        return False
+    return r.status_code < 500 and (time.perf_counter() - t0) * 1000 <= RAWG_BREAKER_SLOW_MS
+
+
+def rawg_available(rawg_key: str) -> bool:
+    # 브레이커가 닫혀 있으면 True. 열려 있으면 False 이고, 쿨다운이 지났으면 이 키로 백그라운드 확인을 시작한다
+    return rawg_breaker().allow(probe=lambda: rawg_probe(rawg_key))
+
+
+@traced("rawg.http")
+def rawg_get(rawg_key: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if not rawg_key:
+        raise ValueError("RAWG API 키가 필요합니다.")
+    params = params or {}
+    params["key"] = rawg_key
+    url = f"{RAWG_BASE}{endpoint}"
+    span_set(endpoint=endpoint)
+    session = rawg_http_session()
+
+    limiter = rawg_limiter()
+    breaker = rawg_breaker()
+    for attempt in range(RAWG_MAX_RETRIES + 1):
+        # 브레이커가 열렸으면 (재시도 중이어도) 타임아웃을 기다리지 않고 바로 포기
+        if not rawg_available(rawg_key):
+            span_set(breaker=breaker.state)
+            raise RawgUnavailable("RAWG 응답 오류/지연이 이어져 잠시 RAWG 호출을 건너뜁니다.")
+        # 시도마다 공유 리미터 슬롯을 잡는다. 백오프 대기는 슬롯 밖에서 (다른 세션 요청을 막지 않게)
+        delay: Optional[float] = None
+        with limiter.slot() as ticket:
+            t0 = time.perf_counter()
+            try:
+                r = session.get(url, params=params, timeout=TIMEOUT)
+            except requests.RequestException as e:
+                breaker.record(False, (time.perf_counter() - t0) * 1000)
+                if not isinstance(e, requests.ConnectionError) or attempt >= RAWG_MAX_RETRIES:
+                    raise
+                delay = rawg_backoff_delay(attempt)
+            else:
+                # 4xx(키 오류, 없는 게임, 429)는 RAWG 가 살아 있다는 뜻 -> 브레이커에는 성공
+                breaker.record(r.status_code < 500, (time.perf_counter() - t0) * 1000)
+                if r.status_code in LIMITER_THROTTLE_STATUS:
+                    ticket.throttle(rawg_backoff_delay(attempt, r.headers.get("Retry-After")))
+                if r.status_code in RAWG_RETRY_STATUS and attempt < RAWG_MAX_RETRIES:
+                    delay = ticket.retry_after if ticket.throttled else rawg_backoff_delay(attempt)
+                    r.close()
+                else:
+                    span_set(status=r.status_code)
+                    r.raise_for_status()
+                    return r.json()
+
+        app_counters().inc("rawg_retries_total")
+        span_add("retries")
+        time.sleep(delay)
+
+    raise RuntimeError("unreachable")
+
+
+def rawg_hit_matches(query: str, hit: Dict[str, Any]) -> bool:
+    # 정규화 이름, slug, (있으면) alternative_names 중 하나가 질의와 같으면 같은 게임으로 본다
+    want = normalize_title(query)
+    names = [hit.get("name") or "", (hit.get("slug") or "").replace("-", " ")]
+    names += list(hit.get("alternative_names") or [])
+    return any(normalize_title(n) == want for n in names if n)
+
+
+def _rawg_search(rawg_key: str, query: str, parent_platforms: Tuple[int, ...]) -> Tuple[Optional[Dict[str, Any]], str]:
+    cache = rawg_fact_cache()
+    key = f"search:{normalize_title(query)}"
+    if parent_platforms:
+        key += f"|pp={','.join(str(p) for p in parent_platforms)}"
+    cached = cache.get(key)
+    if cached is not _MISS:
+        return cached, "hit"
+
+    def fetch() -> Optional[Dict[str, Any]]:
+        params: Dict[str, Any] = {"search": query, "page_size": 5, "search_precise": True}
+        if parent_platforms:
+            # 플랫폼 필터를 서버에서 적용 -> 다른 플랫폼 게임은 애초에 받지 않는다
+            params["parent_platforms"] = ",".join(str(p) for p in parent_platforms)
+        data = rawg_get(rawg_key, "/games", params=params)
+        results = data.get("results") or []
+        top = results[0] if results else None
+        if parent_platforms and results:
+            # 필터 검색은 이름이 다른 게임이 1위로 올라올 수 있으므로 이름/별칭이 맞는 결과만 쓴다
+            matched = [r for r in results if rawg_hit_matches(query, r)]
+            top = matched[0] if matched else None
+            if top is None:
+                # 결과는 있는데 이름이 맞는 게 없을 때만 필터 없이 다시 찾는다 (플랫폼 불일치는 호출 측 마스크가 거른다)
+                # 결과가 0개면 필터가 이미 그 게임을 걸러낸 것이므로 더 부르지 않는다
+                app_counters().inc("rawg_search_fallbacks_total")
+                span_set(fallback=True)
+                top, _ = _rawg_search(rawg_key, query, ())
+        cache.set(key, top)
+        if top and top.get("id"):
+            # 별칭 인덱스로 search 를 건너뛸 때도 search 결과를 그대로 쓰도록 id 로도 저장
+            cache.set(f"hit:{int(top['id'])}", top)
+        return top
+
+    # 다른 세션이 같은 제목을 막 조회 중이면 그 응답을 같이 받는다
+    top, shared = rawg_flight().do(key, fetch)
+    return top, "shared" if shared else "miss"
+
+
+@traced("rawg.search")
+def rawg_search_top(
+    rawg_key: str,
+    query: str,
+    parent_platforms: Tuple[int, ...] = (),
+) -> Optional[Dict[str, Any]]:
+    top, state = _rawg_search(rawg_key, query, parent_platforms)
+    span_set(cache=state)
+    return top
+
+
+def rawg_cached_hit(game_id: int) -> Optional[Dict[str, Any]]:
+    hit = rawg_fact_cache().get(f"hit:{int(game_id)}", None)
+    return hit if isinstance(hit, dict) else None
+
+
+def rawg_hit_has_facts(hit: Optional[Dict[str, Any]]) -> bool:
+    # null 값(예: metacritic 없음)은 detail 에서도 같으므로 "키가 있는지"만 본다
+    if not hit:
+        return False
+    if any(f not in hit for f in RAWG_FACT_FIELDS):
+        return False
+    return bool(hit.get("platforms"))
+
+
+@traced("rawg.detail")
+def rawg_game_detail(rawg_key: str, game_id: int) -> Dict[str, Any]:
+    cache = rawg_fact_cache()
+    key = f"detail:{int(game_id)}"
+    cached = cache.get(key)
+    if cached is not _MISS:
+        span_set(cache="hit")
+        return cached
+
+    def fetch() -> Dict[str, Any]:
+        detail = rawg_get(rawg_key, f"/games/{game_id}")
+        cache.set(key, detail)
+        return detail
+
+    detail, shared = rawg_flight().do(key, fetch)
+    span_set(cache="shared" if shared else "miss")
+    return detail
+
+
+def game_platforms(detail: Dict[str, Any]) -> List[str]:
+    out = []
+    for p in detail.get("platforms") or []:
+        name = (p.get("platform") or {}).get("name")
+        if name:
+            out.append(name)
+    # uniq preserve order
+    seen = set()
+    uniq = []
+    for x in out:
+        if x not in seen:
+            uniq.append(x)
+            seen.add(x)
+    return uniq
+
+
+def game_genres(detail: Dict[str, Any]) -> List[str]:
+    out = []
+    for g in detail.get("genres") or []:
+        name = g.get("name")
+        if name:
+            out.append(name)
+    return out
+
+
+@traced("rawg.resolve")
+def rawg_resolve_title(
+    rawg_key: str,
+    title: str,
+    parent_platforms: Tuple[int, ...] = (),
+    fast_path: bool = RAWG_FAST_PATH,
+    claim: Optional[Callable[[int], bool]] = None,
+) -> Dict[str, Any]:
+    # 후보 1개: (별칭 인덱스 | search) -> [필요할 때만] detail (워커 스레드에서 실행)
+    # claim(gid) 이 False 면 앞선 후보가 같은 게임을 이미 잡은 것 -> detail 을 받지 않고 duplicate
+    t0 = time.perf_counter()
+    aliases = rawg_alias_index()
+    via = "alias"
+    top: Optional[Dict[str, Any]] = None
+    source = None
+    used_detail = False
+    unavailable = False
+    duplicate = False
+    # 브레이커가 열려 있어도 캐시에 있는 팩트는 그대로 쓴다 (캐시 miss 만 RawgUnavailable)
+    try:
+        gid = aliases.lookup(title)
+        if gid is not None:
+            top = rawg_cached_hit(gid) or {"id": gid, "name": title}
+        else:
+            via = "search"
+            top = rawg_search_top(rawg_key, title, parent_platforms)
+            if top and top.get("id"):
+                aliases.record(int(top["id"]), title, top.get("name") or "")
+
+        if top and top.get("id"):
+            if claim is not None and not claim(int(top["id"])):
+                duplicate = True
+            elif fast_path and rawg_hit_has_facts(top):
+                source = top
+            else:
+                used_detail = True
+                source = rawg_game_detail(rawg_key, int(top["id"]))
+    except RawgUnavailable:
+        unavailable = True
+    span_set(title=title, via=via, detail=used_detail, matched=source is not None, unavailable=unavailable, duplicate=duplicate)
+    return {
+        "title": title,
+        "top": top,
+        "source": source,
+        "via": via,
+        "detail": used_detail,
+        "unavailable": unavailable,
+        "duplicate": duplicate,
+        "ms": (time.perf_counter() - t0) * 1000,
+    }
+
+
+@traced("rawg.resolve_facts")
+def resolve_rawg_facts(
+    rawg_key: str,
+    candidates: Iterable[str],
+    user_platforms: List[str],
+    limit: int = RAWG_MATCH_LIMIT,
+    max_workers: int = RAWG_MAX_WORKERS,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """후보들을 병렬로 조회하되, 결과는 후보 순서대로 확정한다.
+
+    candidates 는 리스트뿐 아니라 스트리밍 제너레이터여도 된다 (제목이 나오는 즉시 조회 시작).
+    반환: (factual, timings) — timings 에는 후보별 지연(ms)/상태와 전체 소요 시간이 담긴다.
+    """
+    t0 = time.perf_counter()
+    factual: List[Dict[str, Any]] = []
+    per_title: List[Dict[str, Any]] = []
+    seen_ids = set()
+    parent_platforms = platform_parent_ids(user_platforms)
+    user_mask = parent_ids_mask(parent_platforms)
+
+    titles: List[str] = []
+    futures: List[Any] = []
+    confirmed = 0
+    stopped = False
+    # 게임 id -> 그 id 를 잡은 가장 앞선 후보 순번. 뒤 후보가 같은 게임이면 detail 조회를 건너뛴다
+    claims: Dict[int, int] = {}
+    claims_lock = threading.Lock()
+
+    def claim(order: int, gid: int) -> bool:
+        with claims_lock:
+            first = claims.setdefault(gid, order)
+            if order < first:
+                claims[gid] = order
+        return order <= first
+
+    def confirm(res: Dict[str, Any]) -> None:
+        nonlocal stopped
+        row = {
+            "title": res["title"],
+            "ms": round(res["ms"], 1),
+            "via": res["via"],
+            "detail": res["detail"],
+            "status": "matched",
+        }
+        per_title.append(row)
+
+        top = res["top"]
+        src = res["source"]
+        if res["unavailable"]:
+            row["status"] = "rawg_unavailable"
+            return
+        if res["duplicate"]:
+            row["status"] = "duplicate"
+            return
+        if not top or not top.get("id") or src is None:
+            row["status"] = "no_match"
+            return
+
+        gid = int(top["id"])
+        if gid in seen_ids:
+            row["status"] = "duplicate"
+            return
+
+        plats = game_platforms(src)
+        if user_mask and not (user_mask & game_platform_mask(src)):
+            row["status"] = "platform_filtered"
+            return
+
+        seen_ids.add(gid)
+        factual.append(
+            {
+                "id": gid,
+                "name": src.get("name") or top.get("name") or res["title"],
+                "released": src.get("released"),
+                "genres": game_genres(src),
+                "platforms": plats,
+                "metacritic": src.get("metacritic"),
+                "rating": src.get("rating"),
+                "background_image": src.get("background_image"),
+            }
+        )
+        if len(factual) >= limit:
+            stopped = True
+
+    def drain(block: bool) -> None:
+        # 앞에서부터 끝난 것만 순서대로 확정 (block=True 면 남은 것을 모두 기다림)
+        nonlocal confirmed
+        while confirmed < len(futures) and not stopped:
+            fut = futures[confirmed]
+            if not block and not fut.done():
+                return
+            confirm(fut.result())
+            confirmed += 1
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="rawg")
+    try:
+        for title in candidates:
+            titles.append(title)
+            # 워커 스레드의 span 도 이 단계의 자식으로 남도록 컨텍스트를 복사해 넘긴다
+            futures.append(
+                pool.submit(
+                    contextvars.copy_context().run,
+                    rawg_resolve_title,
+                    rawg_key,
+                    title,
+                    parent_platforms,
+                    claim=partial(claim, len(futures)),
+                )
+            )
+            drain(block=False)
+            if stopped:
+                break
+        drain(block=True)
+    finally:
+        # 조기 종료: 아직 시작 안 한 조회는 취소, 스트리밍 후보 생성도 중단
+        pool.shutdown(wait=False, cancel_futures=True)
+        close = getattr(candidates, "close", None)
+        if callable(close):
+            close()
+
+    for rest in titles[confirmed:]:
+        per_title.append({"title": rest, "ms": None, "via": None, "detail": False, "status": "skipped"})
+
+    timings = {
+        "titles": per_title,
+        "wall_ms": round((time.perf_counter() - t0) * 1000, 1),
+        "serial_ms": round(sum(r["ms"] or 0 for r in per_title), 1),
+    }
+    span_set(candidates=len(titles), matched=len(factual), early_stop=stopped)
+    return factual, timings
+
+
+# -----------------------------
+# Cover images
+# -----------------------------
+RAWG_MEDIA_RE = re.compile(r"^(https?://media\.rawg\.io/media/)(?!resize/|crop/)(.+)$")
+
+
+def rawg_resized_url(url: str, width: int) -> Optional[str]:
+    # RAWG CDN 은 media/resize/<폭>/-/<원래 경로> 로 줄인 이미지를 준다 (RAWG 표지가 아니면 None)
+    m = RAWG_MEDIA_RE.match(url or "")
+    return f"{m.group(1)}resize/{width}/-/{m.group(2)}" if m else None
+
+
+class ThumbnailCache:
+    """표지 원본을 받아 작은 WebP(미지원이면 JPEG) 썸네일로 줄여 디스크에 보관.
+
+    총 용량이 max_bytes 를 넘으면 오래 안 쓴 파일부터 지운다. 같은 표지를 동시에 요청하면 한 번만 받는다.
+    get() 은 파일 이름만 돌려주고, 브라우저는 url_prefix 아래 정적 URL 로 직접 받는다.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        width: int = THUMB_WIDTH,
+        quality: int = THUMB_QUALITY,
+        url_prefix: str = THUMB_URL_PREFIX,
+        failure_ttl: float = THUMB_FAILURE_TTL,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.width = width
+        self.quality = quality
+        self.url_prefix = url_prefix
+        self.failure_ttl = failure_ttl
+        self.fmt = "WEBP" if pil_features is not None and pil_features.check("webp") else "JPEG"
+        self._lock = threading.Lock()
+        self._flight = SingleFlight("thumb")
+        self._pool = ThreadPoolExecutor(max_workers=THUMB_MAX_WORKERS, thread_name_prefix="thumb")
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "failures": 0,
+            "failures_skipped": 0,
+            "evictions": 0,
+            "source_bytes": 0,
+            "thumb_bytes": 0,
+        }
+        # 경로 -> 다시 시도해도 되는 시각 (실패한 표지를 렌더링마다 다시 받지 않도록)
+        self._failed: "OrderedDict[str, float]" = OrderedDict()
+        # 경로 -> 크기, 오래 안 쓴 순서 (재시작해도 파일 mtime 으로 복원)
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp") or name.startswith("."):
+                continue
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, path, info.st_size))
+        for _, path, size in sorted(entries):
+            self._files[path] = size
+        self._total = sum(self._files.values())
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha1(f"{url}|{self.width}|{self.quality}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.{self.fmt.lower()}")
+
+    def get(self, url: str) -> Optional[str]:
+        """표지 URL -> 썸네일 파일 이름 (없으면 만들고, 실패하면 None)."""
+        path = self._path(url)
+        with self._lock:
+            known = path in self._files
+            if known:
+                self._files.move_to_end(path)
+            elif self._failed.get(path, 0.0) > time.time():
+                self._stats["failures_skipped"] += 1
+                return None
+        if known:
+            try:
+                os.utime(path)
+                with self._lock:
+                    self._stats["hits"] += 1
+                return os.path.basename(path)
+            except OSError:
+                with self._lock:
+                    self._total -= self._files.pop(path, 0)
+        name, _ = self._flight.do(path, lambda: self._build(url, path))
+        return name
+
+    def url_for(self, name: str) -> str:
+        return self.url_prefix + name
+
+    def _fail(self, path: str) -> None:
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failed[path] = time.time() + self.failure_ttl
+            self._failed.move_to_end(path)
+            while len(self._failed) > THUMB_FAILURE_MAX_ENTRIES:
+                self._failed.popitem(last=False)
+        app_counters().inc("cover_thumb_failures_total")
+
+    def _build(self, url: str, path: str) -> Optional[str]:
+        try:
+            r = rawg_http_session().get(url, timeout=TIMEOUT)
+            r.raise_for_status()
+            source = r.content
+            img = Image.open(io.BytesIO(source))
+            # JPEG 는 디코딩 단계에서부터 작게 (큰 원본도 메모리/CPU 를 덜 쓴다)
+            img.draft("RGB", (self.width, self.width))
+            img = img.convert("RGB")
+            img.thumbnail((self.width, self.width * 4))
+            buf = io.BytesIO()
+            img.save(buf, self.fmt, quality=self.quality)
+            data = buf.getvalue()
+        except Exception:
+            self._fail(path)
+            return None
+
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            self._fail(path)
+            return None
+        with self._lock:
+            self._failed.pop(path, None)
+            self._stats["misses"] += 1
+            self._stats["source_bytes"] += len(source)
+            self._stats["thumb_bytes"] += len(data)
+            self._total += len(data) - self._files.pop(path, 0)
+            self._files[path] = len(data)
+            evicted = []
+            while self._total > self.max_bytes and len(self._files) > 1:
+                old, size = self._files.popitem(last=False)
+                self._total -= size
+                evicted.append(old)
+            self._stats["evictions"] += len(evicted)
+        for old in evicted:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        app_counters().inc("cover_resized_total")
+        app_counters().inc("cover_bytes_saved_total", max(0, len(source) - len(data)))
+        return os.path.basename(path)
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        # 한 지면의 표지들을 동시에 받는다 (캐시에 있는 것은 바로)
+        unique = list(dict.fromkeys(u for u in urls if u))
+        return dict(zip(unique, self._pool.map(self.get, unique)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out.update(files=len(self._files), bytes=self._total, format=self.fmt, failed=len(self._failed))
+        out["saved_bytes"] = max(0, out["source_bytes"] - out["thumb_bytes"])
+        return out
+
+
+@lazy_singleton
+def thumbnail_cache() -> ThumbnailCache:
+    return ThumbnailCache(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES)
+
+
+def cover_mode() -> str:
+    # local 은 Pillow 가 있어야 한다
+    if COVER_MODE == "local" and Image is None:
+        return "cdn"
+    return COVER_MODE if COVER_MODE in ("cdn", "local", "off") else "cdn"
+
+
+def cover_sources(urls: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """표지 URL -> <img> 속성 {"src", "srcset"(선택)}. 모드별로 작은 이미지를 가리키게 바꾼다."""
+    urls = [u for u in dict.fromkeys(urls) if u]
+    mode = cover_mode()
+    out: Dict[str, Dict[str, str]] = {}
+    thumbs = thumbnail_cache().get_many(urls) if mode == "local" else {}
+    for url in urls:
+        name = thumbs.get(url)
+        if name is not None:
+            out[url] = {"src": thumbnail_cache().url_for(name)}
+            continue
+        resized = {w: rawg_resized_url(url, w) for w in COVER_WIDTHS} if mode != "off" else {}
+        if resized and all(resized.values()):
+            out[url] = {
+                "src": resized[COVER_DEFAULT_WIDTH],
+                "srcset": ", ".join(f"{u} {w}w" for w, u in resized.items()),
+            }
+        else:
+            out[url] = {"src": url}
+    return out
+
+
+# -----------------------------
+# Profile builder
+# -----------------------------
+PROFILE_DEFAULTS: Dict[str, Any] = {
+    "preferred_genres": [],
+    "wanted_emotions": [],
+    "wanted_free": "",
+    "played_games": "",
+    "platforms": [],
+    "hours_per_day": 1.5,
+}
+
+
+def profile_prefs(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """외부 입력(JSONL 등)을 build_profile_text 인자로 정리. 모르는 키는 버리고, 리스트는 쉼표 문자열도 받는다.
+
+    형식이 맞지 않으면 ValueError (메시지는 그대로 사용자에게 보여 줘도 된다).
+    """
+    prefs: Dict[str, Any] = {}
+    for key, default in PROFILE_DEFAULTS.items():
+        value = raw.get(key, default)
+        if value is None:
+            value = default
+        if isinstance(default, list):
+            if isinstance(value, str):
+                value = [v.strip() for v in value.split(",") if v.strip()]
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise ValueError(f"{key} 는 문자열 목록(또는 쉼표로 구분한 문자열)이어야 합니다.")
+            value = list(value)
+        elif isinstance(default, float):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} 는 숫자여야 합니다.") from None
+            if not 0.0 <= value <= 24.0:
+                raise ValueError(f"{key} 는 0~24 사이여야 합니다.")
+        else:
+            if isinstance(value, list) and all(isinstance(v, str) for v in value):
+                value = ", ".join(value)
+            if not isinstance(value, (str, int, float)):
+                raise ValueError(f"{key} 는 문자열이어야 합니다.")
+            value = str(value)
+        prefs[key] = value
+    return prefs
+
+
+def build_profile_text(
+    preferred_genres: List[str],
+    wanted_emotions: List[str],
+    wanted_free: str,
+    played_games: str,
+    platforms: List[str],
+    hours_per_day: float,
+) -> str:
+    free = wanted_free.strip()
+    wanted_part = join_nonempty(wanted_emotions) if wanted_emotions else "없음/미선택"
+    if free:
+        wanted_part = f"{wanted_part} + 자유입력: {free}" if wanted_part != "없음/미선택" else f"자유입력: {free}"
+
+    return f"""
+[사용자 선호 프로필]
+- 선호 장르: {join_nonempty(preferred_genres) if preferred_genres else "없음/미선택"}
+- 원하는 사항(플레이 경험/취향): {wanted_part}
+- 재미있게 플레이한 게임(참고): {played_games.strip() if played_games.strip() else "미입력"}
+- 선호 플랫폼/기기: {join_nonempty(platforms) if platforms else "없음/미선택"}
+- 하루 예상 플레이시간: {hours_per_day}시간
+""".strip()
+
+
+# -----------------------------
+# Structured outputs (schema / typed models)
+# -----------------------------
+class CandidateList(TypedDict):
+    candidates: List[str]
+
+
+class FactPick(TypedDict):
+    id: int
+    one_liner: str
+    why_for_user: str
+    summary_memo: str
+
+
+class FactSelection(TypedDict):
+    selected: List[FactPick]
+    summary: str
+    price_disclaimer: str
+
+
+class FallbackPick(TypedDict):
+    name: str
+    released: str
+    genres: str
+    platforms: str
+    one_liner: str
+    why_for_user: str
+    summary_memo: str
+
+
+class FallbackSelection(TypedDict):
+    selected: List[FallbackPick]
+    summary: str
+    accuracy_note: str
+
+
+def json_schema_from_hint(hint: Any, overrides: Optional[Dict[str, Dict[str, Any]]] = None, path: str = "") -> Dict[str, Any]:
+    """프롬프트용 schema_hint 예시에서 strict JSON schema 를 만든다.
+
+    dict -> 모든 키 required + additionalProperties false, list -> 첫 원소 스키마의 배열,
+    값은 예시 타입(int/float/bool/str)을 따른다. overrides 는 "selected.id" 같은 경로로 스키마를 덮어쓴다.
+    """
+    overrides = overrides or {}
+    if path in overrides:
+        return overrides[path]
+    if isinstance(hint, dict):
+        return {
+            "type": "object",
+            "properties": {
+                k: json_schema_from_hint(v, overrides, f"{path}.{k}" if path else k) for k, v in hint.items()
+            },
+            "required": list(hint.keys()),
+            "additionalProperties": False,
+        }
+    if isinstance(hint, list):
+        return {"type": "array", "items": json_schema_from_hint(hint[0] if hint else "", overrides, path)}
+    if isinstance(hint, bool):
+        return {"type": "boolean"}
+    if isinstance(hint, int):
+        return {"type": "integer"}
+    if isinstance(hint, float):
+        return {"type": "number"}
+    return {"type": "string"}
+
+
+def structured_text_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {"format": {"type": "json_schema", "name": name, "schema": schema, "strict": True}}
+
+
+def structured_kwargs(name: str, hint: Any, overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    if not STRUCTURED_OUTPUTS:
+        return {}
+    return {"text": structured_text_format(name, json_schema_from_hint(hint, overrides))}
+
+
+def count_json_repair(call: str) -> None:
+    app_counters().inc(f'llm_json_repair_total{{call="{call}"}}')
+    span_add("json_repairs")
+
+
+def validate_candidates(obj: Dict[str, Any], n: int) -> CandidateList:
+    # 빈 제목/대소문자만 다른 중복을 버리고 n 개로 자른다
+    cands = obj.get("candidates", None)
+    if not isinstance(cands, list) or not cands:
+        raise ValueError("후보 게임명 생성(JSON) 실패")
+    if len(cands) != n:
+        # 스키마로 형식은 보장되므로 개수가 조금 달라도 재시도 없이 진행
+        app_counters().inc("llm_candidate_count_mismatch_total")
+    seen = set()
+    uniq: List[str] = []
+    for x in cands:
+        if not isinstance(x, (str, int, float)):
+            continue
+        title = str(x).strip()
+        key = title.lower()
+        if title and key not in seen:
+            uniq.append(title)
+            seen.add(key)
+    if not uniq:
+        raise ValueError("후보 게임명 생성(JSON) 실패")
+    return {"candidates": uniq[:n]}
+
+
+def validate_fact_selection(obj: Dict[str, Any], fact_ids: Iterable[int]) -> FactSelection:
+    # 팩트 목록에 없는 id 는 버린다 (strict enum 이면 원래 생기지 않음)
+    if not isinstance(obj.get("selected", None), list):
+        raise ValueError("선정 결과 JSON 형식이 올바르지 않습니다.")
+    valid = set(fact_ids)
+    picks: List[FactPick] = []
+    for s in obj["selected"]:
+        if not isinstance(s, dict):
+            continue
+        try:
+            gid = int(s.get("id"))
+        except Exception:
+            continue
+        if gid not in valid:
+            continue
+        picks.append(
+            {
+                "id": gid,
+                "one_liner": str(s.get("one_liner") or ""),
+                "why_for_user": str(s.get("why_for_user") or ""),
+                "summary_memo": str(s.get("summary_memo") or ""),
+            }
+        )
+    return {
+        "selected": picks,
+        "summary": str(obj.get("summary") or ""),
+        "price_disclaimer": str(obj.get("price_disclaimer") or ""),
+    }
+
+
+def validate_fallback_selection(obj: Dict[str, Any], max_recs: int) -> FallbackSelection:
+    sel = obj.get("selected", [])
+    if not isinstance(sel, list):
+        raise ValueError("추천 결과 JSON 형식이 올바르지 않습니다.")
+    picks: List[FallbackPick] = []
+    for s in sel:
+        if not isinstance(s, dict) or not str(s.get("name") or "").strip():
+            continue
+        picks.append(
+            {
+                "name": str(s.get("name")).strip(),
+                "released": str(s.get("released") or ""),
+                "genres": str(s.get("genres") or ""),
+                "platforms": str(s.get("platforms") or ""),
+                "one_liner": str(s.get("one_liner") or ""),
+                "why_for_user": str(s.get("why_for_user") or ""),
+                "summary_memo": str(s.get("summary_memo") or ""),
+            }
+        )
+    return {
+        "selected": picks[:max_recs],
+        "summary": str(obj.get("summary") or ""),
+        "accuracy_note": str(obj.get("accuracy_note") or ""),
+    }
+
+
+def canonical_text(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(t.split())
+
+
+def profile_fingerprint(
+    preferred_genres: List[str],
+    wanted_emotions: List[str],
+    wanted_free: str,
+    played_games: str,
+    platforms: List[str],
+    hours_per_day: float,
+    model: str,
+    rawg_mode: bool,
+) -> str:
+    """build_profile_text 입력을 정규화한 지문. 선택 순서/공백/대소문자 차이는 같은 프로필로 본다."""
+    played = sorted({canonical_text(x) for x in re.split(r"[,\n/]", played_games or "") if canonical_text(x)})
+    payload = {
+        "v": 1,
+        "genres": sorted(set(preferred_genres)),
+        "emotions": sorted(set(wanted_emotions)),
+        "free": canonical_text(wanted_free),
+        "played": played,
+        "platforms": sorted(set(platforms)),
+        "hours": round(float(hours_per_day), 2),
+        "model": model,
+        "rawg": bool(rawg_mode),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Semantic issue cache (local vectors)
+# -----------------------------
+def _one_hot_block(selected: List[str], options: List[str]) -> np.ndarray:
+    # 마지막 칸은 "미선택" -> 둘 다 비어 있어도 같은 프로필로 본다
+    v = np.zeros(len(options) + 1, dtype=np.float32)
+    for x in selected:
+        if x in options:
+            v[options.index(x)] = 1.0
+    if not v.any():
+        v[-1] = 1.0
+    return v
+
+
+def _ngram_block(text: str, dim: int = SEMANTIC_NGRAM_DIM, n: int = 3) -> np.ndarray:
+    # 문자 n-gram 을 crc32 로 해싱 (프로세스가 달라도 같은 값)
+    v = np.zeros(dim, dtype=np.float32)
+    t = canonical_text(text)
+    if not t:
+        v[0] = 1.0
+        return v
+    padded = f" {t} "
+    for i in range(max(1, len(padded) - n + 1)):
+        v[zlib.crc32(padded[i : i + n].encode("utf-8")) % dim] += 1.0
+    return v
+
+
+def _hours_block(hours_per_day: float) -> np.ndarray:
+    theta = min(max(float(hours_per_day), 0.0), 24.0) / 24.0 * (np.pi / 2)
+    return np.array([np.cos(theta), np.sin(theta)], dtype=np.float32)
+
+
+# (블록, 가중치): 각 블록을 단위 벡터로 만든 뒤 sqrt(가중치)를 곱해 이어 붙인다
+# 자유입력은 벡터에 넣지 않는다: "...없는" / "...있는" 처럼 한 글자로 뜻이 뒤집혀도 n-gram 은 거의 같다
+# 플랫폼도 넣지 않는다: 결과를 거르는 하드 필터라 비슷한 정도로 비교하면 안 된다 (semantic_partition 으로 나눈다)
+SEMANTIC_BLOCK_WEIGHTS = {"genres": 1.0, "emotions": 1.0, "played": 1.0, "hours": 0.5}
+
+
+def semantic_partition(model: str, rawg_enabled: bool, platforms: List[str]) -> str:
+    # 모델/RAWG 모드/플랫폼 집합이 모두 같아야 같은 칸에서 비교한다
+    return f"{model}|rawg={int(rawg_enabled)}|platforms={','.join(sorted(set(platforms or [])))}"
+
+
+def free_text_key(wanted_free: str) -> int:
+    # 자유입력은 정규화 후 완전히 같아야 유사 캐시 후보가 된다 (SemanticIssueCache 의 exact 키)
+    digest = hashlib.blake2b(canonical_text(wanted_free).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def profile_vector(
+    preferred_genres: List[str],
+    wanted_emotions: List[str],
+    wanted_free: str,
+    played_games: str,
+    platforms: List[str],
+    hours_per_day: float,
+) -> np.ndarray:
+    played = ", ".join(sorted(canonical_text(x) for x in re.split(r"[,\n/]", played_games or "") if canonical_text(x)))
+    blocks = {
+        "genres": _one_hot_block(preferred_genres, GENRES),
+        "emotions": _one_hot_block(wanted_emotions, WANTED_EMOTIONS),
+        "played": _ngram_block(played),
+        "hours": _hours_block(hours_per_day),
+    }
+    parts = []
+    for name, block in blocks.items():
+        norm = float(np.linalg.norm(block)) or 1.0
+        parts.append(block / norm * np.sqrt(SEMANTIC_BLOCK_WEIGHTS[name]))
+    vec = np.concatenate(parts).astype(np.float32)
+    return vec / (float(np.linalg.norm(vec)) or 1.0)
+
+
+class SemanticIssueCache:
+    """프로필 벡터 -> 추천호 결과. NumPy 행렬에 담고 코사인 top-k 로 찾는다.
+
+    partition(모델/RAWG 모드/플랫폼)과 exact 키(자유입력)가 같은 항목끼리만 비교하고,
+    꽉 차면 가장 오래 안 쓴 항목을 덮어쓴다.
+    """
+
+    def __init__(self, dim: int, capacity: int, threshold: float, ttl: float) -> None:
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vecs = np.zeros((capacity, dim), dtype=np.float32)
+        self._parts = np.full(capacity, -1, dtype=np.int32)
+        self._exact = np.zeros(capacity, dtype=np.int64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._payloads: List[Any] = [None] * capacity
+        self._part_ids: Dict[str, int] = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lookup_ms: List[float] = []
+
+    def _part_id(self, partition: str) -> int:
+        if partition not in self._part_ids:
+            self._part_ids[partition] = len(self._part_ids)
+        return self._part_ids[partition]
+
+    def lookup(self, partition: str, vec: np.ndarray, k: int = 3, exact: int = 0) -> Optional[Tuple[Any, float]]:
+        t0 = time.perf_counter()
+        found = None
+        with self._lock:
+            n = self._size
+            if n:
+                now = time.time()
+                sims = self._vecs[:n] @ vec
+                valid = (self._parts[:n] == self._part_id(partition)) & (self._exact[:n] == exact)
+                valid &= self._expires[:n] > now
+                sims = np.where(valid, sims, -1.0)
+                kk = min(k, n)
+                top = np.argpartition(-sims, kk - 1)[:kk]
+                best = int(top[np.argmax(sims[top])])
+                if sims[best] >= self.threshold:
+                    self._last_used[best] = now
+                    found = (self._payloads[best], float(sims[best]))
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._lookup_ms.append((time.perf_counter() - t0) * 1000)
+            self._lookup_ms = self._lookup_ms[-500:]
+        return found
+
+    def add(self, partition: str, vec: np.ndarray, payload: Any, exact: int = 0) -> None:
+        now = time.time()
+        with self._lock:
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                # 만료된 칸이 있으면 그걸, 없으면 LRU
+                expired = np.flatnonzero(self._expires <= now)
+                slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vecs[slot] = vec
+            self._parts[slot] = self._part_id(partition)
+            self._exact[slot] = exact
+            self._last_used[slot] = now
+            self._expires[slot] = now + self.ttl
+            self._payloads[slot] = payload
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            lat = np.array(self._lookup_ms) if self._lookup_ms else np.zeros(1)
+            return {
+                "entries": self._size,
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "lookup_ms_avg": round(float(lat.mean()), 3),
+                "lookup_ms_p95": round(float(np.percentile(lat, 95)), 3),
+            }
+
+
+@lazy_singleton
+def semantic_issue_cache() -> SemanticIssueCache:
+    dim = len(profile_vector([], [], "", "", [], 0.0))
+    return SemanticIssueCache(dim, SEMANTIC_CACHE_CAPACITY, SEMANTIC_CACHE_THRESHOLD, ISSUE_CACHE_TTL)
+
+
+# -----------------------------
+# Prompt layout (cache-friendly)
+# -----------------------------
+@lru_cache(maxsize=1)
+def _token_encoding() -> Any:
+    return tiktoken.get_encoding("o200k_base") if tiktoken is not None else None
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _token_encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    # 대략: 영문 4글자당 1토큰, 한글 등은 1.5글자당 1토큰
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return int(ascii_chars / 4 + (len(text) - ascii_chars) / 1.5) + 1
+
+
+class PromptLayout:
+    """instructions 에는 호출 종류별로 바이트 단위까지 고정된 앞부분만, input 에는 매번 바뀌는 부분만 둔다.
+
+    고정 prefix 가 앞에 오므로 provider 측 prompt caching 이 적용되고, 프로필은 input 에 한 번만 들어간다.
+    """
+
+    def __init__(self, call: str) -> None:
+        self.call = call
+        self.stable: List[Tuple[str, str]] = []
+        self.variable: List[Tuple[str, str]] = []
+
+    def add_stable(self, name: str, text: str) -> "PromptLayout":
+        self.stable.append((name, text.strip()))
+        return self
+
+    def add_variable(self, name: str, text: str) -> "PromptLayout":
+        self.variable.append((name, text.strip()))
+        return self
+
+    @property
+    def instructions(self) -> str:
+        return "\n\n".join(t for _, t in self.stable)
+
+    @property
+    def input(self) -> str:
+        return "\n\n".join(t for _, t in self.variable)
+
+    def token_report(self) -> Dict[str, int]:
+        report = {f"stable:{n}": estimate_tokens(t) for n, t in self.stable}
+        report.update({f"input:{n}": estimate_tokens(t) for n, t in self.variable})
+        return report
+
+    def kwargs(self) -> Dict[str, Any]:
+        record_prompt_report(self.call, self.token_report())
+        return {
+            "instructions": self.instructions,
+            "input": self.input,
+            # 같은 prefix 를 쓰는 요청을 같은 캐시로 라우팅
+            "extra_body": {"prompt_cache_key": f"select-game:{self.call}"},
+        }
+
+
+@lazy_singleton
+def prompt_token_reports() -> Dict[str, Dict[str, int]]:
+    # 호출 종류별 마지막 프롬프트의 섹션별 추정 토큰
+    return {}
+
+
+def record_prompt_report(call: str, report: Dict[str, int]) -> None:
+    prompt_token_reports()[call] = report
+    counters = app_counters()
+    for section, tokens in report.items():
+        counters.inc(f'prompt_tokens_est_total{{call="{call}",section="{section}"}}', tokens)
+
+
+def profile_section(profile_text: str) -> str:
+    # build_profile_text 결과에는 이미 머리말이 있다
+    if profile_text.startswith("[사용자 선호 프로필]"):
+        return profile_text
+    return f"[사용자 선호 프로필]\n{profile_text}"
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ";".join(_cell(v) for v in value)
+    return str(value).replace("|", "/").replace(";", ",").replace("\n", " ")
+
+
+FACT_TABLE_COLUMNS = ("id", "name", "released", "genres", "platforms", "metacritic", "rating")
+
+
+def facts_table(factual_games: List[Dict[str, Any]]) -> str:
+    # 키를 매 행 반복하는 JSON 대신 헤더 1줄 + 파이프 구분 행 (리스트 값은 ; 로 연결)
+    lines = ["|".join(FACT_TABLE_COLUMNS)]
+    for g in factual_games:
+        lines.append("|".join(_cell(g.get(c)) for c in FACT_TABLE_COLUMNS))
+    return "\n".join(lines)
+
+
+# -----------------------------
+# OpenAI steps
+# -----------------------------
+SYSTEM_INSTRUCTIONS = """
+너는 'Select Game'이라는 게임 추천 챗봇이다.
+- 한국어로 답한다.
+- 사용자의 선호 장르, 원하는 사항(자유입력 포함), 플레이한 게임, 플랫폼, 하루 플레이시간을 최우선 반영한다.
+- 추천 개수는 억지로 채우지 않는다. 확신이 낮으면 제외한다.
+- 문체는 게임 잡지 편집장처럼: 짧고 임팩트 있게, 그러나 과장/허위는 금지.
+""".strip()
+
+CANDIDATES_SCHEMA_HINT = {"candidates": ["title"]}
+
+
+def candidates_layout(system_instructions: str, profile_text: str, n: int) -> PromptLayout:
+    rules = f"""
+[작업: 후보 게임명]
+[사용자 선호 프로필]을 보고 사용자가 좋아할 가능성이 높은 "게임 후보 제목" {n}개를 뽑아라.
+
+규칙:
+- 출력은 "유효한 JSON" 하나만 출력. (설명/마크다운/코드펜스 금지)
+- 키는 candidates 하나만 사용: {{ "candidates": ["title1", ...] }}
+- candidates는 정확히 {n}개.
+- 게임 제목은 가능한 한 공식적으로 통용되는 영문/국문 제목으로.
+- 모호한 제목(시리즈명만 있는 것)은 피하고 가능한 구체적으로.
+"""
+    return (
+        PromptLayout("candidates")
+        .add_stable("system", system_instructions)
+        .add_stable("rules", rules)
+        .add_variable("profile", profile_section(profile_text))
+    )
+
+
+@traced("openai.candidates")
+def openai_get_candidates(
+    client: OpenAI,
+    model: str,
+    system_instructions: str,
+    profile_text: str,
+    n: int,
+) -> List[str]:
+    layout = candidates_layout(system_instructions, profile_text, n)
+
+    resp = responses_create(
+        client,
+        model=model,
+        **layout.kwargs(),
+        **structured_kwargs("candidate_list", CANDIDATES_SCHEMA_HINT),
+    )
+    return validate_candidates(safe_json_loads(resp.output_text), n)["candidates"]
+
+
+def openai_stream_candidates(
+    client: OpenAI,
+    model: str,
+    system_instructions: str,
+    profile_text: str,
+    n: int,
+    marks: Optional[Dict[str, float]] = None,
+) -> Iterator[str]:
+    """후보 제목을 생성되는 즉시 하나씩 내보낸다 (파이프라인 모드).
+
+    marks 를 넘기면 perf_counter 기준 first_candidate / candidates_done 시각을 기록한다.
+    """
+    parser = JsonArrayStreamParser("candidates")
+    seen = set()
+    count = 0
+    final: Dict[str, Any] = {}
+    # 제너레이터는 소비하는 쪽 컨텍스트에서 멈췄다 돌기를 반복하므로 현재 span 으로 활성화하지 않는다
+    span = tracer().start("openai.stream_candidates", activate=False)
+    deltas = iter_output_text(
+        client,
+        final=final,
+        model=model,
+        **candidates_layout(system_instructions, profile_text, n).kwargs(),
+        **structured_kwargs("candidate_list", CANDIDATES_SCHEMA_HINT),
+    )
+    try:
+        for delta in deltas:
+            for item in parser.feed(delta):
+                title = str(item).strip()
+                key = title.lower()
+                if not title or key in seen:
+                    continue
+                seen.add(key)
+                count += 1
+                if "first_candidate_ms" not in span.attrs:
+                    span.set(first_candidate_ms=round(span.elapsed_ms(), 1))
+                if marks is not None and "first_candidate" not in marks:
+                    marks["first_candidate"] = time.perf_counter()
+                yield title
+                if count >= n:
+                    return
+            if parser.done:
+                break
+    except Exception as e:
+        span.fail(e)
+        raise
+    finally:
+        deltas.close()
+        # 후보를 다 받고 일찍 끊으면 완료 이벤트(usage)가 없을 수 있다
+        trace_usage(final.get("response"), span)
+        span.set(candidates=count)
+        span.end()
+        if marks is not None:
+            marks["candidates_done"] = time.perf_counter()
+            marks["candidates"] = count
+    if count == 0:
+        raise ValueError("후보 게임명 생성(JSON) 실패")
+
+
+FACT_SELECTION_SCHEMA_HINT = {
+    "selected": [
+        {
+            "id": 123,
+            "one_liner": "string (한줄 추천, 1~2문장)",
+            "why_for_user": "string (사용자 입력과 연결해 2~4문장)",
+            "summary_memo": "string (요약/메모: 더 길게. 루프/톤/팁/주의점/추천 상황 포함)",
+        }
+    ],
+    "summary": "string",
+    "price_disclaimer": "string",
+}
+
+
+@traced("openai.select_from_facts")
+def openai_select_from_facts(
+    client: OpenAI,
+    model: str,
+    system_instructions: str,
+    profile_text: str,
+    factual_games: List[Dict[str, Any]],
+    on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> FactSelection:
+    schema_hint = FACT_SELECTION_SCHEMA_HINT
+
+    rules = f"""
+[작업: 팩트 기반 선별]
+너는 'Select Game'의 편집장(게임 잡지 스타일)이다.
+[사용자 선호 프로필]과 [게임 팩트 목록]을 보고, 정말 잘 맞는 게임만 selected에 담아라.
+
+핵심 규칙:
+- 추천 개수를 억지로 채우지 마라. 확신이 낮으면 제외한다. (보통 2~8개)
+- selected의 id는 반드시 팩트 목록에 존재해야 한다.
+- 출력은 "유효한 JSON" 하나만 출력. (설명/마크다운/코드펜스 금지)
+- JSON 키는 스키마 예시와 동일하게.
+- one_liner: 1~2문장
+- why_for_user: 사용자의 입력(선호 장르/원하는 사항/플랫폼/플레이시간/재밌게 한 게임)과 "왜 어울리는지"를 연결해서 2~4문장
+- summary_memo는 분량을 더 주고, 아래 요소를 가능하면 포함:
+  1) 핵심 재미 루프
+  2) 분위기/톤
+  3) 플레이 팁 1개
+  4) 주의점 1개
+
+[게임 팩트 목록] 형식: 첫 줄은 열 이름, 이후 한 줄에 게임 하나 (| 로 구분, 여러 값은 ; 로 연결, 빈 칸은 정보 없음)
+
+[JSON 스키마 예시]
+{json.dumps(schema_hint, ensure_ascii=False, indent=2)}
+"""
+    layout = (
+        PromptLayout("select_from_facts")
+        .add_stable("system", system_instructions)
+        .add_stable("rules", rules)
+        .add_variable("profile", profile_section(profile_text))
+        .add_variable("facts", f"[게임 팩트 목록]\n{facts_table(factual_games)}")
+    )
+
+    fact_ids = [int(g["id"]) for g in factual_games]
+    # id 는 팩트 목록의 id 만 허용 (enum) -> 없는 id 를 고르는 일 자체가 없다
+    structured = structured_kwargs(
+        "fact_selection",
+        schema_hint,
+        overrides={"selected.id": {"type": "integer", "enum": sorted(set(fact_ids))}},
+    )
+    text = run_selection_call(client, on_item, model=model, **layout.kwargs(), **structured)
+
+    try:
+        obj = safe_json_loads(text)
+    except Exception:
+        count_json_repair("select_from_facts")
+        fix_prompt = f"""
+아래 출력은 JSON 파싱에 실패했거나 조건을 어겼다.
+반드시 "유효한 JSON" 하나만 출력해서 수정해라. 다른 텍스트 금지.
+조건: selected의 id는 팩트 목록의 id만 사용.
+
+[잘못된 출력]
+{text}
+""".strip()
+        resp2 = responses_create(
+            client, model=model, instructions=system_instructions, input=fix_prompt, **structured
+        )
+        obj = safe_json_loads(resp2.output_text)
+
+    return validate_fact_selection(obj, fact_ids)
+
+
+FALLBACK_SCHEMA_HINT = {
+    "selected": [
+        {
+            "name": "string",
+            "released": "string or empty",
+            "genres": "string or empty",
+            "platforms": "string or empty",
+            "one_liner": "string (한줄 추천, 1~2문장)",
+            "why_for_user": "string (사용자 입력과 연결해 2~4문장)",
+            "summary_memo": "string (요약/메모: 길게. 루프/톤/팁/주의점/추천 상황)",
+        }
+    ],
+    "summary": "string",
+    "accuracy_note": "string",
+}
+
+
+@traced("openai.select_fallback")
+def openai_select_fallback_no_rawg(
+    client: OpenAI,
+    model: str,
+    system_instructions: str,
+    profile_text: str,
+    max_recs: int,
+    on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> FallbackSelection:
+    schema_hint = FALLBACK_SCHEMA_HINT
+
+    rules = f"""
+[작업: RAWG 없이 선별]
+너는 'Select Game'의 편집장(게임 잡지 스타일)이다.
+현재 외부 게임 DB(RAWG)가 없으므로, 게임 '정보 정확도'는 보수적으로 다뤄야 한다.
+
+규칙:
+- 추천 개수를 억지로 채우지 마라. 확신이 낮으면 제외한다. (0~{max_recs}개)
+- 출력은 "유효한 JSON" 하나만. (설명/마크다운/코드펜스 금지)
+- JSON 키는 스키마 예시와 동일하게.
+- released/genres/platforms는 '확실할 때만' 채우고, 애매하면 빈 문자열로 둔다.
+- one_liner: 1~2문장
+- why_for_user: 사용자 입력과 연결해 2~4문장
+- summary_memo: 루프/톤/팁/주의점/추천 상황을 포함해 길게
+- accuracy_note: RAWG 키를 넣으면 정보 정확도가 올라간다는 안내를 1~2문장
+
+[JSON 스키마 예시]
+{json.dumps(schema_hint, ensure_ascii=False, indent=2)}
+"""
+    layout = (
+        PromptLayout("select_fallback_no_rawg")
+        .add_stable("system", system_instructions)
+        .add_stable("rules", rules)
+        .add_variable("profile", profile_section(profile_text))
+    )
+
+    structured = structured_kwargs("fallback_selection", schema_hint)
+    text = run_selection_call(client, on_item, model=model, **layout.kwargs(), **structured)
+
+    try:
+        obj = safe_json_loads(text)
+    except Exception:
+        count_json_repair("select_fallback_no_rawg")
+        fix_prompt = f"""
+아래 출력은 JSON 파싱에 실패했거나 조건을 어겼다.
+반드시 "유효한 JSON" 하나만 출력해서 수정해라. 다른 텍스트 금지.
+조건: selected는 0~{max_recs}개.
+
+[잘못된 출력]
+{text}
+""".strip()
+        resp2 = responses_create(
+            client, model=model, instructions=system_instructions, input=fix_prompt, **structured
+        )
+        obj = safe_json_loads(resp2.output_text)
+
+    return validate_fallback_selection(obj, max_recs)
+
+
+def format_turns(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+
+
+class ChatContext:
+    """openai_chat 의 입력을 토큰 예산 안으로 유지한다.
+
+    상태(state)는 st.session_state 에 두는 dict 라 리런 사이에도 유지된다.
+    - 최근 턴: CHAT_TOKEN_BUDGET 안에서 원문 그대로
+    - 그 이전 턴: 롤링 요약(summary)으로 압축
+    - 가능하면 previous_response_id 로 서버 측 대화 상태를 이어 쓰고 새 메시지만 보낸다
+    """
+
+    def __init__(self, state: Dict[str, Any], budget: int = CHAT_TOKEN_BUDGET) -> None:
+        self.state = state
+        self.budget = budget
+        state.setdefault("summary", "")
+        state.setdefault("summarized_upto", 0)
+        state.setdefault("prev_response_id", None)
+        state.setdefault("turns", [])
+
+    def recent_window_start(self, messages: List[Dict[str, Any]]) -> int:
+        # 최신 메시지부터 거꾸로 예산이 찰 때까지 (최소 1개는 포함)
+        used = 0
+        start = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            cost = estimate_tokens(messages[i]["content"]) + 4
+            if start < len(messages) and used + cost > self.budget:
+                break
+            used += cost
+            start = i
+        return max(start, self.state["summarized_upto"])
+
+    @traced("openai.chat_summary")
+    def summarize(self, client: OpenAI, model: str, messages: List[Dict[str, Any]], upto: int) -> None:
+        older = messages[self.state["summarized_upto"] : upto]
+        if not older:
+            return
+        prompt = f"""
+아래 [이전 요약]과 [추가 대화]를 합쳐, 사용자의 조건/선호/제외 요청과 이미 추천된 게임 위주로
+한국어 bullet 10줄 이내로 요약해라. 다른 텍스트 금지.
+
+[이전 요약]
+{self.state["summary"] or "없음"}
+
+[추가 대화]
+{format_turns(older)}
+""".strip()
+        resp = responses_create(client, model=model, instructions="너는 대화 요약기다.", input=prompt)
+        self.state["summary"] = (resp.output_text or "").strip()
+        self.state["summarized_upto"] = upto
+
+    def build_input(self, client: OpenAI, model: str, messages: List[Dict[str, Any]]) -> str:
+        start = self.recent_window_start(messages)
+        if start > self.state["summarized_upto"]:
+            self.summarize(client, model, messages, start)
+        recent = format_turns(messages[start:])
+        if self.state["summary"]:
+            return f"[이전 대화 요약]\n{self.state['summary']}\n\n[최근 대화]\n{recent}"
+        return recent
+
+    def record_turn(self, mode: str, input_est: int, resp: Any) -> Dict[str, Any]:
+        usage = getattr(resp, "usage", None)
+        turn = {
+            "mode": mode,
+            "input_tokens_est": input_est,
+            "input_tokens": getattr(usage, "input_tokens", None),
+            "output_tokens": getattr(usage, "output_tokens", None),
+        }
+        self.state["turns"] = (self.state["turns"] + [turn])[-50:]
+        if CHAT_SERVER_STATE:
+            chain_too_long = (turn["input_tokens"] or 0) > CHAT_CHAIN_MAX_INPUT_TOKENS
+            # 서버 체인이 너무 길어지면 끊고, 다음 턴은 요약 + 최근 턴으로 다시 시작
+            self.state["prev_response_id"] = None if chain_too_long else getattr(resp, "id", None)
+        return turn
+
+
+def chat_layout(system_instructions: str, profile_text: str, convo: str, with_profile: bool = True) -> PromptLayout:
+    layout = PromptLayout("chat").add_stable("system", system_instructions)
+    if with_profile:
+        layout.add_variable("profile", profile_section(profile_text))
+    return layout.add_variable("conversation", convo)
+
+
+@traced("openai.chat")
+def openai_chat(
+    client: OpenAI,
+    model: str,
+    system_instructions: str,
+    messages: List[Dict[str, str]],
+    ctx: Optional[ChatContext] = None,
+    profile_text: str = "",
+) -> str:
+    if ctx is None:
+        convo = []
+        for m in messages[-20:]:
+            convo.append(f"{m['role'].upper()}: {m['content']}")
+        layout = chat_layout(system_instructions, profile_text, "\n".join(convo), with_profile=bool(profile_text))
+        resp = responses_create(client, model=model, **layout.kwargs())
+        return (resp.output_text or "").strip()
+
+    profile_sig = hashlib.sha256(profile_text.encode("utf-8")).hexdigest()[:16]
+    prev_id = ctx.state["prev_response_id"] if CHAT_SERVER_STATE else None
+    if prev_id:
+        # 서버가 이전 턴(프로필 포함)을 기억하므로 새 사용자 메시지만 보낸다.
+        # 프로필은 바뀌었을 때만 다시 보내고, instructions 는 이어지지 않아 매번 보낸다 (고정 prefix)
+        latest = format_turns(messages[-1:])
+        profile_changed = bool(profile_text) and ctx.state.get("profile_sig") != profile_sig
+        layout = chat_layout(system_instructions, profile_text, latest, with_profile=profile_changed)
+        try:
+            resp = responses_create(
+                client,
+                model=model,
+                **layout.kwargs(),
+                previous_response_id=prev_id,
+                store=True,
+            )
+            ctx.state["profile_sig"] = profile_sig
+            ctx.record_turn("server_state", sum(layout.token_report().values()), resp)
+            return (resp.output_text or "").strip()
+        except (openai.NotFoundError, openai.BadRequestError):
+            # 만료/삭제된 응답 id -> 로컬 컨텍스트로 폴백
+            ctx.state["prev_response_id"] = None
+
+    convo_input = ctx.build_input(client, model, messages)
+    layout = chat_layout(system_instructions, profile_text, convo_input, with_profile=bool(profile_text))
+    resp = responses_create(
+        client,
+        model=model,
+        **layout.kwargs(),
+        store=CHAT_SERVER_STATE,
+    )
+    ctx.state["profile_sig"] = profile_sig
+    ctx.record_turn("local", sum(layout.token_report().values()), resp)
+    return (resp.output_text or "").strip()
+
+
+# -----------------------------
+# Recommendation pipeline (UI 없이도 실행: 벤치마크/배치에서 그대로 호출)
+# -----------------------------
+ISSUE_RESULT_KEYS = (
+    "recommendations",
+    "rawg_mode",
+    "rawg_timings",
+    "selection_metrics",
+    "stage_timings",
+    "issue_cache_hit",
+)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@lazy_singleton
+def issue_flight() -> SingleFlight:
+    return SingleFlight("issue")
+
+
+def until_cancelled(items: Iterable[str], cancel: Optional[threading.Event]) -> Iterator[str]:
+    # 항목이 나올 때마다 취소 여부 확인. 중단되면 원본(스트리밍 제너레이터)도 닫는다
+    it = iter(items)
+    try:
+        for item in it:
+            if cancel is not None and cancel.is_set():
+                raise JobCancelled()
+            yield item
+    finally:
+        close = getattr(it, "close", None)
+        if callable(close):
+            close()
+
+
+def run_recommendation(
+    client: OpenAI,
+    model: str,
+    rawg_key: str,
+    prefs: Dict[str, Any],
+    system_instructions: str,
+    pipelined: bool = PIPELINE_CANDIDATES,
+    force_refresh: bool = False,
+    stage: Callable[[str], ContextManager[Any]] = lambda label: nullcontext(),
+    on_card: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """추천호 한 번 발행: 캐시 확인 -> (후보 -> RAWG 팩트) -> 선별.
+
+    prefs 는 build_profile_text 인자와 같은 키. stage(label) 은 단계별 컨텍스트(예: st.spinner),
+    on_card 를 넘기면 선별 응답을 스트리밍해 완성된 카드(팩트 병합 후)를 하나씩 넘긴다.
+    on_progress(event, data) 는 "cache" / "stage"(start·done) / "done" 이벤트를 받는다.
+    cancel 이 set 되면 단계 사이, 후보/카드가 나올 때마다 확인해 JobCancelled 로 멈춘다.
+    반환 키는 ISSUE_RESULT_KEYS.
+    """
+    issue_t0 = time.perf_counter()
+
+    def notify(event: str, data: Dict[str, Any]) -> None:
+        if on_progress is not None:
+            on_progress(event, data)
+
+    def check_cancel() -> None:
+        if cancel is not None and cancel.is_set():
+            raise JobCancelled()
+
+    @contextmanager
+    def step(label: str) -> Iterator[None]:
+        check_cancel()
+        notify("stage", {"label": label, "status": "start"})
+        t0 = time.perf_counter()
+        with stage(label):
+            yield
+        notify("stage", {"label": label, "status": "done", "ms": round((time.perf_counter() - t0) * 1000, 1)})
+
+    rawg_enabled = bool(rawg_key.strip())
+    profile_text = build_profile_text(**prefs)
+    result: Dict[str, Any] = {k: None for k in ISSUE_RESULT_KEYS}
+    result["rawg_mode"] = rawg_enabled
+
+    issue_key = profile_fingerprint(**prefs, model=model, rawg_mode=rawg_enabled)
+    issue_partition = semantic_partition(model, rawg_enabled, prefs["platforms"])
+    issue_vec = profile_vector(**prefs)
+    issue_exact = free_text_key(prefs["wanted_free"])
+    cached_issue = None if force_refresh else issue_cache().get(issue_key, None)
+    if cached_issue is not None:
+        result["issue_cache_hit"] = {"kind": "exact", "similarity": 1.0}
+    elif not force_refresh:
+        near = semantic_issue_cache().lookup(issue_partition, issue_vec, exact=issue_exact)
+        if near is not None:
+            cached_issue = near[0]
+            result["issue_cache_hit"] = {"kind": "similar", "similarity": round(near[1], 3)}
+    span_set(cache=(result["issue_cache_hit"] or {}).get("kind", "miss"))
+    notify("cache", result["issue_cache_hit"] or {"kind": "miss"})
+
+    if cached_issue is not None:
+        hit_ms = round((time.perf_counter() - issue_t0) * 1000, 1)
+        result["recommendations"] = cached_issue["recommendations"]
+        result["rawg_mode"] = bool(cached_issue.get("rawg_mode"))
+        result["selection_metrics"] = {"streamed": False, "ttfc_ms": hit_ms, "select_ms": 0.0, "total_ms": hit_ms}
+        notify("done", result["selection_metrics"])
+        return result
+
+    def generate() -> Dict[str, Any]:
+        first_card: Dict[str, float] = {}
+        fact_map: Optional[Dict[int, Dict[str, Any]]] = None
+
+        def emit(item: Dict[str, Any]) -> None:
+            check_cancel()
+            if fact_map is not None:
+                try:
+                    gid = int(item.get("id"))
+                except Exception:
+                    return
+                if gid not in fact_map:
+                    return
+                item = {**fact_map[gid], **item}
+            first_card.setdefault("ms", (time.perf_counter() - issue_t0) * 1000)
+            on_card(item)
+
+        on_item = emit if on_card is not None and STREAM_SELECTION else None
+
+        # RAWG 브레이커가 열려 있으면 후보/RAWG 단계를 건너뛰고 바로 RAWG 없는 선별로 (결과는 캐시하지 않는다)
+        degraded = rawg_enabled and not rawg_available(rawg_key)
+        # 도중에 RAWG 가 끊겨 팩트를 잃은 후보 수 (있으면 부분 결과 -> 역시 캐시하지 않는다)
+        lost = 0
+        if rawg_enabled and not degraded:
+            if pipelined:
+                with step("1·2) 후보 게임명 수집과 RAWG 팩트 확정을 동시에 진행 중..."):
+                    marks: Dict[str, float] = {}
+                    candidate_stream = openai_stream_candidates(
+                        client=client,
+                        model=model,
+                        system_instructions=system_instructions,
+                        profile_text=profile_text,
+                        n=CANDIDATE_COUNT,
+                        marks=marks,
+                    )
+                    factual, rawg_timings = resolve_rawg_facts(
+                        rawg_key=rawg_key,
+                        candidates=until_cancelled(candidate_stream, cancel),
+                        user_platforms=prefs["platforms"],
+                    )
+                    stage12_done = time.perf_counter()
+                    stage_timings = {
+                        "mode": "pipelined",
+                        "first_candidate_ms": round((marks.get("first_candidate", stage12_done) - issue_t0) * 1000, 1),
+                        "candidates_ms": round((marks.get("candidates_done", stage12_done) - issue_t0) * 1000, 1),
+                        "rawg_ms": round((stage12_done - marks.get("first_candidate", issue_t0)) * 1000, 1),
+                        "stage12_ms": round((stage12_done - issue_t0) * 1000, 1),
+                    }
+            else:
+                with step("1) 후보 게임명 수집 중..."):
+                    candidates = openai_get_candidates(
+                        client=client,
+                        model=model,
+                        system_instructions=system_instructions,
+                        profile_text=profile_text,
+                        n=CANDIDATE_COUNT,
+                    )
+                candidates_done = time.perf_counter()
+
+                with step("2) RAWG에서 팩트 확정 중..."):
+                    factual, rawg_timings = resolve_rawg_facts(
+                        rawg_key=rawg_key,
+                        candidates=until_cancelled(candidates, cancel),
+                        user_platforms=prefs["platforms"],
+                    )
+                    stage12_done = time.perf_counter()
+                    stage_timings = {
+                        "mode": "batch",
+                        "first_candidate_ms": round((candidates_done - issue_t0) * 1000, 1),
+                        "candidates_ms": round((candidates_done - issue_t0) * 1000, 1),
+                        "rawg_ms": round((stage12_done - candidates_done) * 1000, 1),
+                        "stage12_ms": round((stage12_done - issue_t0) * 1000, 1),
+                    }
+
+            result["rawg_timings"] = rawg_timings
+            result["stage_timings"] = stage_timings
+            lost = sum(1 for row in rawg_timings["titles"] if row["status"] == "rawg_unavailable")
+            if not factual and (lost or rawg_breaker().state != "closed"):
+                # 도중에 브레이커가 열려 캐시된 팩트도 못 모았다 -> RAWG 없는 선별로 넘어간다
+                degraded = True
+            elif not factual:
+                raise ValueError(
+                    "RAWG에서 매칭되는 게임을 찾지 못했습니다. 플랫폼 선택을 완화하거나, '재미있게 플레이한 게임'에 힌트를 더 넣어봐."
+                )
+
+        if rawg_enabled and not degraded:
+            fact_map = {g["id"]: g for g in factual}
+            with step("3) 확신 있는 게임만 선별/원고 작성 중..."):
+                select_t0 = time.perf_counter()
+                picked_obj = openai_select_from_facts(
+                    client=client,
+                    model=model,
+                    system_instructions=system_instructions,
+                    profile_text=profile_text,
+                    factual_games=factual,
+                    on_item=on_item,
+                )
+            selected_merged: List[Dict[str, Any]] = []
+            for s in picked_obj.get("selected", []):
+                try:
+                    gid = int(s.get("id"))
+                except Exception:
+                    continue
+                if gid in fact_map:
+                    selected_merged.append({**fact_map[gid], **s})
+
+            result["recommendations"] = {
+                "selected": selected_merged,
+                "summary": picked_obj.get("summary", ""),
+                "note": picked_obj.get("price_disclaimer", ""),
+            }
+            if lost:
+                note = f"RAWG 응답이 불안정해 후보 {lost}개는 팩트를 확인하지 못하고 뺐어."
+                extra = result["recommendations"]["note"]
+                result["recommendations"]["degraded"] = True
+                result["recommendations"]["note"] = f"{note} {extra}" if extra else note
+                app_counters().inc("rawg_partial_issues_total")
+                span_set(rawg_degraded="partial", rawg_lost=lost)
+
+        else:
+            label = "RAWG 응답이 불안정해 RAWG 없이 원고 작성 중..." if degraded else "추천 원고 작성 중... (RAWG 없이 실행)"
+            with step(label):
+                select_t0 = time.perf_counter()
+                picked_obj = openai_select_fallback_no_rawg(
+                    client=client,
+                    model=model,
+                    system_instructions=system_instructions,
+                    profile_text=profile_text,
+                    max_recs=FALLBACK_MAX_RECS,
+                    on_item=on_item,
+                )
+
+            result["recommendations"] = {
+                "selected": picked_obj.get("selected", []),
+                "summary": picked_obj.get("summary", ""),
+                "note": picked_obj.get("accuracy_note", ""),
+            }
+            if degraded:
+                result["rawg_mode"] = False
+                result["recommendations"]["degraded"] = True
+                result["recommendations"]["note"] = (
+                    "RAWG 응답이 불안정해 이번 호는 RAWG 팩트 없이 작성했어. 출시일/플랫폼 정보는 확인이 필요해."
+                )
+                app_counters().inc("rawg_degraded_issues_total")
+                span_set(rawg_degraded=True)
+
+        done = time.perf_counter()
+        result["selection_metrics"] = {
+            "streamed": on_item is not None,
+            # 스트리밍이 아니면 모든 카드가 선별이 끝난 뒤에 한꺼번에 나온다
+            "ttfc_ms": round(first_card.get("ms", (done - issue_t0) * 1000), 1),
+            "select_ms": round((done - select_t0) * 1000, 1),
+            "total_ms": round((done - issue_t0) * 1000, 1),
+        }
+        if not degraded and not lost:
+            issue_payload = {"recommendations": result["recommendations"], "rawg_mode": rawg_enabled}
+            issue_cache().set(issue_key, issue_payload)
+            semantic_issue_cache().add(issue_partition, issue_vec, issue_payload, exact=issue_exact)
+        return result
+
+    # 같은 프로필(지문)의 발행이 다른 세션에서 진행 중이면 새로 돌리지 않고 그 결과를 같이 받는다
+    # 자격 증명이 다른 호출끼리는 합치지 않는다 (남의 키로 만든 결과/오류를 받지 않도록, 키는 해시로만)
+    key_id = OpenAIClientRegistry.key_id
+    flight_key = f"{issue_key}|{key_id(client.api_key or '')}|{key_id(rawg_key)}"
+    generated, shared = issue_flight().do(flight_key, generate, wait_check=check_cancel)
+
+    if not shared:
+        notify("done", generated["selection_metrics"])
+        return generated
+
+    waited_ms = round((time.perf_counter() - issue_t0) * 1000, 1)
+    result = {**generated, "issue_cache_hit": {"kind": "inflight", "similarity": 1.0}}
+    result["selection_metrics"] = {"streamed": False, "ttfc_ms": waited_ms, "select_ms": 0.0, "total_ms": waited_ms}
+    span_set(cache="inflight")
+    if on_card is not None:
+        for card in result["recommendations"]["selected"]:
+            on_card(card)
+    notify("done", result["selection_metrics"])
+    return result
+
+
+class RecommendationEngine:
+    """키/모델/옵션을 묶은 추천 엔진. 한 인스턴스를 여러 스레드에서 같이 써도 된다.
+
+    engine = RecommendationEngine(openai_key, rawg_key)
+    result = engine.recommend(preferred_genres=["퍼즐 게임"], platforms=["Switch"])
+    result["recommendations"]  # {"selected": [...], "summary": ..., "note": ...}
+    """
+
+    def __init__(
+        self,
+        openai_key: str,
+        rawg_key: str = "",
+        model: str = DEFAULT_MODEL,
+        pipelined: bool = PIPELINE_CANDIDATES,
+        system_instructions: str = SYSTEM_INSTRUCTIONS,
+    ) -> None:
+        if not openai_key:
+            raise ValueError("OpenAI API 키가 필요합니다.")
+        self.client = build_openai_client(openai_key)
+        self.rawg_key = rawg_key or ""
+        self.model = model
+        self.pipelined = pipelined
+        self.system_instructions = system_instructions
+
+    def recommend(
+        self,
+        force_refresh: bool = False,
+        on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        on_card: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        **profile: Any,
+    ) -> Dict[str, Any]:
+        # profile: build_profile_text 인자 (빠진 필드는 기본값). cancel 이 set 되면 JobCancelled
+        return run_recommendation(
+            client=self.client,
+            model=self.model,
+            rawg_key=self.rawg_key,
+            prefs=profile_prefs(profile),
+            system_instructions=self.system_instructions,
+            pipelined=self.pipelined,
+            force_refresh=force_refresh,
+            on_card=on_card,
+            on_progress=on_progress,
+            cancel=cancel,
+        )
+
+    def submit(self, force_refresh: bool = False, **profile: Any) -> "Job":
+        # recommend 의 백그라운드 버전. 진행 상황은 job.snapshot(), 중단은 job.cancel()
+        return submit_recommendation(
+            client=self.client,
+            model=self.model,
+            rawg_key=self.rawg_key,
+            prefs=profile_prefs(profile),
+            system_instructions=self.system_instructions,
+            pipelined=self.pipelined,
+            force_refresh=force_refresh,
+        )
+
+    def chat(self, messages: List[Dict[str, Any]], state: Dict[str, Any], profile: Optional[Dict[str, Any]] = None) -> str:
+        # state 는 호출 사이에 유지되는 dict (요약/이전 응답 id). UI 에서는 st.session_state 에 둔다
+        profile_text = build_profile_text(**profile_prefs(profile)) if profile else ""
+        return openai_chat(
+            self.client,
+            self.model,
+            self.system_instructions,
+            messages,
+            ctx=ChatContext(state),
+            profile_text=profile_text,
+        )
+
+
+# -----------------------------
+# Background jobs
+# -----------------------------
+class Job:
+    """백그라운드 추천호 작업 하나. 워커가 진행 이벤트/카드/결과를 쌓고, UI 는 snapshot() 으로 폴링한다."""
+
+    def __init__(self, fingerprint: str, session: str = "") -> None:
+        self.id = os.urandom(8).hex()
+        self.fingerprint = fingerprint
+        self.session = session  # 공유 리미터의 공정 큐 단위 (브라우저 세션 등)
+        self.status = "queued"  # queued | running | done | failed | cancelled
+        self.stages: List[Dict[str, Any]] = []
+        self.cache: Optional[Dict[str, Any]] = None
+        self.cards: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.span: Optional[Span] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def on_progress(self, event: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            if event == "cache":
+                self.cache = data
+            elif event == "stage" and data["status"] == "start":
+                self.stages.append({"label": data["label"], "status": "running", "ms": None})
+            elif event == "stage":
+                for row in reversed(self.stages):
+                    if row["label"] == data["label"]:
+                        row.update(status="done", ms=data["ms"])
+                        break
+
+    def on_card(self, card: Dict[str, Any]) -> None:
+        with self._lock:
+            self.cards.append(card)
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished = time.time()
+        app_counters().inc(f'jobs_total{{status="{status}"}}')
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "stages": [dict(row) for row in self.stages],
+                "cache": self.cache,
+                "cards": list(self.cards),
+                "error": self.error,
+                "elapsed_s": round((self.finished or time.time()) - self.created, 1),
+                "trace_id": self.span.trace_id if self.span else None,
+            }
+
+
+class JobManager:
+    """추천호 작업을 전용 스레드 풀에서 돌린다. 작업 id 로 찾고, 취소는 협조적으로 (run_recommendation 의 cancel)."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, keep: int = JOB_KEEP) -> None:
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def submit(self, fingerprint: str, fn: Callable[[Job], Dict[str, Any]], session: str = "", **span_attrs: Any) -> Job:
+        job = Job(fingerprint, session=session)
+        with self._lock:
+            self._jobs[job.id] = job
+            # 끝난 작업부터 오래된 순으로 정리 (돌고 있는 작업은 남긴다)
+            for jid in [jid for jid, j in self._jobs.items() if j.done][: max(0, len(self._jobs) - self.keep)]:
+                del self._jobs[jid]
+        app_counters().inc("jobs_submitted_total")
+        self._pool.submit(self._run, job, fn, span_attrs)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], Dict[str, Any]], span_attrs: Dict[str, Any]) -> None:
+        if job.cancel_event.is_set():
+            job.finish("cancelled")
+            return
+        job.status = "running"
+        try:
+            with session_scope(job.session), tracer().span("recommend", job_id=job.id, **span_attrs) as span:
+                job.span = span
+                job.result = fn(job)
+        except JobCancelled:
+            job.finish("cancelled")
+        except Exception as e:
+            job.finish("failed", str(e))
+        else:
+            job.finish("done")
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def cancel(self, job_id: Optional[str]) -> bool:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {s: statuses.count(s) for s in ("queued", "running", "done", "failed", "cancelled")}
+
+
+@lazy_singleton
+def job_manager() -> JobManager:
+    return JobManager()
+
+
+def issue_fingerprint(prefs: Dict[str, Any], model: str, rawg_key: str) -> str:
+    # 작업이 어떤 입력으로 시작됐는지 (입력이 바뀌면 진행 중인 작업은 낡은 것)
+    return profile_fingerprint(**prefs, model=model, rawg_mode=bool(rawg_key.strip()))
+
+
+def submit_recommendation(
+    client: OpenAI,
+    model: str,
+    rawg_key: str,
+    prefs: Dict[str, Any],
+    system_instructions: str,
+    pipelined: bool = PIPELINE_CANDIDATES,
+    force_refresh: bool = False,
+    session: str = "",
+) -> Job:
+    """run_recommendation 을 백그라운드 작업으로 시작. 진행/카드는 job 에 쌓이고 결과는 job.result.
+
+    session 은 공유 리미터에서 같은 대기열로 묶을 단위 (비우면 모든 익명 요청이 한 대기열).
+    """
+
+    def work(job: Job) -> Dict[str, Any]:
+        return run_recommendation(
+            client=client,
+            model=model,
+            rawg_key=rawg_key,
+            prefs=prefs,
+            system_instructions=system_instructions,
+            pipelined=pipelined,
+            force_refresh=force_refresh,
+            on_card=job.on_card,
+            on_progress=job.on_progress,
+            cancel=job.cancel_event,
+        )
+
+    return job_manager().submit(
+        issue_fingerprint(prefs, model, rawg_key),
+        work,
+        session=session,
+        model=model,
+        rawg=bool(rawg_key.strip()),
+        pipelined=pipelined,
+    )
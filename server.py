@@ -0,0 +1,424 @@
+# server.py
+"""추천 엔진을 JSON HTTP API 로 노출하는 경량 비동기 서비스 (Streamlit 없이).
+
+    python server.py --port 8000
+    uvicorn server:app --host 0.0.0.0 --port 8000
+
+POST /recommend  {"profile": {...}, "model": "gpt-4.1-mini", "force_refresh": false}
+    Accept: application/x-ndjson 또는 text/event-stream 이면 cache/stage/card 이벤트를 흘려보내고 마지막에 result.
+POST /chat       {"session_id": "...", "message": "...", "profile": {...}}  (대화 상태는 서버가 session_id 별로 보관)
+GET  /healthz    가동/부하 상태
+GET  /metrics    Prometheus 텍스트 (엔진 카운터 + span 히스토그램 + 동시 처리 수)
+
+키는 OPENAI_API_KEY / RAWG_API_KEY 환경변수. OPENAI_BASE_URL / SG_RAWG_BASE 로 로컬 대역 서버(bench/fake_services.py)에 붙일 수 있다.
+엔진 호출은 블로킹이라 전용 스레드 풀에서 돌리고, 동시 처리 수를 넘는 요청은 잠깐 줄 세운 뒤 503 으로 돌려보낸다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from engine import (
+    DEFAULT_MODEL,
+    MODELS,
+    PIPELINE_CANDIDATES,
+    PROFILE_DEFAULTS,
+    JobCancelled,
+    RecommendationEngine,
+    app_counters,
+    limiter_stats,
+    profile_prefs,
+    rawg_breaker,
+    session_scope,
+    tracer,
+)
+
+# 동시에 엔진을 돌리는 요청 수 / 그 뒤에 기다릴 수 있는 요청 수 / 기다리는 최대 시간(초)
+API_MAX_ACTIVE = int(os.environ.get("SG_API_MAX_ACTIVE", "16"))
+API_MAX_QUEUE = int(os.environ.get("SG_API_MAX_QUEUE", "32"))
+API_QUEUE_TIMEOUT = float(os.environ.get("SG_API_QUEUE_TIMEOUT", "2.0"))
+API_RETRY_AFTER = 2
+
+# 채팅 세션: session_id -> 메시지/컨텍스트 (오래 안 쓴 것부터 정리)
+API_CHAT_SESSIONS = int(os.environ.get("SG_API_CHAT_SESSIONS", "1000"))
+API_CHAT_TTL = 60 * 60
+
+STREAM_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+# /recommend 본문에서 프로필이 아닌 요청 옵션
+REQUEST_OPTION_KEYS = ("model", "force_refresh", "stream", "session_id")
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdmissionControl:
+    """동시 처리 수 제한 + 짧은 대기열. 자리가 안 나면 Overloaded (-> 503)."""
+
+    def __init__(self, max_active: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> None:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_active)
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            raise Overloaded("queue full")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded("queue timeout") from None
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self) -> None:
+        # 이벤트 루프 스레드에서만 호출 (워커 스레드는 call_soon_threadsafe 로)
+        self.active -= 1
+        self._sem.release()
+
+
+class ChatSessions:
+    """session_id 별 대화. LRU + TTL, 같은 세션의 동시 요청은 세션 락으로 순서대로."""
+
+    def __init__(self, capacity: int, ttl: float) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            for sid, sess in list(self._sessions.items()):
+                if now - sess["touched"] <= self.ttl:
+                    break
+                del self._sessions[sid]
+            sess = self._sessions.get(session_id)
+            if sess is None:
+                sess = {"messages": [], "state": {}, "lock": threading.Lock(), "touched": now}
+                self._sessions[session_id] = sess
+                while len(self._sessions) > self.capacity:
+                    self._sessions.popitem(last=False)
+            sess["touched"] = now
+            self._sessions.move_to_end(session_id)
+            return sess
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+admission = AdmissionControl(API_MAX_ACTIVE, API_MAX_QUEUE, API_QUEUE_TIMEOUT)
+chat_sessions = ChatSessions(API_CHAT_SESSIONS, API_CHAT_TTL)
+executor = ThreadPoolExecutor(max_workers=API_MAX_ACTIVE, thread_name_prefix="api")
+_engines: Dict[str, RecommendationEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def engine_for(model: str) -> RecommendationEngine:
+    # 모델별 엔진 하나. OpenAI 클라이언트/RAWG 세션/캐시는 엔진 모듈의 싱글턴이라 모든 요청이 공유한다
+    with _engines_lock:
+        eng = _engines.get(model)
+        if eng is None:
+            eng = RecommendationEngine(
+                openai_key=os.environ.get("OPENAI_API_KEY", ""),
+                rawg_key=os.environ.get("RAWG_API_KEY", ""),
+                model=model,
+                pipelined=PIPELINE_CANDIDATES,
+            )
+            _engines[model] = eng
+        return eng
+
+
+def error_response(status: int, message: str, route: str) -> JSONResponse:
+    app_counters().inc(f'api_requests_total{{route="{route}",status="{status}"}}')
+    headers = {"Retry-After": str(API_RETRY_AFTER)} if status == 503 else None
+    return JSONResponse({"error": message}, status_code=status, headers=headers)
+
+
+async def read_json(request: Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except Exception:
+        raise ValueError("요청 본문이 올바른 JSON 이 아닙니다.")
+    if not isinstance(body, dict):
+        raise ValueError("요청 본문은 JSON 객체여야 합니다.")
+    return body
+
+
+def submit(fn: Callable[[], Any]) -> "asyncio.Future[Any]":
+    # admission 자리를 잡은 뒤 호출. 작업이 실제로 끝날 때 자리를 돌려준다
+    # (클라이언트가 끊어도 스레드는 끝까지 돈다. 스트리밍은 cancel 로 단계 사이에서 멈춘다)
+    loop = asyncio.get_running_loop()
+
+    def run() -> Any:
+        try:
+            return fn()
+        finally:
+            loop.call_soon_threadsafe(admission.release)
+
+    return loop.run_in_executor(executor, run)
+
+
+def result_payload(result: Dict[str, Any], trace_id: str) -> Dict[str, Any]:
+    return {
+        "recommendations": result["recommendations"],
+        "rawg_mode": result["rawg_mode"],
+        "cache": result["issue_cache_hit"] or {"kind": "miss"},
+        "selection_metrics": result["selection_metrics"],
+        "stage_timings": result["stage_timings"],
+        "trace_id": trace_id,
+    }
+
+
+def encode_event(media_type: str, event: str, data: Any) -> bytes:
+    body = json.dumps(data, ensure_ascii=False, default=str)
+    if media_type == "text/event-stream":
+        return f"event: {event}\ndata: {body}\n\n".encode("utf-8")
+    return (json.dumps({"event": event, "data": data}, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def stream_media_type(request: Request, body: Dict[str, Any]) -> Optional[str]:
+    accept = request.headers.get("accept", "")
+    for media_type in STREAM_MEDIA_TYPES:
+        if media_type in accept:
+            return media_type
+    if body.get("stream") in ("ndjson", True):
+        return "application/x-ndjson"
+    if body.get("stream") == "sse":
+        return "text/event-stream"
+    return None
+
+
+def parse_profile(body: Dict[str, Any]) -> Dict[str, Any]:
+    # {"profile": {...}} 또는 요청 옵션과 나란한 평평한 형식. 모르는 키/잘못된 타입은 ValueError (-> 400)
+    profile = body.get("profile")
+    if profile is None:
+        profile = {k: v for k, v in body.items() if k not in REQUEST_OPTION_KEYS}
+    if not isinstance(profile, dict):
+        raise ValueError("profile 은 JSON 객체여야 합니다.")
+    unknown = sorted(set(profile) - set(PROFILE_DEFAULTS))
+    if unknown:
+        raise ValueError(f"알 수 없는 프로필 키: {', '.join(map(str, unknown))}")
+    return profile_prefs(profile)
+
+
+def limiter_session(request: Request, body: Dict[str, Any]) -> str:
+    # 공유 리미터의 공정 큐 단위: 명시한 session_id, 없으면 클라이언트 주소
+    if body.get("session_id"):
+        return str(body["session_id"])
+    return request.client.host if request.client else ""
+
+
+# -----------------------------
+# Routes
+# -----------------------------
+async def recommend(request: Request) -> Response:
+    try:
+        body = await read_json(request)
+    except ValueError as e:
+        return error_response(400, str(e), "recommend")
+    model = body.get("model") or DEFAULT_MODEL
+    if model not in MODELS:
+        return error_response(400, f"지원하지 않는 모델: {model}", "recommend")
+    try:
+        profile = parse_profile(body)
+    except ValueError as e:
+        return error_response(400, str(e), "recommend")
+    force_refresh = body.get("force_refresh", False)
+    if not isinstance(force_refresh, bool):
+        return error_response(400, "force_refresh 는 true/false 여야 합니다.", "recommend")
+    try:
+        eng = engine_for(model)
+    except ValueError as e:
+        return error_response(500, str(e), "recommend")
+    media_type = stream_media_type(request, body)
+    session = limiter_session(request, body)
+
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        app_counters().inc('api_rejected_total{route="recommend"}')
+        return error_response(503, f"요청이 많아 처리할 수 없습니다 ({e}). 잠시 후 다시 시도해 주세요.", "recommend")
+
+    if media_type is None:
+        def work() -> Dict[str, Any]:
+            with session_scope(session), tracer().span("api.recommend", model=model) as span:
+                return result_payload(eng.recommend(force_refresh=force_refresh, **profile), span.trace_id)
+
+        try:
+            payload = await submit(work)
+        except Exception as e:
+            return error_response(500, f"추천 생성 실패: {e}", "recommend")
+        app_counters().inc('api_requests_total{route="recommend",status="200"}')
+        return JSONResponse(payload)
+
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    # 클라이언트가 끊으면 set -> 엔진이 단계 사이에서 JobCancelled 로 멈추고 admission 자리를 돌려준다
+    cancel = threading.Event()
+
+    def push(event: Optional[str], data: Any = None) -> None:
+        # 끊긴 뒤에는 아무도 읽지 않으므로 큐에 쌓지 않는다
+        if not cancel.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    def stream_work() -> None:
+        try:
+            with session_scope(session), tracer().span("api.recommend", model=model, streamed=True) as span:
+                result = eng.recommend(
+                    force_refresh=force_refresh,
+                    on_progress=lambda event, data: push(event, data) if event != "done" else None,
+                    on_card=lambda card: push("card", card),
+                    cancel=cancel,
+                    **profile,
+                )
+                push("result", result_payload(result, span.trace_id))
+        except JobCancelled:
+            app_counters().inc('api_requests_total{route="recommend",status="499"}')
+        except Exception as e:
+            push("error", {"error": f"추천 생성 실패: {e}"})
+        finally:
+            push(None)
+
+    submit(stream_work)
+
+    async def events() -> AsyncIterator[bytes]:
+        status = "200"
+        finished = False
+        try:
+            while True:
+                event, data = await queue.get()
+                if event is None:
+                    break
+                if event == "error":
+                    status = "500"
+                yield encode_event(media_type, event, data)
+            finished = True
+        finally:
+            if not finished:
+                cancel.set()
+        app_counters().inc(f'api_requests_total{{route="recommend",status="{status}"}}')
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type=media_type, headers=headers)
+
+
+async def chat(request: Request) -> Response:
+    try:
+        body = await read_json(request)
+    except ValueError as e:
+        return error_response(400, str(e), "chat")
+    message = str(body.get("message") or "").strip()
+    if not message:
+        return error_response(400, "message 가 비어 있습니다.", "chat")
+    model = body.get("model") or DEFAULT_MODEL
+    if model not in MODELS:
+        return error_response(400, f"지원하지 않는 모델: {model}", "chat")
+    profile = None
+    if body.get("profile") is not None:
+        try:
+            profile = parse_profile({"profile": body["profile"]})
+        except ValueError as e:
+            return error_response(400, str(e), "chat")
+    session_id = str(body.get("session_id") or uuid.uuid4().hex)
+    try:
+        eng = engine_for(model)
+    except ValueError as e:
+        return error_response(500, str(e), "chat")
+
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        app_counters().inc('api_rejected_total{route="chat"}')
+        return error_response(503, f"요청이 많아 처리할 수 없습니다 ({e}). 잠시 후 다시 시도해 주세요.", "chat")
+
+    def work() -> Dict[str, Any]:
+        sess = chat_sessions.get(session_id)
+        with sess["lock"], session_scope(session_id), tracer().span("api.chat", model=model):
+            messages: List[Dict[str, Any]] = sess["messages"]
+            messages.append({"role": "user", "content": message})
+            try:
+                reply = eng.chat(messages, sess["state"], profile=profile)
+            except Exception:
+                messages.pop()
+                raise
+            messages.append({"role": "assistant", "content": reply})
+            turns = sess["state"].get("turns") or []
+            return {"session_id": session_id, "reply": reply, "turn": turns[-1] if turns else None}
+
+    try:
+        payload = await submit(work)
+    except Exception as e:
+        return error_response(500, f"오류: {e}", "chat")
+    app_counters().inc('api_requests_total{route="chat",status="200"}')
+    return JSONResponse(payload)
+
+
+async def healthz(request: Request) -> Response:
+    return JSONResponse(
+        {
+            "ok": True,
+            "active": admission.active,
+            "waiting": admission.waiting,
+            "max_active": admission.max_active,
+            "max_queue": admission.max_queue,
+            "chat_sessions": len(chat_sessions),
+            "limiter": limiter_stats(),
+            "rawg_breaker": rawg_breaker().stats(),
+        }
+    )
+
+
+async def metrics(request: Request) -> Response:
+    text = tracer().prometheus_text()
+    text += (
+        "# TYPE sg_api_active gauge\n"
+        f"sg_api_active {admission.active}\n"
+        "# TYPE sg_api_waiting gauge\n"
+        f"sg_api_waiting {admission.waiting}\n"
+    )
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+app = Starlette(
+    routes=[
+        Route("/recommend", recommend, methods=["POST"]),
+        Route("/chat", chat, methods=["POST"]),
+        Route("/healthz", healthz, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ]
+)
+
+
+def main() -> None:
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="Select Game 추천 API 서버")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    args = ap.parse_args()
+    if not os.environ.get("OPENAI_API_KEY"):
+        ap.error("OPENAI_API_KEY 환경변수가 필요합니다.")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
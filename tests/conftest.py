@@ -0,0 +1,22 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# engine 은 import 시점에 SG_* 를 읽는다. 캐시/트레이스가 작업 디렉터리의 .cache 를 건드리지 않게 먼저 임시 경로로
+_TMP = tempfile.mkdtemp(prefix="sg-tests-")
+for _name, _file in (
+    ("SG_FACT_CACHE_PATH", "rawg_facts.sqlite3"),
+    ("SG_ALIAS_INDEX_PATH", "rawg_aliases.sqlite3"),
+    ("SG_ISSUE_CACHE_PATH", "issues.sqlite3"),
+    ("SG_TRACE_PATH", "traces.jsonl"),
+    ("SG_METRICS_PATH", "metrics.prom"),
+    ("SG_THUMB_CACHE_DIR", "thumbs"),
+):
+    os.environ.setdefault(_name, os.path.join(_TMP, _file))
+os.environ.setdefault("SG_TRACE", "0")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,39 @@
+# tests/test_app.py
+import os
+from types import SimpleNamespace
+
+from streamlit.testing.v1 import AppTest
+
+import engine
+from conftest import ROOT
+
+
+def test_force_refresh_applies_to_one_submit(monkeypatch):
+    calls = []
+
+    def fake_submit(**kwargs):
+        calls.append(kwargs["force_refresh"])
+        return SimpleNamespace(id="fake-job")
+
+    monkeypatch.setattr(engine, "submit_recommendation", fake_submit)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=30)
+    at.run()
+    at.sidebar.text_input[0].set_value("sk-test")
+    at.sidebar.checkbox(key="force_refresh").check()
+    at.sidebar.button[0].click().run()
+    assert not at.exception
+    assert calls == [True]
+    # 발행 직후 체크박스는 풀려 있고, 다음 발행은 캐시를 쓴다
+    assert at.sidebar.checkbox(key="force_refresh").value is False
+    at.sidebar.button[0].click().run()
+    assert calls == [True, False]
+
+
+def test_full_run_flag_is_cleared_after_each_run():
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=30)
+    at.run()
+    at.run()
+    assert not at.exception
+    assert at.session_state["in_full_run"] is False
+    # 전체 재실행 안에서 돈 조각은 단독 재실행으로 세지 않는다
+    assert set(at.session_state["rerun_stats"]) == {"app"}
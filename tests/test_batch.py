@@ -0,0 +1,53 @@
+# tests/test_batch.py
+import io
+import json
+
+import pytest
+
+import batch
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    def recommend(self, force_refresh=False, **profile):
+        self.calls.append(profile)
+        return {
+            "issue_cache_hit": None,
+            "rawg_mode": False,
+            "recommendations": [],
+            "selection_metrics": {},
+            "stage_timings": {},
+        }
+
+
+def run(text, **kwargs):
+    engine = FakeEngine()
+    out = io.StringIO()
+    stats = batch.run_batch(engine, io.StringIO(text), out, concurrency=2, ordered=True, **kwargs)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    return engine, rows, stats
+
+
+def test_broken_lines_become_error_rows():
+    text = '{"id": "a", "platforms": "PC"}\n{"id": "b", \n# comment\n[1, 2]\n{"id": "c"}\n'
+    engine, rows, stats = run(text)
+    assert [(r["id"], r["line"], r["ok"]) for r in rows] == [("a", 1, True), (2, 2, False), (4, 4, False), ("c", 5, True)]
+    assert rows[1]["error"].startswith("JSONDecodeError")
+    assert stats["failed"] == 2
+    assert len(engine.calls) == 2
+
+
+def test_only_profile_keys_reach_the_engine():
+    engine, rows, _ = run('{"id": "a", "force_refresh": true, "on_card": "x", "hours_per_day": 2}\n')
+    assert rows[0]["ok"]
+    assert engine.calls == [{"hours_per_day": 2}]
+
+
+def test_unknown_model_is_rejected_by_the_cli(monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["batch.py", "-", "--openai-key", "k", "--model", "gpt-4.1-mimi"])
+    with pytest.raises(SystemExit) as exc:
+        batch.main()
+    assert exc.value.code == 2
+    assert "invalid choice" in capsys.readouterr().err
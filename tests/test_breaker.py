@@ -0,0 +1,138 @@
+# tests/test_breaker.py
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import engine
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_breaker(clock, **overrides):
+    kwargs = dict(window=4, min_calls=4, failure_rate=0.5, slow_ms=1000.0, cooldown_s=10.0, max_cooldown_s=40.0)
+    kwargs.update(overrides)
+    return engine.CircuitBreaker("test", clock=clock, **kwargs)
+
+
+def wait_state(breaker, state):
+    deadline = time.monotonic() + 5
+    while breaker.state != state and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert breaker.state == state
+
+
+def trip(breaker):
+    for ok in (True, True, False, False):
+        breaker.record(ok, 10.0)
+
+
+def test_opens_at_failure_rate_after_min_calls():
+    breaker = make_breaker(FakeClock())
+    for ok in (False, False, True):
+        breaker.record(ok, 10.0)
+    assert breaker.state == "closed"
+    breaker.record(True, 2000.0)  # 느린 성공도 실패
+    assert breaker.state == "open"
+    assert breaker.allow() is False
+    assert breaker.stats()["retry_in_s"] == 10.0
+
+
+def test_probe_waits_for_cooldown_and_closes_on_success():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    trip(breaker)
+    probes = []
+    assert breaker.allow(probe=lambda: probes.append(1) or True) is False
+    assert probes == []
+    clock.advance(10.0)
+    # cooldown 이 지나도 이번 호출은 거절하고, probe 는 백그라운드에서
+    assert breaker.allow(probe=lambda: probes.append(1) or True) is False
+    wait_state(breaker, "closed")
+    assert probes == [1]
+    assert breaker.allow() is True
+
+
+def test_failed_probe_doubles_cooldown_up_to_max():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    trip(breaker)
+    for expected in (20.0, 40.0, 40.0):
+        clock.advance(breaker.stats()["retry_in_s"])
+        done = threading.Event()
+
+        def probe():
+            done.set()
+            return False
+
+        breaker.allow(probe=probe)
+        assert done.wait(5)
+        wait_state(breaker, "open")
+        assert breaker.stats()["retry_in_s"] == expected
+
+
+def test_results_recorded_while_open_are_ignored():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    trip(breaker)
+    breaker.record(True, 1.0)
+    assert breaker.stats()["calls"] == 0
+
+
+def test_disabled_breaker_always_allows():
+    breaker = make_breaker(FakeClock(), enabled=False)
+    trip(breaker)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.fixture
+def partial_run(monkeypatch):
+    # 후보 3개 중 2개가 RAWG 장애로 팩트를 잃은 실행
+    monkeypatch.setattr(engine, "rawg_available", lambda key: True)
+    monkeypatch.setattr(engine, "openai_get_candidates", lambda **kw: ["A", "B", "C"])
+    titles = [
+        {"title": "A", "ms": 1.0, "via": "search", "detail": False, "status": "matched"},
+        {"title": "B", "ms": 1.0, "via": "search", "detail": False, "status": "rawg_unavailable"},
+        {"title": "C", "ms": 1.0, "via": "search", "detail": False, "status": "rawg_unavailable"},
+    ]
+    monkeypatch.setattr(
+        engine,
+        "resolve_rawg_facts",
+        lambda **kw: ([{"id": 7, "name": "A"}], {"titles": titles, "wall_ms": 1.0, "serial_ms": 3.0}),
+    )
+    monkeypatch.setattr(
+        engine,
+        "openai_select_from_facts",
+        lambda **kw: {"selected": [{"id": 7, "one_liner": "x"}], "summary": "s", "price_disclaimer": "가격은 변동"},
+    )
+    writes = []
+    monkeypatch.setattr(engine.issue_cache(), "set", lambda *a, **kw: writes.append("exact"))
+    monkeypatch.setattr(engine.semantic_issue_cache(), "add", lambda *a, **kw: writes.append("semantic"))
+    return writes
+
+
+def test_partial_rawg_outage_marks_run_degraded_and_skips_caches(partial_run):
+    result = engine.run_recommendation(
+        client=SimpleNamespace(api_key="sk-test"),
+        model=engine.DEFAULT_MODEL,
+        rawg_key="rawg-test",
+        prefs=engine.profile_prefs({"played_games": "partial outage"}),
+        system_instructions="",
+        pipelined=False,
+        force_refresh=True,
+    )
+    recs = result["recommendations"]
+    assert recs["degraded"] is True
+    assert "2개" in recs["note"] and "가격은 변동" in recs["note"]
+    assert [g["id"] for g in recs["selected"]] == [7]
+    assert partial_run == []
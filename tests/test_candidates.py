@@ -0,0 +1,15 @@
+# tests/test_candidates.py
+import pytest
+
+import engine
+
+
+def test_validate_candidates_dedupes_and_truncates():
+    obj = {"candidates": [" Hades ", "hades", "", {"title": "X"}, "Celeste", "Outer Wilds"]}
+    assert engine.validate_candidates(obj, 2) == {"candidates": ["Hades", "Celeste"]}
+
+
+@pytest.mark.parametrize("obj", [{}, {"candidates": []}, {"candidates": "Hades"}, {"candidates": ["", None]}])
+def test_validate_candidates_rejects_bad_shapes(obj):
+    with pytest.raises(ValueError):
+        engine.validate_candidates(obj, 3)
@@ -0,0 +1,79 @@
+# tests/test_covers.py
+import io
+
+import pytest
+from PIL import Image
+
+import engine
+
+COVER = "https://media.rawg.io/media/games/abc/cover.jpg"
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, content=None):
+        self.content = content
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        if self.content is None:
+            raise OSError("unreachable")
+        return FakeResponse(self.content)
+
+
+def jpeg_bytes():
+    buf = io.BytesIO()
+    Image.new("RGB", (1600, 900), "navy").save(buf, "JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def thumbs(tmp_path, monkeypatch):
+    def make(content):
+        session = FakeSession(content)
+        monkeypatch.setattr(engine, "rawg_http_session", lambda: session)
+        cache = engine.ThumbnailCache(str(tmp_path / "thumbs"), 1 << 20, url_prefix="app/static/thumbs/")
+        monkeypatch.setattr(engine, "thumbnail_cache", lambda: cache)
+        monkeypatch.setattr(engine, "COVER_MODE", "local")
+        return cache, session
+
+    return make
+
+
+def test_local_mode_serves_a_static_url(thumbs):
+    cache, session = thumbs(jpeg_bytes())
+    before = engine.app_counters().get("cover_resized_total")
+    src = engine.cover_sources([COVER])[COVER]["src"]
+    assert src.startswith("app/static/thumbs/") and not src.startswith("data:")
+    # 다시 그려도 새로 받지 않고, 카운터도 썸네일을 만들 때만 오른다
+    assert engine.cover_sources([COVER])[COVER]["src"] == src
+    assert session.calls == 1
+    assert engine.app_counters().get("cover_resized_total") == before + 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_failures_are_cached(thumbs):
+    cache, session = thumbs(None)
+    first = engine.cover_sources([COVER])[COVER]
+    # 실패하면 CDN 리사이즈 URL 로 대신하고, 재시도 대기 중에는 다시 받지 않는다
+    assert "resize/640/" in first["src"]
+    engine.cover_sources([COVER])
+    assert session.calls == 1
+    stats = cache.stats()
+    assert (stats["failures"], stats["failures_skipped"], stats["failed"]) == (1, 1, 1)
+
+
+def test_cdn_mode_does_not_count_renders(monkeypatch):
+    monkeypatch.setattr(engine, "COVER_MODE", "cdn")
+    before = engine.app_counters().get("cover_resized_total")
+    attrs = engine.cover_sources([COVER])[COVER]
+    assert "resize/640/" in attrs["src"] and "1280w" in attrs["srcset"]
+    assert engine.app_counters().get("cover_resized_total") == before
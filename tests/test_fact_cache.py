@@ -0,0 +1,60 @@
+# tests/test_fact_cache.py
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import engine
+from conftest import ROOT
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_miss_is_sentinel_and_cached_none_is_a_hit(kind, tmp_path):
+    cache = engine.make_fact_cache(kind, path=str(tmp_path / "facts.sqlite3"))
+    assert cache.get("search:nothing") is engine._MISS
+    # "검색 결과 없음"(None)도 캐시된 값이다
+    cache.set("search:nothing", None)
+    assert cache.get("search:nothing") is None
+    assert cache.get("search:other", "default") == "default"
+
+
+def test_sqlite_cache_reopened_keeps_entries_and_sentinel(tmp_path):
+    path = str(tmp_path / "facts.sqlite3")
+    engine.make_fact_cache("sqlite", path=path).set("detail:1", {"id": 1})
+    reopened = engine.make_fact_cache("sqlite", path=path)
+    assert reopened.get("detail:1") == {"id": 1}
+    assert reopened.get("detail:2") is engine._MISS
+
+
+def test_search_cache_across_rerun(monkeypatch):
+    # 캐시된 백엔드는 rerun 사이에 살아남는다. 두 번째 실행에서도 miss 판정이 같은 sentinel 로 이뤄져야 한다
+    calls = []
+
+    def fake_get(rawg_key, endpoint, params=None):
+        calls.append(params["search"])
+        return {"results": [{"id": len(calls), "name": params["search"]}]}
+
+    monkeypatch.setattr(engine, "rawg_get", fake_get)
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=30)
+    at.run()
+    assert not at.exception
+    cache = engine.rawg_fact_cache()
+    assert engine.rawg_search_top("k", "Rerun Title One")["id"] == 1
+
+    at.run()
+    assert not at.exception
+    assert engine.rawg_fact_cache() is cache
+    assert cache.get("search:rerun never seen") is engine._MISS
+    assert engine.rawg_search_top("k", "Rerun Title One")["id"] == 1
+    assert engine.rawg_search_top("k", "Rerun Title Two")["id"] == 2
+    assert calls == ["Rerun Title One", "Rerun Title Two"]
+
+
+def test_incomplete_backend_fails_at_construction():
+    class GetOnly(engine.FactCacheBackend):
+        def get(self, key, default=engine._MISS):
+            return default
+
+    with pytest.raises(TypeError):
+        GetOnly(60, 10)
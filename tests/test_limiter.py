@@ -0,0 +1,138 @@
+# tests/test_limiter.py
+import threading
+import time
+
+import pytest
+
+import engine
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = engine.TokenBucket(rate=2.0, burst=2, clock=clock)
+    assert bucket.try_take() == 0.0
+    assert bucket.try_take() == 0.0
+    assert bucket.try_take() == pytest.approx(0.5)
+    clock.advance(0.25)
+    assert bucket.try_take() == pytest.approx(0.25)
+    clock.advance(0.25)
+    assert bucket.try_take() == 0.0
+
+
+def test_token_bucket_block_overrides_tokens():
+    clock = FakeClock()
+    bucket = engine.TokenBucket(rate=10.0, burst=5, clock=clock)
+    bucket.block(3.0)
+    assert bucket.try_take() == pytest.approx(3.0)
+    clock.advance(3.0)
+    assert bucket.try_take() == 0.0
+
+
+def test_unlimited_bucket_still_honours_block():
+    clock = FakeClock()
+    bucket = engine.TokenBucket(rate=0, burst=1, clock=clock)
+    assert all(bucket.try_take() == 0.0 for _ in range(100))
+    bucket.block(1.0)
+    assert bucket.try_take() == pytest.approx(1.0)
+
+
+def test_sqlite_bucket_is_shared_between_instances(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "limiter.sqlite3")
+    a = engine.SqliteTokenBucket(path, "rawg", rate=1.0, burst=2, clock=clock)
+    b = engine.SqliteTokenBucket(path, "rawg", rate=1.0, burst=2, clock=clock)
+    other = engine.SqliteTokenBucket(path, "openai", rate=1.0, burst=2, clock=clock)
+    assert a.try_take() == 0.0
+    assert b.try_take() == 0.0
+    assert a.try_take() == pytest.approx(1.0)
+    assert other.try_take() == 0.0
+    clock.advance(1.0)
+    assert b.try_take() == 0.0
+    a.block(5.0)
+    assert b.try_take() == pytest.approx(5.0)
+    assert other.try_take() == 0.0
+
+
+def make_limiter(clock, max_concurrency=8, latency_target_ms=1000.0):
+    return engine.AdaptiveLimiter(
+        "test", rate=0, burst=1, max_concurrency=max_concurrency, latency_target_ms=latency_target_ms, clock=clock
+    )
+
+
+def test_limiter_halves_on_throttle_once_per_cooldown():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    for _ in range(2):
+        ticket = limiter.acquire("s")
+        ticket.throttle()
+        limiter.release(ticket)
+    # 두 번째 감소는 DECREASE_COOLDOWN_S 안이라 무시
+    assert limiter.limit == 4.0
+    clock.advance(engine.AdaptiveLimiter.DECREASE_COOLDOWN_S)
+    ticket = limiter.acquire("s")
+    ticket.throttle(retry_after=2.0)
+    limiter.release(ticket)
+    assert limiter.limit == 2.0
+    # Retry-After 동안 버킷이 막힌다
+    assert limiter.bucket.try_take() == pytest.approx(2.0)
+
+
+def test_limiter_backs_off_on_latency_and_recovers():
+    clock = FakeClock()
+    limiter = make_limiter(clock, max_concurrency=4, latency_target_ms=100.0)
+    ticket = limiter.acquire("s")
+    clock.advance(0.5)
+    limiter.release(ticket)
+    assert limiter.limit == pytest.approx(3.6)
+    ticket = limiter.acquire("s")
+    ticket.track_latency = False
+    clock.advance(0.5)
+    limiter.release(ticket)
+    assert limiter.limit == pytest.approx(3.6 + 1 / 3.6)
+    for _ in range(10):
+        limiter.release(limiter.acquire("s"))
+    assert limiter.limit == 4.0
+
+
+def test_limiter_times_out_when_no_slot_frees():
+    limiter = engine.AdaptiveLimiter("test", rate=0, burst=1, max_concurrency=1, latency_target_ms=1000.0, max_wait=0.05)
+    held = limiter.acquire("a")
+    with pytest.raises(engine.RateLimited):
+        limiter.acquire("b")
+    assert limiter.stats()["queued"] == 0
+    limiter.release(held)
+
+
+def test_limiter_round_robins_sessions():
+    limiter = engine.AdaptiveLimiter("test", rate=0, burst=1, max_concurrency=1, latency_target_ms=10_000.0)
+    held = limiter.acquire("a")
+    order = []
+
+    def worker(session, label):
+        ticket = limiter.acquire(session)
+        order.append(label)
+        limiter.release(ticket)
+
+    threads = []
+    for session, label in (("a", "a1"), ("a", "a2"), ("b", "b1")):
+        t = threading.Thread(target=worker, args=(session, label))
+        t.start()
+        threads.append(t)
+        deadline = time.monotonic() + 5
+        while limiter.stats()["queued"] < len(threads) and time.monotonic() < deadline:
+            time.sleep(0.005)
+    limiter.release(held)
+    for t in threads:
+        t.join(5)
+    assert order == ["a1", "b1", "a2"]
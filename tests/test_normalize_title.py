@@ -0,0 +1,61 @@
+# tests/test_normalize_title.py
+import sqlite3
+import time
+
+import pytest
+
+import engine
+
+
+@pytest.mark.parametrize(
+    "title, key",
+    [
+        ("Final Fantasy VII", "final fantasy 7"),
+        ("Civilization IV", "civilization 4"),
+        ("Final Fantasy XV", "final fantasy 15"),
+        ("Pokémon X", "pokemon x"),
+        ("Mega Man X", "mega man x"),
+        ("Grand Theft Auto V", "grand theft auto v"),
+    ],
+)
+def test_normalize_title(title, key):
+    assert engine.normalize_title(title) == key
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("Mega Man X", "Mega Man 10"),
+        ("Pokémon X", "Pokémon 10"),
+        ("Grand Theft Auto V", "Grand Theft Auto 5"),
+    ],
+)
+def test_single_letter_numerals_do_not_collide(a, b):
+    assert engine.normalize_title(a) != engine.normalize_title(b)
+
+
+def test_alias_index_keeps_colliding_titles_apart(tmp_path):
+    index = engine.AliasIndex(str(tmp_path / "aliases.sqlite3"))
+    index.record(1, "Mega Man X")
+    index.record(2, "Mega Man 10")
+    assert index.lookup("Mega Man X") == 1
+    assert index.lookup("Mega Man 10") == 2
+
+
+def test_legacy_folded_keys_are_purged(tmp_path):
+    path = str(tmp_path / "aliases.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE aliases (alias TEXT PRIMARY KEY, game_id INTEGER NOT NULL, title TEXT NOT NULL,"
+        " hits INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, last_hit REAL)"
+    )
+    conn.executemany(
+        "INSERT INTO aliases (alias, game_id, title, created_at) VALUES (?, ?, ?, ?)",
+        [("mega man 10", 1, "Mega Man X", time.time()), ("final fantasy 7", 2, "Final Fantasy VII", time.time())],
+    )
+    conn.commit()
+    conn.close()
+
+    index = engine.AliasIndex(path)
+    assert index.lookup("Mega Man 10") is None
+    assert index.lookup("Final Fantasy VII") == 2
@@ -0,0 +1,57 @@
+# tests/test_rawg_search.py
+import engine
+
+
+def fallbacks():
+    return engine.app_counters().get("rawg_search_fallbacks_total")
+
+
+def fake_rawg(monkeypatch, filtered, unfiltered):
+    calls = []
+
+    def fake_get(rawg_key, endpoint, params=None):
+        calls.append(params.get("parent_platforms"))
+        return {"results": filtered if params.get("parent_platforms") else unfiltered}
+
+    monkeypatch.setattr(engine, "rawg_get", fake_get)
+    return calls
+
+
+def test_filtered_search_skips_other_games(monkeypatch):
+    calls = fake_rawg(
+        monkeypatch,
+        filtered=[{"id": 1, "name": "Hollow Spire Arena"}, {"id": 2, "name": "Hollow Spire"}],
+        unfiltered=[],
+    )
+    top = engine.rawg_search_top("k", "Hollow Spire", (1,))
+    assert top["id"] == 2
+    assert calls == ["1"]
+
+
+def test_filtered_search_falls_back_to_unfiltered(monkeypatch):
+    calls = fake_rawg(
+        monkeypatch,
+        filtered=[{"id": 3, "name": "Quiet Harbor Tycoon"}],
+        unfiltered=[{"id": 4, "name": "Quiet Harbor"}],
+    )
+    before = fallbacks()
+    top = engine.rawg_search_top("k", "Quiet Harbor", (7,))
+    assert top["id"] == 4
+    assert calls == ["7", None]
+    assert fallbacks() == before + 1
+    # 필터 검색 키에 최종 결과가 캐시되어 다시 부르지 않는다
+    assert engine.rawg_search_top("k", "Quiet Harbor", (7,))["id"] == 4
+    assert len(calls) == 2
+
+
+def test_empty_filtered_search_does_not_fall_back(monkeypatch):
+    calls = fake_rawg(monkeypatch, filtered=[], unfiltered=[{"id": 6, "name": "Salt Mine"}])
+    before = fallbacks()
+    assert engine.rawg_search_top("k", "Salt Mine", (3,)) is None
+    assert calls == ["3"]
+    assert fallbacks() == before
+
+
+def test_filtered_search_accepts_slug_match(monkeypatch):
+    fake_rawg(monkeypatch, filtered=[{"id": 5, "name": "Ember Road™", "slug": "ember-road"}], unfiltered=[])
+    assert engine.rawg_search_top("k", "Ember Road", (2,))["id"] == 5
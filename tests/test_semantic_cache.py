@@ -0,0 +1,56 @@
+# tests/test_semantic_cache.py
+import engine
+
+
+def profile(**overrides):
+    prefs = {
+        "preferred_genres": ["RPG"],
+        "wanted_emotions": [],
+        "wanted_free": "",
+        "played_games": "Hades, Celeste",
+        "platforms": ["PC"],
+        "hours_per_day": 2.0,
+    }
+    prefs.update(overrides)
+    return prefs
+
+
+def cache_with(prefs):
+    cache = engine.SemanticIssueCache(
+        len(engine.profile_vector(**profile())), 16, engine.SEMANTIC_CACHE_THRESHOLD, 60
+    )
+    cache.add(partition(prefs), engine.profile_vector(**prefs), "stored", exact=engine.free_text_key(prefs["wanted_free"]))
+    return cache
+
+
+def partition(prefs):
+    return engine.semantic_partition("m", True, prefs["platforms"])
+
+
+def lookup(cache, prefs):
+    return cache.lookup(partition(prefs), engine.profile_vector(**prefs), exact=engine.free_text_key(prefs["wanted_free"]))
+
+
+def test_opposite_free_text_does_not_match():
+    cache = cache_with(profile(wanted_free="폭력적인 장면이 없는 협동 게임"))
+    assert lookup(cache, profile(wanted_free="폭력적인 장면이 있는 협동 게임")) is None
+
+
+def test_free_text_matches_after_canonicalization():
+    cache = cache_with(profile(wanted_free="협동  게임"))
+    hit = lookup(cache, profile(wanted_free=" 협동 게임 ", played_games="Celeste, Hades"))
+    assert hit is not None and hit[0] == "stored"
+
+
+def test_other_fields_still_match_approximately():
+    cache = cache_with(profile(hours_per_day=2.0))
+    assert lookup(cache, profile(hours_per_day=2.5)) is not None
+    assert lookup(cache, profile(platforms=["Switch"])) is None
+
+
+def test_platform_subset_or_superset_does_not_match():
+    cache = cache_with(profile(platforms=["PC", "PS", "Xbox", "Switch"]))
+    assert lookup(cache, profile(platforms=["PC", "PS", "Xbox"])) is None
+    assert lookup(cache, profile(platforms=["PC", "PS", "Xbox", "Switch", "모바일"])) is None
+    hit = lookup(cache, profile(platforms=["Switch", "Xbox", "PS", "PC"]))
+    assert hit is not None and hit[0] == "stored"
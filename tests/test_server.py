@@ -0,0 +1,127 @@
+# tests/test_server.py
+import asyncio
+import json
+import threading
+
+import pytest
+from starlette.testclient import TestClient
+
+import engine
+import server
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    def recommend(self, force_refresh=False, on_progress=None, on_card=None, cancel=None, **profile):
+        self.calls.append((force_refresh, profile))
+        return {
+            "issue_cache_hit": None,
+            "rawg_mode": False,
+            "recommendations": [],
+            "selection_metrics": {},
+            "stage_timings": {},
+        }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(server, "engine_for", lambda model: engine)
+    with TestClient(server.app) as c:
+        c.engine = engine
+        yield c
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"profile": {"hours_per_day": "lots"}},
+        {"profile": {"hours_per_day": 30}},
+        {"profile": {"platforms": [1, 2]}},
+        {"profile": {"played_games": {"a": 1}}},
+        {"profile": {"force_refresh": True}},
+        {"profile": {"on_card": "x"}},
+        {"profile": "PC"},
+        {"platform": "PC"},
+        {"profile": {}, "force_refresh": "no"},
+    ],
+)
+def test_bad_profiles_are_rejected_before_admission(client, monkeypatch, body):
+    async def no_admission():
+        raise AssertionError("admission slot taken for an invalid request")
+
+    monkeypatch.setattr(server.admission, "acquire", no_admission)
+    resp = client.post("/recommend", json=body)
+    assert resp.status_code == 400
+    assert resp.json()["error"]
+    assert client.engine.calls == []
+
+
+def test_profile_is_normalized(client):
+    resp = client.post("/recommend", json={"platforms": "PC, Switch", "hours_per_day": "2", "session_id": "s1"})
+    assert resp.status_code == 200
+    force_refresh, profile = client.engine.calls[0]
+    assert force_refresh is False
+    assert profile["platforms"] == ["PC", "Switch"]
+    assert profile["hours_per_day"] == 2.0
+
+
+class BlockingEngine:
+    # 카드 하나를 흘린 뒤 취소될 때까지 멈춰 있는 엔진
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    def recommend(self, force_refresh=False, on_progress=None, on_card=None, cancel=None, **profile):
+        try:
+            on_card({"title": "first"})
+            if cancel.wait(5):
+                self.cancelled.set()
+                raise engine.JobCancelled()
+            return {}
+        finally:
+            self.finished.set()
+
+
+def test_stream_disconnect_cancels_the_run(monkeypatch):
+    blocking = BlockingEngine()
+    monkeypatch.setattr(server, "engine_for", lambda model: blocking)
+    body = json.dumps({"profile": {}, "stream": "ndjson"}).encode("utf-8")
+
+    async def scenario():
+        first_chunk = asyncio.Event()
+        requests = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                first_chunk.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/recommend",
+            "raw_path": b"/recommend",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 1234),
+            "server": ("testserver", 80),
+        }
+        await server.app(scope, receive, send)
+        await asyncio.get_running_loop().run_in_executor(None, blocking.finished.wait, 5)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert blocking.cancelled.is_set()
+    assert server.admission.active == 0
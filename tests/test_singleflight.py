@@ -0,0 +1,78 @@
+# tests/test_singleflight.py
+import threading
+import time
+
+import pytest
+
+import engine
+
+
+def start_leader(flight, key, fn):
+    # 리더가 fn 안에 들어간 것을 확인한 뒤 돌려준다
+    entered = threading.Event()
+    release = threading.Event()
+    outcome = {}
+
+    def leader_fn():
+        entered.set()
+        release.wait(5)
+        return fn()
+
+    def run():
+        try:
+            outcome["value"] = flight.do(key, leader_fn)
+        except BaseException as e:
+            outcome["error"] = e
+
+    t = threading.Thread(target=run)
+    t.start()
+    assert entered.wait(5)
+    return t, release, outcome
+
+
+def start_follower(flight, key, fn):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["value"] = flight.do(key, fn)
+        except BaseException as e:
+            outcome["error"] = e
+
+    t = threading.Thread(target=run)
+    t.start()
+    return t, outcome
+
+
+def wait_for_follower():
+    # 팔로워 스레드가 리더의 호출에 합류할 시간
+    time.sleep(0.2)
+
+
+def test_followers_share_a_successful_result():
+    flight = engine.SingleFlight("test-ok")
+    leader, release, led = start_leader(flight, "k", lambda: "value")
+    follower, followed = start_follower(flight, "k", lambda: pytest.fail("follower should not run"))
+    wait_for_follower()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert led["value"] == ("value", False)
+    assert followed["value"] == ("value", True)
+
+
+def test_followers_retry_when_the_leader_fails():
+    flight = engine.SingleFlight("test-fail")
+
+    def boom():
+        raise RuntimeError("leader only")
+
+    leader, release, led = start_leader(flight, "k", boom)
+    follower, followed = start_follower(flight, "k", lambda: "own")
+    wait_for_follower()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert isinstance(led["error"], RuntimeError)
+    assert followed == {"value": ("own", False)}
+    assert flight.in_flight() == 0
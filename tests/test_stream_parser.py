@@ -0,0 +1,58 @@
+# tests/test_stream_parser.py
+import json
+
+import pytest
+
+import engine
+
+
+def feed_all(parser, text, size):
+    out = []
+    for i in range(0, len(text), size):
+        out.extend(parser.feed(text[i : i + size]))
+    return out
+
+
+PAYLOAD = json.dumps(
+    {
+        "note": "앞쪽 필드",
+        "candidates": [
+            "Hades",
+            {"title": "Celeste", "why": "정밀 플랫포머 [어려움] {점프}"},
+            'Say "Hi" \\ Friends',
+            {"title": "Outer Wilds", "tags": ["탐험", {"nested": [1, 2]}]},
+        ],
+        "after": ["무시"],
+    },
+    ensure_ascii=False,
+)
+EXPECTED = json.loads(PAYLOAD)["candidates"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(PAYLOAD)])
+def test_elements_come_out_regardless_of_chunking(size):
+    parser = engine.JsonArrayStreamParser("candidates")
+    assert feed_all(parser, PAYLOAD, size) == EXPECTED
+    assert parser.done
+
+
+def test_elements_are_emitted_as_soon_as_closed():
+    parser = engine.JsonArrayStreamParser("candidates")
+    assert parser.feed('{"candi') == []
+    assert parser.feed('dates": ["Had') == []
+    assert parser.feed('es", {"title": "Cel') == ["Hades"]
+    assert parser.feed('este"}') == [{"title": "Celeste"}]
+    assert not parser.done
+    assert parser.feed("]}") == []
+    assert parser.done
+
+
+def test_feed_after_done_returns_nothing():
+    parser = engine.JsonArrayStreamParser("candidates")
+    assert parser.feed('{"candidates": ["A"], "other": ["B"]}') == ["A"]
+    assert parser.feed('["C"]') == []
+
+
+def test_malformed_element_is_skipped():
+    parser = engine.JsonArrayStreamParser("candidates")
+    assert parser.feed('{"candidates": [{"title": 01}, "Ok"]}') == ["Ok"]
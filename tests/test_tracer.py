@@ -0,0 +1,64 @@
+# tests/test_tracer.py
+import json
+
+import pytest
+
+import engine
+
+
+def read_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def make_tracer(tmp_path, **kwargs):
+    path = tmp_path / "traces.jsonl"
+    return engine.Tracer(str(path), None, enabled=True, **kwargs), path
+
+
+def test_spans_are_written_when_the_root_ends(tmp_path):
+    tracer, path = make_tracer(tmp_path, sample_rate=1.0)
+    with tracer.span("root"):
+        with tracer.span("child"):
+            pass
+        assert not path.exists() or path.read_text() == ""
+    assert [r["name"] for r in read_spans(path)] == ["child", "root"]
+    tracer.close()
+
+
+def test_unsampled_runs_are_dropped_but_errors_are_kept(tmp_path):
+    tracer, path = make_tracer(tmp_path, sample_rate=0.0)
+    with tracer.span("quiet"):
+        pass
+    with pytest.raises(RuntimeError):
+        with tracer.span("root"):
+            with tracer.span("child"):
+                raise RuntimeError("boom")
+    assert [(r["name"], r["status"]) for r in read_spans(path)] == [("child", "error"), ("root", "error")]
+    # 메모리의 최근 실행은 표본과 무관하게 남는다
+    assert len(tracer._traces) == 2
+    tracer.close()
+
+
+def test_late_child_follows_its_run(tmp_path):
+    tracer, path = make_tracer(tmp_path, sample_rate=1.0)
+    root = tracer.start("root")
+    late = tracer.start("late", parent=root, activate=False)
+    root.end()
+    late.end()
+    assert [r["name"] for r in read_spans(path)] == ["root", "late"]
+    tracer.close()
+
+
+def test_file_rotates_past_max_bytes(tmp_path):
+    tracer, path = make_tracer(tmp_path, sample_rate=1.0, max_bytes=200)
+    for i in range(5):
+        with tracer.span("root", i=i):
+            pass
+    rotated = tmp_path / "traces.jsonl.1"
+    assert rotated.exists()
+    # 백업은 하나만 남으므로 가장 최근 실행들만 보인다
+    spans = read_spans(rotated) + (read_spans(path) if path.exists() else [])
+    assert spans[-1]["attrs"]["i"] == 4
+    assert len(spans) < 5
+    tracer.close()